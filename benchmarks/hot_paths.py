@@ -0,0 +1,310 @@
+"""
+Micro-benchmarks for the per-frame and per-turn hot paths.
+
+Every benchmark runs offline on fixed, seeded fixtures and reports the
+time per call (ns/op) and the bytes allocated per call at peak
+(alloc B/op, from tracemalloc). Results are compared against a stored
+baseline and the run exits non-zero when one has regressed, so it can
+gate a deploy:
+
+    python -m benchmarks.hot_paths                  # compare with the baseline
+    python -m benchmarks.hot_paths --save-baseline  # record a new baseline
+    python -m benchmarks.hot_paths -k ulaw          # only matching benchmarks
+
+Timings only compare meaningfully on the machine the baseline was
+recorded on; allocation figures are portable.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SEED = 1234
+
+# main needs these to import; nothing here talks to the providers
+PLACEHOLDER_SETTINGS = (
+    "TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "TWILIO_PHONE_NUMBER",
+    "LIVEKIT_API_KEY", "LIVEKIT_API_SECRET", "LIVEKIT_URL",
+    "DEEPGRAM_API_KEY", "GROQ_API_KEY", "ELEVENLABS_API_KEY",
+)
+
+REPLY = (
+    "I understand this might be a difficult situation… The outstanding amount is "
+    "4500 rupees — due on 5th March. Would you like to discuss a \"payment plan\" "
+    "that works for you?"
+)
+
+# name -> factory returning the operation to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    def register(factory: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+def _tone(seconds: float, sample_rate: int) -> np.ndarray:
+    rng = np.random.default_rng(SEED)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 6000 * np.sin(2 * np.pi * 220 * t) + rng.normal(0, 300, t.size)
+    return signal.astype(np.int16)
+
+
+def _main():
+    for name in PLACEHOLDER_SETTINGS:
+        os.environ.setdefault(name, "benchmark-placeholder-credential-0000")
+    import main
+    return main
+
+
+def _run_coroutine(coro):
+    """Drive a coroutine that never suspends without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("Benchmarked coroutine suspended")
+
+
+@benchmark("convert_audio_to_samples.wav")
+def bench_convert_wav():
+    main = _main()
+    wav = main.pcm_to_wav(_tone(4.0, 22050).tobytes(), 22050)
+    return lambda: main.convert_audio_to_samples(wav, sample_rate=main.LIVEKIT_SAMPLE_RATE)
+
+
+@benchmark("convert_audio_to_samples.pcm")
+def bench_convert_pcm():
+    main = _main()
+    pcm = _tone(1.5, main.TTS_SAMPLE_RATE).tobytes()
+    return lambda: main.convert_audio_to_samples(pcm, sample_rate=main.LIVEKIT_SAMPLE_RATE, source_rate=main.TTS_SAMPLE_RATE)
+
+
+@benchmark("pcm_to_wav.utterance")
+def bench_pcm_to_wav():
+    main = _main()
+    utterance = _tone(3.0, main.TWILIO_SAMPLE_RATE)
+    return lambda: main.pcm_to_wav(utterance, main.TWILIO_SAMPLE_RATE)
+
+
+@benchmark("ulaw_decode.frame")
+def bench_ulaw_decode():
+    from utils.mulaw import ulaw_decode, ulaw_encode
+    payload = ulaw_encode(_tone(0.02, 8000))
+    return lambda: ulaw_decode(payload)
+
+
+@benchmark("ulaw_encode.frame")
+def bench_ulaw_encode():
+    from utils.mulaw import ulaw_encode
+    frame = _tone(0.02, 8000)
+    return lambda: ulaw_encode(frame)
+
+
+@benchmark("ring_buffer.write_ulaw")
+def bench_ring_write():
+    from utils.mulaw import ulaw_encode
+    from utils.ring_buffer import AudioRingBuffer
+    payload = ulaw_encode(_tone(0.02, 8000))
+    ring = AudioRingBuffer(8000 * 17)
+    return lambda: ring.write_ulaw(payload)
+
+
+@benchmark("vad.poll")
+def bench_vad_poll():
+    from utils.mulaw import ulaw_encode
+    from utils.ring_buffer import AudioRingBuffer
+    from utils.vad import UtteranceDetector
+    payload = ulaw_encode(_tone(0.02, 8000))
+    ring = AudioRingBuffer(8000 * 17)
+    detector = UtteranceDetector(ring)
+
+    def step():
+        ring.write_ulaw(payload)
+        return detector.poll()
+    return step
+
+
+@benchmark("resampler.8k_to_16k")
+def bench_resample_inbound():
+    from utils.resampler import Resampler
+    resampler = Resampler(8000, 16000)
+    frame = _tone(0.02, 8000)
+    return lambda: resampler.process(frame)
+
+
+@benchmark("resampler.16k_to_8k")
+def bench_resample_outbound():
+    from utils.resampler import Resampler
+    resampler = Resampler(16000, 8000)
+    frame = _tone(0.02, 16000)
+    return lambda: resampler.process(frame)
+
+
+@benchmark("llm.clean_response")
+def bench_clean_response():
+    from services.llm_service import LLMService
+    return lambda: LLMService._clean_response(REPLY)
+
+
+@benchmark("text_segmenter.reply")
+def bench_segmenter():
+    from utils.text_segmenter import SentenceSegmenter
+    tokens = [word + " " for word in REPLY.split(" ")]
+
+    def segment():
+        segmenter = SentenceSegmenter()
+        for token in tokens:
+            segmenter.push(token)
+        return segmenter.flush()
+    return segment
+
+
+@benchmark("livekit_token")
+def bench_livekit_token():
+    main = _main()
+    return lambda: main.generate_livekit_token("bench-call")
+
+
+@benchmark("twiml")
+def bench_twiml():
+    main = _main()
+    return lambda: _run_coroutine(main.generate_twiml("bench-call", main.MEDIA_MODE_LIVEKIT))
+
+
+def _time_loops(op: Callable[[], object], loops: int) -> int:
+    started = time.perf_counter_ns()
+    for _ in range(loops):
+        op()
+    return time.perf_counter_ns() - started
+
+
+def measure(op: Callable[[], object], min_time: float = 0.2, repeats: int = 5) -> dict:
+    """
+    Time op over repeats rounds of at least min_time seconds each and
+    take the fastest round; then measure its peak allocation per call
+    """
+    for _ in range(3):
+        op()  # warm caches and lazy imports
+    target = min_time * 1e9
+    loops = 1
+    while True:
+        elapsed = _time_loops(op, loops)
+        if elapsed >= target:
+            break
+        loops = max(loops * 2, int(loops * target / max(elapsed, 1) * 1.1))
+    best = elapsed / loops
+    for _ in range(repeats - 1):
+        best = min(best, _time_loops(op, loops) / loops)
+
+    samples = min(loops, 50)
+    tracemalloc.start()
+    try:
+        # What measuring itself allocates is taken off every sample
+        floor = min(_peak_alloc(lambda: None) for _ in range(5))
+        alloc = sum(_peak_alloc(op) for _ in range(samples)) / samples
+    finally:
+        tracemalloc.stop()
+    return {"ns_per_op": round(best, 1), "alloc_bytes": max(0, round(alloc - floor)), "loops": loops}
+
+
+def _peak_alloc(op: Callable[[], object]) -> int:
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    op()
+    _, peak = tracemalloc.get_traced_memory()
+    return peak - before
+
+
+def compare(result: dict, baseline: Optional[dict], time_tolerance: float, alloc_tolerance: float) -> List[str]:
+    """
+    Return the ways result regressed against baseline
+    """
+    if not baseline:
+        return []
+    problems = []
+    if result["ns_per_op"] > baseline["ns_per_op"] * (1 + time_tolerance):
+        problems.append(f"time {baseline['ns_per_op']:.0f} -> {result['ns_per_op']:.0f} ns/op")
+    # A little slack so tiny allocators do not flap on interpreter noise
+    if result["alloc_bytes"] > baseline["alloc_bytes"] * (1 + alloc_tolerance) + 256:
+        problems.append(f"alloc {baseline['alloc_bytes']} -> {result['alloc_bytes']} B/op")
+    return problems
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the audio and text hot paths")
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="allowed ns/op increase, as a fraction")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.10, help="allowed alloc B/op increase, as a fraction")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    parser.add_argument("--confirm", type=int, default=2, help="re-measurements of an apparent time regression")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    names = [name for name in BENCHMARKS if not args.pattern or args.pattern in name]
+    baseline = load_baseline(args.baseline)
+    stored = baseline.get("results", {})
+
+    print(f"{'benchmark':32} {'ns/op':>12} {'alloc B/op':>12} {'baseline ns/op':>15} {'change':>8}")
+    results = {}
+    regressions = {}
+    for name in names:
+        op = BENCHMARKS[name]()
+        result = results[name] = measure(op, min_time=args.min_time)
+        base = stored.get(name)
+        # A slow run is re-measured before it counts, so a burst of load
+        # on the machine is not reported as a regression
+        for _ in range(args.confirm):
+            if not compare(result, base, args.time_tolerance, args.alloc_tolerance):
+                break
+            retry = measure(op, min_time=args.min_time)
+            result["ns_per_op"] = min(result["ns_per_op"], retry["ns_per_op"])
+        base_ns = f"{base['ns_per_op']:,.0f}" if base else "-"
+        change = f"{(result['ns_per_op'] / base['ns_per_op'] - 1) * 100:+.1f}%" if base else "new"
+        print(f"{name:32} {result['ns_per_op']:>12,.0f} {result['alloc_bytes']:>12,} {base_ns:>15} {change:>8}")
+        problems = compare(result, base, args.time_tolerance, args.alloc_tolerance)
+        if problems:
+            regressions[name] = problems
+
+    if args.save_baseline:
+        merged = {**stored, **{name: {k: v for k, v in r.items() if k != "loops"} for name, r in results.items()}}
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": f"{platform.system()} {platform.machine()} {platform.processor()}".strip(),
+                "results": dict(sorted(merged.items())),
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    if regressions:
+        print("\nRegressions against the baseline:")
+        for name, problems in regressions.items():
+            print(f"  {name}: {'; '.join(problems)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 import os
+from typing import Optional
 
 class Settings(BaseSettings):
     # Twilio settings
@@ -19,6 +20,7 @@ class Settings(BaseSettings):
     # Groq settings
     GROQ_API_KEY: str
     GROQ_MODEL: str = "mixtral-8x7b-32768"
+    GROQ_FAST_MODEL: Optional[str] = "llama-3.1-8b-instant"  # routine turns; unset to send every turn to GROQ_MODEL
     
     # ElevenLabs settings
     ELEVENLABS_API_KEY: str
@@ -29,11 +31,110 @@ class Settings(BaseSettings):
     app_port: int = 8000
     debug: bool = False
     is_test_environment: bool = True  # Set to False for production
+    server_workers: int = 1  # server processes; above 1, `python main.py` forks them from one preloaded parent sharing the port
+    server_graceful_timeout: float = 30.0  # seconds a stopping worker gives open connections before closing them
+    
+    # Logging settings
+    log_level: str = "INFO"
+    log_sample_interval: float = 5.0  # seconds between repeated per-frame log lines
+    
+    # Media settings
+    media_mode: str = "livekit"  # "direct" (Twilio only) or "livekit" (mirror into a room)
     
     # Conversation Settings
     max_conversation_turns: int = 5
-    silence_threshold: float = 0.5  # seconds
-    response_timeout: float = 10.0  # seconds
+    silence_threshold: float = 0.5  # seconds of quiet that end a caller utterance
+    max_utterance_seconds: float = 15.0  # longest caller utterance sent to STT in one piece; sizes the per-call audio ring
+    response_timeout: float = 10.0  # seconds from a caller turn to the first reply audio before the turn is abandoned
+    silence_reprompt_seconds: float = 8.0  # caller silence after the agent finishes speaking before a reprompt
+    max_silence_reprompts: int = 2  # unanswered reprompts before hanging up
+    
+    # Transcription settings
+    save_test_audio: bool = False  # keep a copy of /api/test-stt uploads in the audio directory
+    stt_batch_concurrency: int = 4  # Deepgram requests in flight per batch transcription
+    
+    # LLM routing settings
+    llm_escalation_keywords: str = (  # comma-separated phrases that send a turn to GROQ_MODEL
+        "plan,installment,instalment,emi,discount,settle,settlement,waive,waiver,reduce,negotiate,"
+        "extension,dispute,wrong,mistake,already paid,not my,never took,fraud,complaint,lawyer,legal,"
+        "court,police,harass,refund"
+    )
+    llm_fast_max_words: int = 30  # longer caller turns go to GROQ_MODEL
+    llm_min_confidence: float = 0.75  # turns transcribed with less STT confidence go to GROQ_MODEL
+    llm_sticky_turns: int = 2  # turns a call stays on GROQ_MODEL after an escalation
+    
+    # Speech synthesis settings
+    tts_concurrency: int = 2  # reply sentences synthesized in parallel per call
+    phrase_synthesis: bool = True  # speak amount and due-date sentences from cached per-voice fragments
+    phrase_crossfade_ms: int = 10  # overlap between joined fragments
+    
+    # Provider connection settings
+    provider_warm_connections: int = 2  # keep-alive connections opened and kept warm per provider
+    provider_max_connections: int = 32  # pooled connections per provider
+    provider_keepalive_expiry: float = 90.0  # seconds an idle pooled connection is kept
+    provider_probe_interval: float = 30.0  # seconds between keep-warm probes; below the providers' idle timeouts
+    
+    # Recording settings
+    recording_dir: str = "recordings"
+    recording_segment_seconds: int = 300  # audio per segment file before rotating
+    recording_bitrate: int = 24000  # Opus bits per second per track
+    recording_retention_days: float = 30.0
+    recording_max_bytes: int = 5 * 1024 ** 3  # oldest recordings are deleted beyond this
+    
+    # Post-call analytics settings
+    analytics_db: str = "analytics.db"  # SQLite file for per-call analytics
+    analytics_workers: int = 2  # analysis processes
+    analytics_on_call_end: bool = True  # analyze each call as soon as its recording closes
+    
+    # Call record settings
+    call_records_db: str = "call_records.db"  # SQLite file for calls and transcript turns
+    call_record_batch_size: int = 500  # queued writes per transaction
+    call_record_flush_interval: float = 0.5  # seconds a partial batch may wait before it is written
+    
+    # Answering machine detection settings
+    amd_enabled: bool = True  # classify the first seconds of caller audio before greeting
+    amd_machine_action: str = "message"  # "message" leaves amd_voicemail_message, "hangup" just ends the call
+    amd_voicemail_message: str = (
+        "Hello, this is a message about your account. "
+        "Please call us back at your earliest convenience. Thank you."
+    )
+    amd_initial_silence_ms: int = 2500  # no speech for this long means a machine
+    amd_greeting_ms: int = 1800  # one utterance longer than this means a recorded greeting
+    amd_max_ms: int = 4000  # undecided after this much audio is treated as a person
+    
+    # Admission control settings
+    max_active_calls: int = 20  # live calls per worker, including ones still dialing
+    max_loop_lag_ms: float = 100.0  # smoothed event-loop lag above which new calls wait
+    max_provider_in_flight: int = 32  # requests waiting on any one provider above which new calls wait
+    admission_queue_size: int = 50  # new calls allowed to wait for capacity
+    admission_queue_timeout: float = 5.0  # seconds a new call waits before it is refused
+    admission_retry_after: int = 10  # Retry-After seconds sent with a refusal
+    loop_lag_interval: float = 0.1  # seconds between event-loop lag samples
+    
+    # Diagnostics settings
+    loop_block_threshold: float = 0.25  # seconds the event loop may be stuck before its stack is captured
+    profiler_max_seconds: float = 300.0  # longest on-demand profiling run
+    admin_token: Optional[str] = None  # required as X-Admin-Token on /admin endpoints; they answer 404 while unset
+    
+    # Call lifecycle settings
+    call_idle_timeout: float = 600.0  # seconds without activity before a call is reaped
+    max_call_duration: float = 3600.0  # seconds
+    reaper_interval: float = 60.0  # seconds between reaper sweeps
+    timer_tick: float = 0.05  # resolution of the shared per-call timer wheel
+    call_sync_interval: float = 5.0  # with several server workers, seconds between checks of dialed calls against the shared call records
+    
+    # Dashboard settings
+    dashboard_queue_size: int = 100  # events buffered per viewer before dropping the oldest
+    
+    # Playout settings
+    playout_frame_ms: int = 20  # frame size sent to the audio output
+    playout_lookahead_ms: int = 100  # how far ahead of real time frames are sent
+    twilio_mark_interval_ms: int = 200  # flow-control mark spacing on the Twilio stream
+    twilio_max_unacked_ms: int = 1000  # audio Twilio may hold before we wait for marks
+    
+    # DSP settings
+    dsp_workers: Optional[int] = None  # processes per server worker for whole-clip audio conversion; unset to split the CPUs between server workers, 0 to convert on the event loop
+    dsp_inline_samples: int = 8000  # clips shorter than this are converted on the event loop, where a worker round trip costs more
 
     def update_app_host(self, new_host: str):
         """Update the APP_HOST value"""
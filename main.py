@@ -1,20 +1,14 @@
-from fastapi import FastAPI, WebSocket, HTTPException, Request, File, UploadFile
-from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi import FastAPI, WebSocket, HTTPException, Request, File, UploadFile, Depends, Header
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Tuple
+from functools import lru_cache, partial, wraps
 import uvicorn
 from config import get_settings, Settings
-from services.twilio_service import TwilioService
-from services.livekit_service import LiveKitService
-from services.stt_service import DeepgramService
-from services.llm_service import LLMService
-from services.tts_service import ElevenLabsService
-from twilio.rest import Client
 from twilio.twiml.voice_response import VoiceResponse, Connect
 import json
 import asyncio
-import websockets
 import uuid
 import logging
 import sys
@@ -22,32 +16,39 @@ from fastapi import WebSocketDisconnect
 import base64
 import time
 import jwt
-from livekit import rtc
 import socket
 import os
+import threading
 from datetime import datetime
-import numpy as np
 import wave
 import io
-import requests
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import mimetypes
+import hashlib
+import hmac
+from utils.logging_utils import setup_logging, CallLoggerAdapter, FrameLogSampler
+from utils.metrics import LatencyRegistry
+from services.call_lifecycle_service import CallLifecycleService, CallRecord, TERMINAL_TWILIO_STATUSES
+from services.broadcast_service import CallEventHub
+from services.admission_service import AdmissionController, AdmissionRejected
+from services.timer_service import TimerWheel
+from utils.loop_monitor import LoopLagMonitor
+from utils.profiler import SamplingProfiler
+
+# Configure logging: records are queued and written by a background thread
+setup_logging(get_settings().log_level)
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-def get_ngrok_url():
+NGROK_API_URL = "http://localhost:4040/api/tunnels"
+
+async def get_ngrok_url():
     """Get the current ngrok URL"""
     try:
+        import httpx
+
         # Try to get ngrok URL from the ngrok API
-        response = requests.get("http://localhost:4040/api/tunnels")
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            response = await client.get(NGROK_API_URL)
         if response.status_code == 200:
             tunnels = response.json()["tunnels"]
             for tunnel in tunnels:
@@ -58,10 +59,10 @@ def get_ngrok_url():
         logger.error(f"Error getting ngrok URL: {str(e)}")
         return None
 
-def update_app_host():
+async def update_app_host():
     """Update APP_HOST with current ngrok URL"""
     try:
-        ngrok_url = get_ngrok_url()
+        ngrok_url = await get_ngrok_url()
         if ngrok_url:
             # Update the settings
             settings = get_settings()
@@ -76,103 +77,586 @@ def update_app_host():
 app = FastAPI(title="AI Debt Collection Voice Agent")
 settings = get_settings()
 
-# Update APP_HOST on startup
-@app.on_event("startup")
-async def startup_event():
-    """Update APP_HOST with ngrok URL on startup"""
-    if update_app_host():
-        logger.info("Successfully updated APP_HOST with ngrok URL")
-    else:
-        logger.warning("Failed to update APP_HOST with ngrok URL")
-
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Initialize services
-twilio_service = TwilioService(
-    account_sid=settings.TWILIO_ACCOUNT_SID,
-    auth_token=settings.TWILIO_AUTH_TOKEN,
-    phone_number=settings.TWILIO_PHONE_NUMBER
-)
+# Services are built on first use so the provider SDKs are not imported
+# until a request (or the background warmup) needs them.
+def service_cache(func):
+    """
+    lru_cache for a service getter that builds each service only once, even
+    when warm_services (on a thread) and a request on the event loop ask for
+    it at the same time; the second caller waits for the first one's build
+    """
+    cached = lru_cache()(func)
+    lock = threading.Lock()
 
-livekit_service = LiveKitService(
-    api_key=settings.LIVEKIT_API_KEY,
-    api_secret=settings.LIVEKIT_API_SECRET,
-    url=settings.LIVEKIT_URL
-)
+    @wraps(func)
+    def getter(*args, **kwargs):
+        with lock:
+            return cached(*args, **kwargs)
 
-stt_service = DeepgramService(
-    api_key=settings.DEEPGRAM_API_KEY
-)
+    getter.cache_info = cached.cache_info
+    getter.cache_clear = cached.cache_clear
+    return getter
+
+@service_cache
+def get_twilio_service():
+    from services.twilio_service import TwilioService
+    return TwilioService(
+        account_sid=settings.TWILIO_ACCOUNT_SID,
+        auth_token=settings.TWILIO_AUTH_TOKEN,
+        phone_number=settings.TWILIO_PHONE_NUMBER
+    )
+
+@service_cache
+def get_livekit_service():
+    from services.livekit_service import LiveKitService
+    return LiveKitService(
+        api_key=settings.LIVEKIT_API_KEY,
+        api_secret=settings.LIVEKIT_API_SECRET,
+        url=settings.LIVEKIT_URL
+    )
+
+@service_cache
+def get_provider_pools():
+    """Shared keep-alive HTTP connections to each speech/LLM provider"""
+    from services.http_pool import ProviderPool
+    from services.stt_service import DEEPGRAM_API_URL
+    from services.tts_service import ELEVENLABS_API_URL
+    limits = dict(
+        warm_connections=settings.provider_warm_connections,
+        max_connections=settings.provider_max_connections,
+        keepalive_expiry=settings.provider_keepalive_expiry
+    )
+    return {
+        "groq": ProviderPool(
+            "groq", "https://api.groq.com",
+            headers={"Authorization": f"Bearer {settings.GROQ_API_KEY}"},
+            probe_path="/openai/v1/models",
+            **limits
+        ),
+        "deepgram": ProviderPool(
+            "deepgram", DEEPGRAM_API_URL,
+            headers={"Authorization": f"Token {settings.DEEPGRAM_API_KEY}"},
+            probe_path="/projects",
+            timeout=60.0,
+            **limits
+        ),
+        "elevenlabs": ProviderPool(
+            "elevenlabs", ELEVENLABS_API_URL,
+            headers={"xi-api-key": settings.ELEVENLABS_API_KEY},
+            probe_path="/models",
+            timeout=60.0,
+            **limits
+        ),
+    }
+
+@service_cache
+def get_stt_service():
+    from services.stt_service import DeepgramService
+    return DeepgramService(
+        api_key=settings.DEEPGRAM_API_KEY,
+        http_client=get_provider_pools()["deepgram"].client
+    )
+
+@service_cache
+def get_llm_service():
+    from services.llm_service import LLMService
+    from services.llm_router import LLMRouter
+    return LLMService(
+        api_key=settings.GROQ_API_KEY,
+        model=settings.GROQ_MODEL,
+        router=LLMRouter(
+            fast_model=settings.GROQ_FAST_MODEL,
+            large_model=settings.GROQ_MODEL,
+            keywords=settings.llm_escalation_keywords.split(","),
+            max_fast_words=settings.llm_fast_max_words,
+            min_confidence=settings.llm_min_confidence,
+            sticky_turns=settings.llm_sticky_turns
+        ),
+        http_client=get_provider_pools()["groq"].client
+    )
+
+@service_cache
+def get_tts_service():
+    from services.tts_service import ElevenLabsService
+    return ElevenLabsService(
+        api_key=settings.ELEVENLABS_API_KEY,
+        voice_id=settings.elevenlabs_voice_id,
+        http_client=get_provider_pools()["elevenlabs"].client
+    )
+
+@service_cache
+def get_recording_store():
+    from services.recording_service import RecordingStore
+    return RecordingStore(
+        root=settings.recording_dir,
+        segment_seconds=settings.recording_segment_seconds,
+        bitrate=settings.recording_bitrate,
+        retention_days=settings.recording_retention_days,
+        max_total_bytes=settings.recording_max_bytes,
+        orphan_age=settings.max_call_duration
+    )
+
+@service_cache
+def get_analytics_service():
+    from services.analytics_service import AnalyticsService, AnalyticsStore
+    return AnalyticsService(
+        recording_root=settings.recording_dir,
+        store=AnalyticsStore(settings.analytics_db),
+        workers=settings.analytics_workers
+    )
+
+@service_cache
+def get_dsp_executor():
+    from services.dsp_executor import DSPExecutor
+    workers = settings.dsp_workers
+    if workers is None:
+        # Server workers share the CPUs; each gets its slice of DSP processes
+        workers = max(1, (os.cpu_count() or 1) // max(1, settings.server_workers))
+    return DSPExecutor(workers=workers, inline_samples=settings.dsp_inline_samples)
 
-llm_service = LLMService(
-    api_key=settings.GROQ_API_KEY,
-    model=settings.GROQ_MODEL
+@service_cache
+def get_phrase_synthesizer(voice_id: str):
+    from services.phrase_service import PhraseSynthesizer
+    return PhraseSynthesizer(
+        os.path.join(PHRASE_DIR, voice_id),
+        sample_rate=LIVEKIT_SAMPLE_RATE,
+        crossfade_ms=settings.phrase_crossfade_ms
+    )
+
+@service_cache
+def get_call_record_store():
+    from services.call_record_service import CallRecordStore
+    return CallRecordStore(
+        settings.call_records_db,
+        batch_size=settings.call_record_batch_size,
+        flush_interval=settings.call_record_flush_interval
+    )
+
+@service_cache
+def get_twilio_client():
+    from twilio.rest import Client
+    return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, region='us1')
+
+def warm_services():
+    """Import the provider SDKs and build every service"""
+    get_twilio_service()
+    get_livekit_service()
+    get_stt_service()
+    get_llm_service()
+    get_tts_service()
+    get_recording_store()
+    get_twilio_client()
+    from livekit import rtc  # noqa: F401 - used by stream_audio
+    import utils.resampler  # noqa: F401 - numpy, used by decode_audio
+    get_dsp_executor().warm([(TTS_SAMPLE_RATE, LIVEKIT_SAMPLE_RATE)])
+    if settings.phrase_synthesis:
+        get_phrase_synthesizer(settings.elevenlabs_voice_id).load()
+
+# Sample rates of the audio legs
+TWILIO_SAMPLE_RATE = 8000
+LIVEKIT_SAMPLE_RATE = 16000
+TTS_SAMPLE_RATE = 22050
+TTS_OUTPUT_FORMAT = f"pcm_{TTS_SAMPLE_RATE}"
+# The browser test page plays streamed replies as raw PCM through Web Audio
+TEST_AUDIO_SAMPLE_RATE = 16000
+TEST_AUDIO_FORMAT = f"pcm_{TEST_AUDIO_SAMPLE_RATE}"
+
+# Media modes: "direct" runs Twilio <-> STT/LLM/TTS with no LiveKit room;
+# "livekit" also mirrors both legs into a room for supervisors
+MEDIA_MODE_DIRECT = "direct"
+MEDIA_MODE_LIVEKIT = "livekit"
+MEDIA_MODES = (MEDIA_MODE_DIRECT, MEDIA_MODE_LIVEKIT)
+
+# Time from the Twilio stream starting to the greeting being queued, per mode
+setup_latency_stats = LatencyRegistry()
+
+# Time from the Twilio stream starting to the answering machine decision, per result
+amd_latency_stats = LatencyRegistry()
+
+# Dashboard fan-out: the call pipeline publishes, /ws/call/{call_id} subscribes
+call_events = CallEventHub(max_queue=settings.dashboard_queue_size)
+
+# Live call table; ending a call releases everything it owns
+call_tracker = CallLifecycleService(
+    idle_timeout=settings.call_idle_timeout,
+    max_call_duration=settings.max_call_duration
 )
 
-tts_service = ElevenLabsService(
-    api_key=settings.ELEVENLABS_API_KEY,
-    voice_id=settings.elevenlabs_voice_id
+# Silence, response and call-length timeouts of every call, on one loop task
+timers = TimerWheel(tick=settings.timer_tick)
+
+def provider_in_flight() -> dict:
+    """Requests waiting on each provider, for services that have been built"""
+    getters = {"stt": get_stt_service, "llm": get_llm_service, "tts": get_tts_service}
+    return {name: getter().in_flight.current for name, getter in getters.items() if getter.cache_info().currsize}
+
+# New calls are only taken while live load is under the limits
+loop_monitor = LoopLagMonitor(interval=settings.loop_lag_interval, block_threshold=settings.loop_block_threshold)
+profiler = SamplingProfiler()
+admission = AdmissionController(
+    active_calls=lambda: len(call_tracker.calls),
+    provider_in_flight=provider_in_flight,
+    loop_monitor=loop_monitor,
+    max_calls=settings.max_active_calls,
+    max_loop_lag_ms=settings.max_loop_lag_ms,
+    max_provider_in_flight=settings.max_provider_in_flight,
+    queue_size=settings.admission_queue_size,
+    queue_timeout=settings.admission_queue_timeout,
+    retry_after=settings.admission_retry_after
 )
 
-# Initialize Twilio client
-twilio_client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, region='us1')
+async def reserve_call_capacity():
+    """Dependency: wait for capacity and hold it until the call is registered"""
+    async with admission.admit():
+        yield
+
+# Post-call analytics jobs in flight
+analytics_tasks: set = set()
+
+async def analyze_finished_call(call_id: str):
+    """Compute post-call analytics for a call whose recording just closed"""
+    try:
+        await get_analytics_service().analyze(call_id)
+    except Exception as e:
+        logger.error(f"Error analyzing call {call_id}: {str(e)}")
+
+async def release_call_resources(record: CallRecord):
+    """Free the LiveKit room, conversation state and recording of an ended call"""
+    call_events.publish(record.call_id, {"type": "call_ended", "reason": record.end_reason})
+    call_events.close(record.call_id)
+    timers.cancel_call(record.call_id)
+    if record.room_name:
+        await get_livekit_service().release_room(record.room_name)
+    get_llm_service().clear_conversation(record.call_id)
+    get_call_record_store().end_call(record.call_id, record.status, record.end_reason)
+    if await get_recording_store().close(record.call_id) and settings.analytics_on_call_end:
+        task = asyncio.create_task(analyze_finished_call(record.call_id))
+        analytics_tasks.add(task)
+        task.add_done_callback(analytics_tasks.discard)
+
+async def sweep_orphaned_rooms(live_calls: set) -> int:
+    """Release rooms held by this worker that no live call owns"""
+    livekit_service = get_livekit_service()
+    orphans = [name for name in livekit_service.rooms if name.removeprefix("call-") not in live_calls]
+    for room_name in orphans:
+        await livekit_service.release_room(room_name)
+    return len(orphans)
+
+async def sweep_orphaned_conversations(live_calls: set) -> int:
+    """Clear idle conversation histories no live call owns"""
+    return get_llm_service().clear_idle_conversations(live_calls, settings.call_idle_timeout)
+
+async def sweep_recordings(live_calls: set) -> int:
+    """Close recordings no live call owns and apply retention limits"""
+    store = get_recording_store()
+    orphans = [call_id for call_id in store.open_recordings if call_id not in live_calls]
+    for call_id in orphans:
+        await store.close(call_id)
+    return len(orphans) + await store.run_io(store.sweep, live_calls)
+
+async def stop_media_stream(record: CallRecord):
+    """Stop a media stream still open when its call ended elsewhere"""
+    task = record.stream_task
+    if task is not None and task is not asyncio.current_task() and not task.done():
+        task.cancel()
+
+call_tracker.add_cleanup_hook(release_call_resources)
+# Last, since the task ending the call may be one the stream owns
+call_tracker.add_cleanup_hook(stop_media_stream)
+call_tracker.add_orphan_sweep(sweep_orphaned_rooms)
+call_tracker.add_orphan_sweep(sweep_orphaned_conversations)
+call_tracker.add_orphan_sweep(sweep_recordings)
+
+def handled_elsewhere(state: Optional[dict]) -> bool:
+    """Whether a stored call has ended or its media stream started, as seen from a worker without the stream"""
+    return state is not None and (
+        state["ended_at"] is not None or state["status"] in TERMINAL_TWILIO_STATUSES or state["status"] == "in-progress"
+    )
+
+async def sync_dialed_calls():
+    """
+    With several server workers, a call's status callbacks and media
+    stream can land on a worker other than the one that dialed it. Stop
+    tracking dialed calls here once the shared call records show they
+    ended or their stream started elsewhere, so they stop holding this
+    worker's capacity.
+    """
+    while True:
+        await asyncio.sleep(settings.call_sync_interval)
+        dialed = [call_id for call_id, record in call_tracker.calls.items() if record.stream_sid is None]
+        if not dialed:
+            continue
+        try:
+            states = await asyncio.to_thread(get_call_record_store().get_states, dialed)
+        except Exception as e:
+            logger.error(f"Error syncing dialed calls: {str(e)}")
+            continue
+        for call_id in dialed:
+            state = states.get(call_id)
+            record = call_tracker.get(call_id)
+            if record is None or record.stream_sid is not None or not handled_elsewhere(state):
+                continue
+            call_tracker.forget(call_id)
+            if state["ended_at"] is not None or state["status"] in TERMINAL_TWILIO_STATUSES:
+                call_events.publish(call_id, {"type": "call_ended", "reason": f"twilio:{state['status']}"})
+                call_events.close(call_id)
+
+call_sync_task: Optional[asyncio.Task] = None
 
 # Create audio directory if it doesn't exist
 AUDIO_DIR = "audio_files"
-GREETING_FILE = os.path.join(AUDIO_DIR, "greeting.mp3")
+GREETING_FILE = os.path.join(AUDIO_DIR, "greeting.wav")
+# Named after the message text so editing the setting re-renders it
+VOICEMAIL_FILE = os.path.join(
+    AUDIO_DIR, f"voicemail-{hashlib.sha1(settings.amd_voicemail_message.encode()).hexdigest()[:8]}.wav"
+)
+# Cached amount and date fragments, one directory per voice
+PHRASE_DIR = os.path.join(AUDIO_DIR, "phrases")
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
-@app.on_event("startup")
+# Background startup work, keyed by name; /readyz reports on these
+startup_tasks: dict[str, asyncio.Task] = {}
+
+# Decoded greeting and voicemail samples, shared by every call; under the
+# prefork launcher they are decoded once, before the workers are forked
+prompt_audio: dict[str, "np.ndarray"] = {}
+
+def save_prompt_audio(path: str, pcm: bytes):
+    """Write rendered prompt audio as WAV; workers starting together may render the same prompt"""
+    partial = f"{path}.{os.getpid()}.partial"
+    with open(partial, "wb") as f:
+        f.write(pcm_to_wav(pcm, TTS_SAMPLE_RATE))
+    os.replace(partial, path)
+
+async def get_prompt_audio(path: str) -> "np.ndarray":
+    """Samples of a prompt file, decoded on first use"""
+    samples = prompt_audio.get(path)
+    if samples is None:
+        with open(path, "rb") as f:
+            samples = await decode_audio(f.read(), sample_rate=LIVEKIT_SAMPLE_RATE)
+        if samples.size:
+            samples.setflags(write=False)
+            prompt_audio[path] = samples
+    return samples
+
+def preload():
+    """
+    Work the prefork launcher does once before forking, so every worker
+    shares it: import the SDKs, build the resampling filters and decode the
+    prompts. Nothing that owns a thread, socket or database handle is built.
+    """
+    from livekit import rtc  # noqa: F401 - used by stream_audio
+    from twilio.rest import Client  # noqa: F401 - used by get_twilio_client
+    import services.twilio_service, services.livekit_service, services.stt_service  # noqa: F401
+    import services.llm_service, services.tts_service, services.recording_service  # noqa: F401
+    from utils.resampler import get_filter_bank
+    get_filter_bank(TTS_SAMPLE_RATE, LIVEKIT_SAMPLE_RATE)  # replies
+    get_filter_bank(TWILIO_SAMPLE_RATE, LIVEKIT_SAMPLE_RATE)  # caller audio
+    get_filter_bank(LIVEKIT_SAMPLE_RATE, TWILIO_SAMPLE_RATE)  # agent audio to Twilio
+    for path in (GREETING_FILE, VOICEMAIL_FILE):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                samples = convert_audio_to_samples(f.read(), sample_rate=LIVEKIT_SAMPLE_RATE)
+            samples.setflags(write=False)
+            prompt_audio[path] = samples
+            logger.info("Preloaded %s (%d samples)", path, samples.size)
+    if settings.phrase_synthesis:
+        missing = get_phrase_synthesizer(settings.elevenlabs_voice_id).load()
+        logger.info("Preloaded phrase fragments (%d missing)", missing)
+
 async def generate_greeting():
-    """Generate greeting audio file on startup if it doesn't exist"""
+    """Generate greeting audio file if it doesn't exist"""
+    await startup_tasks["services"]
     if not os.path.exists(GREETING_FILE):
         logger.info("Generating greeting audio file...")
         greeting = "Hello, I am your AI debt collection agent. How can I help you today?"
-        audio_response = await tts_service.text_to_speech(greeting)
+        try:
+            audio_response = await get_tts_service().text_to_speech(greeting, output_format=TTS_OUTPUT_FORMAT)
+        except Exception as e:
+            logger.error(f"Failed to generate greeting: {str(e)}")
+            raise
         if audio_response:
-            with open(GREETING_FILE, "wb") as f:
-                f.write(audio_response)
+            save_prompt_audio(GREETING_FILE, audio_response)
             logger.info(f"Saved greeting audio to {GREETING_FILE}")
 
-def convert_audio_to_samples(audio_data: bytes, sample_rate: int = 16000) -> np.ndarray:
-    """Convert audio bytes to numpy array of samples"""
+async def generate_voicemail_message():
+    """Render the message left on answering machines if it doesn't exist"""
+    await startup_tasks["services"]
+    if not os.path.exists(VOICEMAIL_FILE):
+        logger.info("Generating voicemail message audio file...")
+        try:
+            audio_response = await get_tts_service().text_to_speech(
+                settings.amd_voicemail_message, output_format=TTS_OUTPUT_FORMAT
+            )
+        except Exception as e:
+            logger.error(f"Failed to generate voicemail message: {str(e)}")
+            raise
+        if audio_response:
+            save_prompt_audio(VOICEMAIL_FILE, audio_response)
+            logger.info(f"Saved voicemail message audio to {VOICEMAIL_FILE}")
+
+async def generate_phrase_fragments():
+    """Render the phrase fragments of the configured voice that aren't cached yet"""
+    await startup_tasks["services"]
+    await get_phrase_synthesizer(settings.elevenlabs_voice_id).render_missing(
+        partial(get_tts_service().text_to_speech, output_format=TTS_OUTPUT_FORMAT),
+        source_rate=TTS_SAMPLE_RATE
+    )
+
+async def warm_provider_connections():
+    """Open keep-alive connections to every provider before the first call and keep them warm"""
+    await startup_tasks["services"]
+    pools = get_provider_pools()
+    await asyncio.gather(*(pool.warm() for pool in pools.values()))
+    for pool in pools.values():
+        pool.start(settings.provider_probe_interval)
+
+@app.on_event("startup")
+async def startup_event():
+    """Schedule host discovery, service warmup and greeting generation in the background"""
+    startup_tasks["app_host"] = asyncio.create_task(update_app_host())
+    startup_tasks["services"] = asyncio.create_task(asyncio.to_thread(warm_services))
+    startup_tasks["connections"] = asyncio.create_task(warm_provider_connections())
+    startup_tasks["greeting"] = asyncio.create_task(generate_greeting())
+    if settings.amd_enabled and settings.amd_machine_action == "message":
+        startup_tasks["voicemail"] = asyncio.create_task(generate_voicemail_message())
+    if settings.phrase_synthesis:
+        startup_tasks["phrases"] = asyncio.create_task(generate_phrase_fragments())
+    get_call_record_store().start()
+    loop_monitor.start()
+    timers.start()
+    call_tracker.start_reaper(settings.reaper_interval)
+    if settings.server_workers > 1:
+        global call_sync_task
+        call_sync_task = asyncio.create_task(sync_dialed_calls())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background work"""
+    # Startup work still talking to providers, e.g. rendering phrase fragments
+    for task in startup_tasks.values():
+        task.cancel()
+    await asyncio.gather(*startup_tasks.values(), return_exceptions=True)
+    await call_tracker.stop_reaper()
+    if call_sync_task is not None:
+        call_sync_task.cancel()
+    await loop_monitor.stop()
+    await timers.stop()
+    await get_call_record_store().close()
+    if get_provider_pools.cache_info().currsize:
+        await asyncio.gather(*(pool.close() for pool in get_provider_pools().values()))
+    if get_analytics_service.cache_info().currsize:
+        get_analytics_service().shutdown()
+    if get_dsp_executor.cache_info().currsize:
+        get_dsp_executor().shutdown()
+    if get_recording_store.cache_info().currsize:
+        await asyncio.to_thread(get_recording_store().shutdown)
+
+def _startup_task_status(name: str) -> str:
+    task = startup_tasks.get(name)
+    if task is None or not task.done():
+        return "pending"
+    if task.cancelled() or task.exception() is not None:
+        return "failed"
+    return "done"
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        {"detail": "Worker is at capacity, retry later", "reason": exc.reason},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: the event loop is serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe: services are built, provider connections are warm and the greeting audio exists"""
+    checks = {name: _startup_task_status(name) for name in startup_tasks}
+    ready = checks["services"] == "done" and checks["connections"] == "done" and os.path.exists(GREETING_FILE)
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", "checks": checks},
+        status_code=200 if ready else 503
+    )
+
+def pcm_to_wav(pcm: bytes, sample_rate: int, channels: int = 1) -> bytes:
+    """Wrap raw 16-bit PCM in a WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+def split_audio(audio_data: bytes, source_rate: Optional[int] = None) -> Tuple["np.ndarray", int, Optional[int]]:
+    """
+    Return the interleaved int16 samples, channel count and sample rate of
+    WAV or raw PCM bytes. Raw PCM is mono at source_rate.
+    """
+    import numpy as np
+
     try:
         # Try to read as WAV first
         with wave.open(io.BytesIO(audio_data), 'rb') as wav_file:
-            # Get audio parameters
-            n_channels = wav_file.getnchannels()
-            sample_width = wav_file.getsampwidth()
-            n_frames = wav_file.getnframes()
-            
-            # Read frames and convert to numpy array
-            frames = wav_file.readframes(n_frames)
-            samples = np.frombuffer(frames, dtype=np.int16)
-            
-            # Reshape if stereo
-            if n_channels == 2:
-                samples = samples.reshape(-1, 2).mean(axis=1)
-            
-            return samples.astype(np.int16)
+            frames = wav_file.readframes(wav_file.getnframes())
+            return np.frombuffer(frames, dtype=np.int16), wav_file.getnchannels(), wav_file.getframerate()
     except:
-        # If not WAV, assume raw PCM
-        try:
-            # Ensure buffer size is even (2 bytes per sample)
-            if len(audio_data) % 2 != 0:
-                audio_data = audio_data[:-1]
-            
-            samples = np.frombuffer(audio_data, dtype=np.int16)
-            return samples.astype(np.int16)
-        except Exception as e:
-            logger.error(f"Error converting audio to samples: {str(e)}")
-            # Return empty array with correct dtype
-            return np.array([], dtype=np.int16)
+        # If not WAV, assume raw PCM; ensure buffer size is even (2 bytes per sample)
+        usable = len(audio_data) - len(audio_data) % 2
+        return np.frombuffer(audio_data, dtype=np.int16, count=usable // 2), 1, source_rate
+
+def convert_audio_to_samples(audio_data: bytes, sample_rate: int = 16000, source_rate: Optional[int] = None) -> "np.ndarray":
+    """
+    Convert audio bytes to mono int16 samples at sample_rate.
+    
+    WAV input is resampled from its header rate; raw PCM is assumed to be
+    at source_rate (or already at sample_rate if source_rate is None).
+    """
+    import numpy as np
+    from utils.resampler import convert_clip
+
+    try:
+        samples, channels, rate = split_audio(audio_data, source_rate)
+        return convert_clip(samples, channels, rate or sample_rate, sample_rate)
+    except Exception as e:
+        logger.error(f"Error converting audio to samples: {str(e)}")
+        # Return empty array with correct dtype
+        return np.array([], dtype=np.int16)
+
+async def decode_audio(audio_data: bytes, sample_rate: int = 16000, source_rate: Optional[int] = None) -> "np.ndarray":
+    """
+    convert_audio_to_samples for live calls: mixing and resampling run on
+    the DSP process pool so other calls' frames keep flowing meanwhile
+    """
+    import numpy as np
+    from utils.resampler import convert_clip, converted_length
+
+    try:
+        samples, channels, rate = split_audio(audio_data, source_rate)
+        rate = rate or sample_rate
+        return await get_dsp_executor().run(
+            convert_clip, samples, converted_length(samples.size, channels, rate, sample_rate),
+            channels=channels, in_rate=rate, out_rate=sample_rate
+        )
+    except Exception as e:
+        logger.error(f"Error converting audio to samples: {str(e)}")
+        return np.array([], dtype=np.int16)
 
 class CallRequest(BaseModel):
     phone_number: str
     amount: float
     due_date: str
     account_number: Optional[str] = None
+    campaign: Optional[str] = None
+    media_mode: Optional[str] = None  # "direct" or "livekit"; defaults to settings.media_mode
 
 class TestLLMRequest(BaseModel):
     transcript: str
@@ -184,29 +668,250 @@ class STTRequest(BaseModel):
     audio_data: str  # base64 encoded audio data
     file_name: str
 
+class STTBatchRequest(BaseModel):
+    urls: List[str] = []  # recordings Deepgram can fetch directly
+    paths: List[str] = []  # recordings relative to the audio directory
+
+@app.get("/api/calls/live")
+async def get_live_calls():
+    """Live call table plus counters for state that should track it"""
+    return {
+        "calls": [record.to_dict() for record in call_tracker.calls.values()],
+        "ended": call_tracker.ended_count,
+        "livekit_rooms": len(get_livekit_service().rooms),
+        "conversations": len(get_llm_service().conversation_history),
+        "recordings": get_recording_store().stats(),
+        "call_records": get_call_record_store().stats(),
+        "timers": timers.summary(),
+    }
+
+@app.get("/api/capacity")
+async def get_capacity():
+    """Whether this worker is taking new calls, and the load signals behind it"""
+    return admission.capacity()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency: /admin endpoints need admin_token in X-Admin-Token, and are off while it is unset"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/loop", dependencies=[Depends(require_admin)])
+async def get_loop_health():
+    """Event-loop lag and the stacks of recent callbacks that blocked it"""
+    return {**loop_monitor.summary(), "reports": loop_monitor.blocked_reports()}
+
+@app.post("/admin/profiler/start", dependencies=[Depends(require_admin)])
+async def start_profiler(seconds: float = 30.0, interval_ms: float = 10.0):
+    """Sample every thread's stack for a while; fetch the result from /admin/profiler/result"""
+    if not 0 < seconds <= settings.profiler_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {settings.profiler_max_seconds}]")
+    try:
+        profiler.start(seconds, max(interval_ms, 1.0) / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.status()
+
+@app.post("/admin/profiler/stop", dependencies=[Depends(require_admin)])
+async def stop_profiler():
+    await asyncio.to_thread(profiler.stop)
+    return profiler.status()
+
+@app.get("/admin/profiler", dependencies=[Depends(require_admin)])
+async def get_profiler_status():
+    return profiler.status()
+
+@app.get("/admin/profiler/result", dependencies=[Depends(require_admin)])
+async def download_profile():
+    """Collapsed stacks of the last finished run, for flamegraph.pl or speedscope"""
+    if profiler.result is None:
+        raise HTTPException(status_code=404, detail="No finished profile")
+    name = datetime.fromtimestamp(profiler.started_at).strftime("profile-%Y%m%d-%H%M%S.txt")
+    return Response(
+        content=profiler.result,
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'}
+    )
+
+@app.get("/api/metrics/setup-latency")
+async def get_setup_latency():
+    """Call setup latency per media mode"""
+    return setup_latency_stats.summary()
+
+@app.get("/api/metrics/amd")
+async def get_amd_latency():
+    """Answering machine decisions and their latency per result"""
+    return amd_latency_stats.summary()
+
+@app.get("/api/metrics/connections")
+async def get_connection_reuse():
+    """Connection reuse, handshakes and keep-warm probes per provider"""
+    if not get_provider_pools.cache_info().currsize:
+        return {}
+    return {name: pool.summary() for name, pool in get_provider_pools().items()}
+
+@app.get("/api/metrics/dsp")
+async def get_dsp_usage():
+    """Audio conversions run inline and on the DSP process pool"""
+    return get_dsp_executor().summary()
+
+@app.get("/api/metrics/phrases")
+async def get_phrase_usage():
+    """Cached fragments and reply sentences spoken from them or left to TTS"""
+    if not get_phrase_synthesizer.cache_info().currsize:
+        return {}
+    return {
+        voice_id: get_phrase_synthesizer(voice_id).summary()
+        for voice_id in {settings.elevenlabs_voice_id, get_tts_service().voice_id}
+    }
+
+@app.get("/api/metrics/llm")
+async def get_llm_routing():
+    """Turns, latency and escalations per LLM model tier"""
+    return get_llm_service().router.summary()
+
+class AnalyticsBackfillRequest(BaseModel):
+    since: Optional[float] = None  # unix time
+    until: Optional[float] = None
+
+@app.get("/api/analytics")
+async def list_call_analytics(since: Optional[float] = None, until: Optional[float] = None, limit: int = 50, offset: int = 0):
+    """Post-call analytics for calls created in [since, until), newest first"""
+    store = get_analytics_service().store
+    return await asyncio.to_thread(store.query, since, until, min(limit, 500), offset)
+
+@app.get("/api/analytics/summary")
+async def call_analytics_summary(since: Optional[float] = None, until: Optional[float] = None):
+    """Aggregate talk, silence and interruption figures over a time range"""
+    store = get_analytics_service().store
+    return await asyncio.to_thread(store.summary, since, until)
+
+@app.get("/api/analytics/{call_id}")
+async def get_call_analytics(call_id: str):
+    result = await asyncio.to_thread(get_analytics_service().store.get, call_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No analytics for this call")
+    return result
+
+@app.post("/api/analytics/backfill")
+async def backfill_call_analytics(request: AnalyticsBackfillRequest):
+    """Queue analysis of every finished recording in the range that has none yet"""
+    analytics = get_analytics_service()
+    store = get_recording_store()
+    # Include recordings finished by other server workers
+    await store.run_io(store.refresh)
+    call_ids = await asyncio.to_thread(
+        analytics.pending, store.catalog,
+        request.since or 0, request.until or float("inf")
+    )
+    task = asyncio.create_task(analytics.analyze_many(call_ids))
+    analytics_tasks.add(task)
+    task.add_done_callback(analytics_tasks.discard)
+    return {"queued": len(call_ids)}
+
+def record_initiated_call(call_id: str, data: CallRequest, **fields):
+    """Persist the details of an outbound call we just placed"""
+    get_call_record_store().record_call(
+        call_id,
+        phone_number=data.phone_number,
+        campaign=data.campaign,
+        account_number=data.account_number,
+        amount=data.amount,
+        due_date=data.due_date,
+        status="initiated",
+        **fields
+    )
+
+@app.get("/api/call-records")
+async def list_call_records(
+    phone_number: Optional[str] = None,
+    campaign: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None
+):
+    """Stored calls, newest first; pass next_cursor back as cursor for the next page"""
+    store = get_call_record_store()
+    try:
+        return await asyncio.to_thread(
+            store.query_calls, phone_number, campaign, status, since, until, max(1, min(limit, 500)), cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/call-records/{call_id}")
+async def get_call_record(call_id: str):
+    result = await asyncio.to_thread(get_call_record_store().get_call, call_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Call not found")
+    return result
+
+@app.get("/api/call-records/{call_id}/turns")
+async def get_call_record_turns(call_id: str, after_seq: int = 0, limit: int = 200):
+    """A call's transcript in order; pass next_after_seq back as after_seq for the next page"""
+    store = get_call_record_store()
+    return await asyncio.to_thread(store.get_turns, call_id, after_seq, max(1, min(limit, 1000)))
+
+@app.get("/api/recordings/{call_id}")
+async def get_recording_index(call_id: str):
+    """Segment index of a finished call recording"""
+    try:
+        index = await asyncio.to_thread(get_recording_store().get_index, call_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if index is None:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    return index
+
+@app.get("/api/recordings/{call_id}/audio")
+async def get_recording_audio(call_id: str, track: str = "caller", start_ms: int = 0, duration_ms: Optional[int] = None):
+    """Decode a span of one track of a call recording as WAV"""
+    store = get_recording_store()
+    try:
+        index = await asyncio.to_thread(store.get_index, call_id)
+        if index is None or track not in index["tracks"]:
+            raise HTTPException(status_code=404, detail="Recording not found")
+        samples = await asyncio.to_thread(store.read, call_id, track, start_ms, duration_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rate = index["tracks"][track]["sample_rate"]
+    return Response(content=pcm_to_wav(samples.tobytes(), rate), media_type="audio/wav")
+
 @app.get("/")
 async def read_root():
     return FileResponse("static/index.html")
 
 @app.post("/api/call")
-async def initiate_call(data: CallRequest):
+async def initiate_call(data: CallRequest, _: None = Depends(reserve_call_capacity)):
     try:
         # Validate phone number format
         if not data.phone_number.startswith('+'):
             raise HTTPException(status_code=400, detail="Phone number must start with country code (e.g., +91)")
 
+        media_mode = data.media_mode or settings.media_mode
+        if media_mode not in MEDIA_MODES:
+            raise HTTPException(status_code=400, detail=f"media_mode must be one of {', '.join(MEDIA_MODES)}")
+
         # Generate a unique call ID
         call_id = str(uuid.uuid4())
         
         # Make the outbound call using Twilio
         try:
-            call = twilio_client.calls.create(
+            call = await asyncio.to_thread(
+                get_twilio_client().calls.create,
                 to=data.phone_number,
                 from_=settings.TWILIO_PHONE_NUMBER,
-                url=f"https://{settings.APP_HOST}/twiml/{call_id}"
+                url=f"https://{settings.APP_HOST}/twiml/{call_id}?media_mode={media_mode}",
+                status_callback=f"https://{settings.APP_HOST}/webhook/twilio/status",
+                status_callback_event=['initiated', 'ringing', 'answered', 'completed']
             )
+            call_tracker.register(call_id, twilio_sid=call.sid, media_mode=media_mode)
+            record_initiated_call(call_id, data, twilio_sid=call.sid, media_mode=media_mode)
             
-            return {"call_id": call_id, "status": "initiated", "twilio_sid": call.sid}
+            return {"call_id": call_id, "status": "initiated", "twilio_sid": call.sid, "media_mode": media_mode}
         except Exception as e:
             logger.error(f"Twilio call creation failed: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to create call: {str(e)}")
@@ -218,7 +923,7 @@ async def initiate_call(data: CallRequest):
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
 @app.post("/twiml/{call_id}")
-async def generate_twiml(call_id: str):
+async def generate_twiml(call_id: str, media_mode: Optional[str] = None):
     try:
         logger.info(f"Generating TwiML for call {call_id}")
         response = VoiceResponse()
@@ -227,7 +932,10 @@ async def generate_twiml(call_id: str):
         connect = Connect()
         stream_url = f"wss://{settings.APP_HOST}/stream/{call_id}"
         logger.info(f"Using WebSocket URL: {stream_url}")
-        connect.stream(url=stream_url)
+        stream = connect.stream(url=stream_url)
+        if media_mode in MEDIA_MODES:
+            # Passed back to /stream in the "start" message
+            stream.parameter(name="media_mode", value=media_mode)
         response.append(connect)
         
         # Add a fallback message
@@ -241,173 +949,548 @@ async def generate_twiml(call_id: str):
         response.say("An error occurred. Please try again later.", voice="Polly.Amy")
         return Response(content=str(response), media_type="application/xml")
 
+async def join_livekit_room(call_id: str):
+    """
+    Create the call's LiveKit room, connect as the agent and publish the
+    agent and caller audio tracks. Returns (room, agent_source, caller_source).
+    """
+    from livekit import rtc
+
+    # Generate LiveKit token
+    livekit_token = generate_livekit_token(call_id)
+    room_name = f"call-{call_id}"
+    
+    # Connect to LiveKit
+    logger.info(f"Connecting to LiveKit room {room_name}")
+    room = rtc.Room()
+    
+    # Use the LiveKit URL as provided
+    ws_url = settings.LIVEKIT_URL
+    if not ws_url.endswith('/rtc'):
+        ws_url = f"{ws_url}/rtc"
+        
+    logger.info(f"Connecting to LiveKit at: {ws_url}")
+    
+    # Create room first
+    try:
+        await get_livekit_service().create_room(room_name)
+        logger.info(f"Created LiveKit room: {room_name}")
+    except Exception as e:
+        logger.error(f"Failed to create LiveKit room: {str(e)}")
+        raise
+    
+    # Connect to room
+    try:
+        await room.connect(ws_url, livekit_token)
+        logger.info(f"Connected to LiveKit room {room_name}")
+    except Exception as e:
+        logger.error(f"Failed to connect to LiveKit room: {str(e)}")
+        raise
+    
+    # Create and publish audio tracks
+    try:
+        # Agent audio is paced by the playout buffer, so the source only
+        # ever needs to hold the lookahead window
+        audio_source = rtc.AudioSource(
+            sample_rate=LIVEKIT_SAMPLE_RATE,
+            num_channels=1,     # Mono audio for telephony
+            queue_size_ms=settings.playout_lookahead_ms * 2
+        )
+        
+        # Create audio track with source
+        audio_track = rtc.LocalAudioTrack.create_audio_track(
+            name=f"audio-{call_id}",
+            source=audio_source
+        )
+        logger.info("Created audio track")
+        
+        await room.local_participant.publish_track(audio_track)
+        logger.info(f"Published audio track for room {room_name}")
+        
+        # Caller audio arrives in real time and goes out on its own track
+        caller_source = rtc.AudioSource(sample_rate=LIVEKIT_SAMPLE_RATE, num_channels=1)
+        caller_track = rtc.LocalAudioTrack.create_audio_track(
+            name=f"caller-{call_id}",
+            source=caller_source
+        )
+        await room.local_participant.publish_track(caller_track)
+    except Exception as e:
+        logger.error(f"Failed to create/publish audio track: {str(e)}")
+        await room.disconnect()
+        raise
+    
+    get_livekit_service().rooms[room_name] = room
+    return room, audio_source, caller_source
+
+async def wait_for_stream_start(websocket: WebSocket) -> dict:
+    """Read Twilio media stream messages until the "start" message arrives"""
+    while True:
+        message = json.loads(await websocket.receive_text())
+        if message.get("event") == "start":
+            return message["start"]
+
+async def was_dialed(call_id: str) -> bool:
+    """Whether call_id is a live call placed by /api/call, on any server worker"""
+    try:
+        state = await asyncio.to_thread(get_call_record_store().get_call, call_id)
+    except Exception as e:
+        logger.error(f"Error looking up call {call_id}: {str(e)}")
+        return False
+    return state is not None and state["ended_at"] is None and state["status"] not in TERMINAL_TWILIO_STATUSES
+
 @app.websocket("/stream/{call_id}")
 async def stream_audio(websocket: WebSocket, call_id: str):
+    # Calls we dialed were admitted by /api/call, possibly on another server
+    # worker; any other stream needs capacity now
+    if call_tracker.get(call_id) is None and not await was_dialed(call_id):
+        reason = admission.refusal_reason()
+        if reason is not None:
+            logger.warning("Refusing media stream for call %s: %s", call_id, reason)
+            await websocket.close(code=1013)
+            return
+    with admission.pipelines.track():
+        await run_media_stream(websocket, call_id)
+
+async def run_media_stream(websocket: WebSocket, call_id: str):
     await websocket.accept()
-    logger.info(f"WebSocket connection accepted for call {call_id}")
+    logger.info("WebSocket connection accepted for call %s", call_id)
+    call_log = CallLoggerAdapter(logger, call_id)
+    frame_log = FrameLogSampler(logger, call_id, interval=settings.log_sample_interval)
     
+    from utils.resampler import Resampler
+    from utils.ring_buffer import AudioRingBuffer
+    from utils.vad import UtteranceDetector
+    from services.playout_service import PlayoutBuffer
+    from services.media_stream_service import TwilioMediaStream
+    from services.amd_service import AnsweringMachineDetector, MACHINE
+    from utils.text_segmenter import SentenceSegmenter
+    from services.llm_service import SILENCE_PROMPT
+
+    async def reply_played(name: str, latency: float):
+        call_log.info("Caller heard %s (acknowledged %.2fs after it was sent)", name, latency)
+        wait_for_caller()
+
+    playout = None
+    reply_task = None
+    turn_task = None
+    call_record = None
     try:
-        # Generate LiveKit token
-        livekit_token = generate_livekit_token(call_id)
-        room_name = f"call-{call_id}"
-        
-        # Connect to LiveKit
-        logger.info(f"Connecting to LiveKit room {room_name}")
-        room = rtc.Room()
-        
-        # Use the LiveKit URL as provided
-        ws_url = settings.LIVEKIT_URL
-        if not ws_url.endswith('/rtc'):
-            ws_url = f"{ws_url}/rtc"
-            
-        logger.info(f"Connecting to LiveKit at: {ws_url}")
+        # Agent audio goes back to the caller over the same websocket
+        twilio_stream = TwilioMediaStream(
+            websocket,
+            sample_rate=LIVEKIT_SAMPLE_RATE,
+            mark_interval_ms=settings.twilio_mark_interval_ms,
+            max_unacked_ms=settings.twilio_max_unacked_ms,
+            on_played=reply_played
+        )
+        start = await wait_for_stream_start(websocket)
+        setup_started = time.monotonic()
+        twilio_stream.start(start)
         
-        # Create room first
-        try:
-            await livekit_service.create_room(room_name)
-            logger.info(f"Created LiveKit room: {room_name}")
-        except Exception as e:
-            logger.error(f"Failed to create LiveKit room: {str(e)}")
-            raise
+        media_mode = start.get("customParameters", {}).get("media_mode") or settings.media_mode
+        call_log.info("Media mode: %s", media_mode)
+        call_events.publish(call_id, {"type": "status", "status": "in-progress", "media_mode": media_mode})
+        call_record = call_tracker.register(
+            call_id,
+            twilio_sid=start.get("callSid"),
+            stream_sid=start.get("streamSid"),
+            media_mode=media_mode,
+            room_name=f"call-{call_id}" if media_mode == MEDIA_MODE_LIVEKIT else None,
+            status="in-progress",
+            stream_task=asyncio.current_task()
+        )
+        recording = get_recording_store().open(call_id)
+        call_records = get_call_record_store()
+        call_records.record_call(call_id, status="in-progress", media_mode=media_mode)
+        details = await asyncio.to_thread(call_records.get_call, call_id)
+        if details and details.get("amount") is not None and details.get("due_date"):
+            from services.phrase_service import format_amount, format_date
+            get_llm_service().set_account(call_id, format_amount(details["amount"]), format_date(details["due_date"]))
         
-        # Connect to room
-        try:
-            await room.connect(ws_url, livekit_token)
-            logger.info(f"Connected to LiveKit room {room_name}")
-        except Exception as e:
-            logger.error(f"Failed to connect to LiveKit room: {str(e)}")
-            raise
+        send_room_frame = None
+        send_caller_frame = None
+        audio_source = None
+        if media_mode == MEDIA_MODE_LIVEKIT:
+            _, audio_source, caller_source = await join_livekit_room(call_id)
+            send_room_frame = get_livekit_service().audio_sink(audio_source)
+            send_caller_frame = get_livekit_service().audio_sink(caller_source)
         
-        # Create and publish audio track
-        try:
-            # Create audio source with required parameters
-            audio_source = rtc.AudioSource(
-                sample_rate=16000,  # Standard sample rate for telephony
-                num_channels=1      # Mono audio for telephony
-            )
-            
-            # Create audio track with source
-            audio_track = rtc.LocalAudioTrack.create_audio_track(
-                name=f"audio-{call_id}",
-                source=audio_source
+        # Every agent frame goes to the caller, and to the room if there is one
+        async def send_agent_frame(frame):
+            recording.write("agent", frame, LIVEKIT_SAMPLE_RATE)
+            if send_room_frame is not None:
+                await send_room_frame(frame)
+            await twilio_stream.send_frame(frame)
+        
+        async def clear_agent_audio():
+            if audio_source is not None:
+                audio_source.clear_queue()
+            await twilio_stream.clear()
+        
+        playout = PlayoutBuffer(
+            send_agent_frame,
+            sample_rate=LIVEKIT_SAMPLE_RATE,
+            frame_ms=settings.playout_frame_ms,
+            lookahead_ms=settings.playout_lookahead_ms,
+            on_flush=clear_agent_audio,
+            on_mark=twilio_stream.send_mark,
+            name=call_id
+        )
+        playout.start()
+        
+        async def send_greeting():
+            try:
+                samples = await get_prompt_audio(GREETING_FILE)
+                playout.write(samples, mark="greeting")
+                call_log.info("Queued initial greeting")
+            except Exception as e:
+                logger.error(f"Failed to send greeting: {str(e)}")
+                raise
+        
+        async def hang_up(reason: str):
+            try:
+                await get_twilio_service().end_call(start.get("callSid"))
+            except Exception as e:
+                call_log.error("Failed to hang up: %s", e)
+            await call_tracker.end(call_id, reason)
+        
+        # Per-call timeouts live on the shared timer wheel
+        silence_reprompts = 0
+        timers.arm(call_id, "max_duration", settings.max_call_duration, lambda: hang_up("max_duration"))
+        
+        def wait_for_caller():
+            # The caller's turn starts once the agent has nothing left to say;
+            # the mark of the last audio re-arms it as the caller hears it
+            if (reply_task is None or reply_task.done()) and not playout.queued_ms:
+                timers.arm(call_id, "silence", settings.silence_reprompt_seconds, on_silence)
+        
+        def start_reply(text: str, confidence: Optional[float] = None, stt_ms: Optional[int] = None):
+            nonlocal reply_task
+            timers.cancel(call_id, "silence")
+            timers.arm(call_id, "response", settings.response_timeout, on_response_timeout)
+            reply_task = asyncio.create_task(speak_reply(text, confidence, stt_ms))
+        
+        async def on_silence():
+            nonlocal silence_reprompts
+            if silence_reprompts >= settings.max_silence_reprompts:
+                call_log.info("No answer to %d reprompts, hanging up", silence_reprompts)
+                await hang_up("silence")
+                return
+            silence_reprompts += 1
+            call_log.info("Caller silent for %.1fs, reprompting", settings.silence_reprompt_seconds)
+            recording.add_event("silence_reprompt", count=silence_reprompts)
+            start_reply(SILENCE_PROMPT)
+        
+        async def on_response_timeout():
+            call_log.warning("No reply audio %.1fs after the caller's turn, abandoning it", settings.response_timeout)
+            recording.add_event("response_timeout", timeout=settings.response_timeout)
+            await cancel_reply()
+            wait_for_caller()
+        
+        # Setup latency stops once the pipeline can play audio; time spent
+        # listening for an answering machine is in amd_latency_stats
+        setup_latency = time.monotonic() - setup_started
+        setup_latency_stats.record(media_mode, setup_latency)
+        call_log.info("Call pipeline ready (%s setup took %.3fs)", media_mode, setup_latency)
+        
+        # With AMD on, nobody is greeted (and no STT/LLM/TTS runs) until the
+        # first seconds of caller audio say a person answered
+        amd = None
+        voicemail_queued = False
+        if settings.amd_enabled:
+            amd = AnsweringMachineDetector(
+                sample_rate=TWILIO_SAMPLE_RATE,
+                initial_silence_ms=settings.amd_initial_silence_ms,
+                greeting_ms=settings.amd_greeting_ms,
+                max_ms=settings.amd_max_ms
             )
-            logger.info("Created audio track")
-            
-            await room.local_participant.publish_track(audio_track)
-            logger.info(f"Published audio track for room {room_name}")
-        except Exception as e:
-            logger.error(f"Failed to create/publish audio track: {str(e)}")
-            raise
+        else:
+            await send_greeting()
         
-        # Send initial greeting
-        try:
-            # Read greeting from file
-            with open(GREETING_FILE, "rb") as f:
-                audio_response = f.read()
+        # Twilio audio arrives at 8 kHz; keep filter state across frames
+        inbound_resampler = Resampler(TWILIO_SAMPLE_RATE, LIVEKIT_SAMPLE_RATE)
+        
+        # Caller audio is decoded once into a fixed per-call ring; everything
+        # downstream reads views of it, and STT gets each utterance once it ends
+        caller_audio = AudioRingBuffer(int((settings.max_utterance_seconds + 2) * TWILIO_SAMPLE_RATE))
+        utterances = UtteranceDetector(
+            caller_audio,
+            sample_rate=TWILIO_SAMPLE_RATE,
+            silence_ms=int(settings.silence_threshold * 1000),
+            max_utterance_ms=int(settings.max_utterance_seconds * 1000)
+        )
+        
+        reply_count = 0
+        
+        async def speak_reply(transcription: str, confidence: Optional[float], stt_ms: Optional[int]):
+            """
+            Stream the LLM reply sentence by sentence into TTS and queue each
+            sentence's audio, in order, as soon as it is synthesized
+            """
+            nonlocal reply_count
+            reply_count += 1
+            reply_id = reply_count
+            started = time.monotonic()
+            timings = {"stt_ms": stt_ms} if stt_ms is not None else {}
+            parts = []
             
-            # Save a copy with timestamp for this call
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            greeting_file = os.path.join(AUDIO_DIR, f"{call_id}_greeting_{timestamp}.mp3")
-            with open(greeting_file, "wb") as f:
-                f.write(audio_response)
-            logger.info(f"Saved greeting audio to {greeting_file}")
+            async def reply_segments():
+                segmenter = SentenceSegmenter()
+                async for token in get_llm_service().generate_response_stream(transcription, call_id, confidence):
+                    parts.append(token)
+                    for segment in segmenter.push(token):
+                        timings.setdefault("llm_ms", round((time.monotonic() - started) * 1000))
+                        yield segment
+                tail = segmenter.flush()
+                if tail:
+                    timings.setdefault("llm_ms", round((time.monotonic() - started) * 1000))
+                    yield tail
             
-            # Convert audio to samples and push to source
-            samples = convert_audio_to_samples(audio_response)
-            audio_source.push_data(samples, sample_rate=16000)
-            logger.info("Sent initial greeting")
-        except Exception as e:
-            logger.error(f"Failed to send greeting: {str(e)}")
-            raise
+            segments = 0
+            tts = get_tts_service()
+            phrases = get_phrase_synthesizer(tts.voice_id) if settings.phrase_synthesis else None
+            try:
+                async for text, audio_response in tts.synthesize_segments(
+                    reply_segments(),
+                    output_format=TTS_OUTPUT_FORMAT,
+                    concurrency=settings.tts_concurrency,
+                    prerendered=phrases.render if phrases else None
+                ):
+                    if "tts_ms" not in timings:
+                        timings["tts_ms"] = round((time.monotonic() - started) * 1000) - timings["llm_ms"]
+                    if len(audio_response):
+                        # Sentences built from cached fragments arrive as samples
+                        if isinstance(audio_response, bytes):
+                            samples = await decode_audio(audio_response, sample_rate=LIVEKIT_SAMPLE_RATE, source_rate=TTS_SAMPLE_RATE)
+                        else:
+                            samples = audio_response
+                        playout.write(samples, mark=f"reply-{reply_id}.{segments}")
+                        timers.cancel(call_id, "response")
+                    segments += 1
+                    call_log.debug("Queued reply %d segment %d: %s", reply_id, segments, text)
+            except Exception as e:
+                call_log.error("Error generating reply: %s", e)
+                return
+            
+            response = "".join(parts).strip()
+            if response:
+                call_log.info("Generated response in %d segments (%s): %s", segments, timings, response)
+                call_events.publish(call_id, {"type": "response", "speaker": "agent", "text": response})
+                call_records.record_turn(call_id, "agent", response)
+                recording.add_event("turn", speaker="agent", text=response, segments=segments, **timings)
+        
+        async def cancel_reply():
+            if reply_task is not None and not reply_task.done():
+                reply_task.cancel()
+                try:
+                    await reply_task
+                except asyncio.CancelledError:
+                    pass
+        
+        async def take_turn(data: bytes, previous: Optional[asyncio.Task]):
+            """
+            Transcribe one finished caller utterance and reply to it. Runs
+            beside the receive loop so media and marks keep flowing while
+            Deepgram works; turns still complete in the order they were spoken.
+            """
+            nonlocal silence_reprompts
+            if previous is not None:
+                try:
+                    await asyncio.wait([previous])
+                except asyncio.CancelledError:
+                    previous.cancel()
+                    raise
+            try:
+                stage_started = time.monotonic()
+                transcription, confidence = await get_stt_service().transcribe_with_confidence(data)
+            except Exception as e:
+                call_log.error("Error transcribing utterance: %s", e)
+                wait_for_caller()
+                return
+            if transcription:
+                stt_ms = round((time.monotonic() - stage_started) * 1000)
+                call_log.info("Transcription: %s", transcription)
+                call_events.publish(call_id, {"type": "transcript", "speaker": "customer", "text": transcription})
+                recording.add_event("transcript", speaker="customer", text=transcription)
+                call_records.record_turn(call_id, "customer", transcription)
+                
+                # Caller talked over the agent: stop the current reply
+                if (reply_task is not None and not reply_task.done()) or playout.is_speaking:
+                    call_log.info("Caller interrupted agent at %.2fs", playout.position)
+                    await cancel_reply()
+                    await playout.flush()
+                
+                # The reply runs alongside the receive loop so marks and barge-in keep flowing
+                silence_reprompts = 0
+                start_reply(transcription, confidence, stt_ms)
+            else:
+                # Only noise: the caller still owes us a turn
+                wait_for_caller()
         
         # Handle audio streaming
         while True:
             try:
-                data = await websocket.receive_bytes()
-                logger.info(f"Received {len(data)} bytes from Twilio")
+                message = json.loads(await websocket.receive_text())
+                event = message.get("event")
+                if event == "mark":
+                    await twilio_stream.handle_mark(message["mark"]["name"])
+                    if message["mark"]["name"] == "voicemail":
+                        call_log.info("Voicemail message left, hanging up")
+                        await hang_up("voicemail_left")
+                        break
+                    continue
+                if event == "stop":
+                    call_log.info("Twilio media stream stopped")
+                    break
+                if event != "media":
+                    continue
+                
+                call_tracker.touch(call_id)
+                payload = base64.b64decode(message["media"]["payload"])
+                frame_log.debug("Received %d bytes from Twilio", len(payload))
+                pcm = caller_audio.write_ulaw(payload)
+                
+                # Record incoming audio
+                timestamp = message["media"].get("timestamp")
+                recording.write("caller", pcm, TWILIO_SAMPLE_RATE, at_ms=int(timestamp) if timestamp is not None else None)
+                
+                # Resample and forward to the caller track
+                if send_caller_frame is not None:
+                    samples = inbound_resampler.process(pcm)
+                    if samples.size:
+                        await send_caller_frame(samples)
                 
-                # Save incoming audio
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                incoming_file = os.path.join(AUDIO_DIR, f"{call_id}_incoming_{timestamp}.wav")
-                with open(incoming_file, "wb") as f:
-                    f.write(data)
-                logger.info(f"Saved incoming audio to {incoming_file}")
+                if amd is not None:
+                    if amd.result is None:
+                        if amd.feed(pcm) is None:
+                            continue
+                        decision_latency = time.monotonic() - setup_started
+                        amd_latency_stats.record(amd.result, decision_latency)
+                        summary = amd.summary()
+                        call_log.info(
+                            "Answering machine detection: %s (%s) after %d ms of audio, %.3fs since stream start",
+                            amd.result, amd.reason, amd.decision_ms, decision_latency
+                        )
+                        recording.add_event("amd", latency_ms=round(decision_latency * 1000), **summary)
+                        call_events.publish(call_id, {"type": "amd", "latency_ms": round(decision_latency * 1000), **summary})
+                        if amd.result != MACHINE:
+                            amd = None
+                            # Whatever they said while AMD listened is not a turn
+                            utterances.reset()
+                            await send_greeting()
+                            continue
+                        if settings.amd_machine_action != "message" or not os.path.exists(VOICEMAIL_FILE):
+                            await hang_up("answering_machine")
+                            break
+                    elif not voicemail_queued:
+                        # The decision frame was fed above
+                        amd.feed(pcm)
+                    # Leave the message once the machine's greeting is over
+                    if not voicemail_queued:
+                        if amd.message_ready:
+                            samples = await get_prompt_audio(VOICEMAIL_FILE)
+                            playout.write(samples, mark="voicemail")
+                            voicemail_queued = True
+                            call_log.info("Leaving voicemail message")
+                    continue
                 
-                # Convert audio to samples and push to source
-                samples = convert_audio_to_samples(data)
-                audio_source.push_data(samples, sample_rate=16000)
+                utterance = utterances.poll()
+                if utterances.in_utterance:
+                    # No reprompt while the caller is talking
+                    timers.cancel(call_id, "silence")
+                if utterance is None:
+                    continue
                 
-                # Process audio with Deepgram
-                transcription = await stt_service.transcribe(data)
-                if transcription:
-                    logger.info(f"Transcription: {transcription}")
-                    
-                    # Generate response
-                    response = await llm_service.generate_response(transcription, call_id)
-                    if response:
-                        logger.info(f"Generated response: {response}")
-                        
-                        # Convert to speech and send
-                        audio_response = await tts_service.text_to_speech(response)
-                        if audio_response:
-                            # Save response audio
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            response_file = os.path.join(AUDIO_DIR, f"{call_id}_response_{timestamp}.mp3")
-                            with open(response_file, "wb") as f:
-                                f.write(audio_response)
-                            logger.info(f"Saved response audio to {response_file}")
-                            
-                            # Convert audio to samples and push to source
-                            samples = convert_audio_to_samples(audio_response)
-                            audio_source.push_data(samples, sample_rate=16000)
-                            logger.info("Sent audio response")
+                # Hand the finished utterance to Deepgram without blocking the loop;
+                # the WAV copy is taken now, before the ring buffer moves on
+                data = pcm_to_wav(caller_audio.window(*utterance), TWILIO_SAMPLE_RATE)
+                turn_task = asyncio.create_task(take_turn(data, turn_task))
                 
             except WebSocketDisconnect:
-                logger.info(f"WebSocket disconnected for call {call_id}")
+                call_log.info("WebSocket disconnected")
                 break
             except Exception as e:
-                logger.error(f"Error in audio streaming: {str(e)}")
+                call_log.error("Error in audio streaming: %s", e)
                 break
                 
+    except asyncio.CancelledError:
+        if call_record is None or call_record.ended_at is None:
+            raise
+        # Stopped by stop_media_stream: the call was ended by a status
+        # callback, a timer or the reaper while Twilio kept streaming
+        asyncio.current_task().uncancel()
+        call_log.info("Call ended (%s), closing media stream", call_record.end_reason)
     except Exception as e:
         logger.error(f"Error in stream_audio: {str(e)}")
-        # Try to clean up
-        try:
-            await livekit_service.cleanup_room(room_name)
-        except:
-            pass
     finally:
+        if call_record is not None:
+            # Closing anyway: nothing should cancel the teardown below
+            call_record.stream_task = None
+        if turn_task is not None:
+            turn_task.cancel()
+        if reply_task is not None:
+            reply_task.cancel()
+        if playout is not None:
+            await playout.close()
+        # Releases the LiveKit room and conversation state
+        await call_tracker.on_stream_closed(call_id)
         try:
-            await room.disconnect()
+            await websocket.close()
         except:
             pass
-        await websocket.close()
         logger.info(f"Cleaned up WebSocket connection for call {call_id}")
 
 @app.websocket("/ws/call/{call_id}")
 async def websocket_endpoint(websocket: WebSocket, call_id: str):
     await websocket.accept()
+    record = call_tracker.get(call_id)
+    if record is None:
+        # Ended, unknown, or live on another server worker: report what the
+        # call records know and close rather than wait for events that never come
+        try:
+            stored = await asyncio.to_thread(get_call_record_store().get_call, call_id)
+            await websocket.send_json({"type": "status", "status": stored["status"] if stored else "unknown"})
+            if stored and stored["ended_at"] is not None:
+                await websocket.send_json({"type": "call_ended", "reason": stored["end_reason"]})
+            await websocket.close()
+        except Exception as e:
+            logger.error(f"Error in websocket_endpoint: {str(e)}")
+        return
+    
+    subscriber = call_events.subscribe(call_id)
     
+    async def forward():
+        # Forward the call's events until it ends
+        while True:
+            message = await subscriber.next()
+            if message is None:
+                return
+            await websocket.send_text(message)
+    
+    async def watch_client():
+        # Viewers send nothing; reading is how a disconnect is noticed
+        while True:
+            await websocket.receive_text()
+    
+    tasks = []
     try:
-        # Connect to LiveKit for real-time updates
-        livekit_url = settings.LIVEKIT_URL
-        livekit_token = generate_livekit_token(call_id)
-        
-        async with websockets.connect(livekit_url) as ws:
-            # Send authentication
-            await ws.send(json.dumps({
-                "type": "auth",
-                "token": livekit_token
-            }))
-            
-            # Forward messages to the client
-            while True:
-                message = await ws.recv()
-                await websocket.send_text(message)
-                
+        await websocket.send_json({"type": "status", "status": record.status})
+        tasks = [asyncio.create_task(forward()), asyncio.create_task(watch_client())]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        print(f"Error in websocket_endpoint: {e}")
-        await websocket.close()
+        logger.error(f"Error in websocket_endpoint: {str(e)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        call_events.unsubscribe(subscriber)
+        try:
+            await websocket.close()
+        except:
+            pass
 
 def generate_livekit_token(call_id: str) -> str:
     """
@@ -452,14 +1535,29 @@ def generate_livekit_token(call_id: str) -> str:
         raise
 
 @app.post("/webhook/twilio")
+@app.post("/webhook/twilio/status")
 async def twilio_webhook(request: Request):
     try:
         form_data = await request.form()
         call_sid = form_data.get("CallSid")
         event_type = form_data.get("EventType")
+        call_status = form_data.get("CallStatus")
+        
+        logger.info("Received Twilio webhook - CallSid: %s, EventType: %s, CallStatus: %s", call_sid, event_type, call_status)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Full webhook data: %s", dict(form_data))
         
-        logger.info(f"Received Twilio webhook - CallSid: {call_sid}, EventType: {event_type}")
-        logger.info(f"Full webhook data: {dict(form_data)}")
+        if call_sid and call_status:
+            record = call_tracker.find_by_twilio_sid(call_sid)
+            if record is not None:
+                call_events.publish(record.call_id, {"type": "status", "status": call_status})
+                await call_tracker.on_twilio_status(call_sid, call_status)
+            elif call_status in TERMINAL_TWILIO_STATUSES:
+                # Dialed by another server worker: end it in the shared call
+                # records, where that worker's sync picks it up
+                stored = await asyncio.to_thread(get_call_record_store().find_call_by_twilio_sid, call_sid)
+                if stored is not None and stored["ended_at"] is None:
+                    get_call_record_store().end_call(stored["call_id"], call_status, f"twilio:{call_status}")
         
         if event_type == "media":
             # Handle incoming audio stream
@@ -469,27 +1567,27 @@ async def twilio_webhook(request: Request):
                 return JSONResponse({"status": "error", "message": "No audio data received"})
                 
             # Process audio with Deepgram
-            transcription = await stt_service.transcribe(audio_data)
+            transcription = await get_stt_service().transcribe(audio_data)
             if not transcription:
                 logger.warning("No transcription received from Deepgram")
                 return JSONResponse({"status": "error", "message": "Transcription failed"})
                 
             # Generate response with LLM
-            response = await llm_service.generate_response(transcription, call_sid)
+            response = await get_llm_service().generate_response(transcription, call_sid)
             if not response:
                 logger.warning("No response generated from LLM")
                 return JSONResponse({"status": "error", "message": "Response generation failed"})
                 
             # Convert response to speech
-            audio_response = await tts_service.text_to_speech(response)
+            audio_response = await get_tts_service().text_to_speech(response)
             if not audio_response:
                 logger.warning("No audio response generated from TTS")
                 return JSONResponse({"status": "error", "message": "TTS failed"})
                 
             # Send back through LiveKit
             room_name = f"call-{call_sid}"
-            if room_name in livekit_service.audio_tracks:
-                track = livekit_service.audio_tracks[room_name]
+            if room_name in get_livekit_service().audio_tracks:
+                track = get_livekit_service().audio_tracks[room_name]
                 await track.write(audio_response)
                 logger.info(f"Sent audio response to LiveKit room {room_name}")
             else:
@@ -506,10 +1604,14 @@ async def livekit_webhook(request: Request):
         data = await request.json()
         event_type = data.get("event")
         
-        if event_type == "room_ended":
+        if event_type in ("room_ended", "room_finished"):
             # Handle call end
-            room_name = data.get("room")
-            await livekit_service.cleanup_room(room_name)
+            room = data.get("room")
+            room_name = room.get("name") if isinstance(room, dict) else room
+            if call_tracker.find_by_room(room_name):
+                await call_tracker.on_room_ended(room_name)
+            else:
+                await get_livekit_service().release_room(room_name)
         
         return JSONResponse({"status": "success"})
     except Exception as e:
@@ -519,115 +1621,207 @@ async def livekit_webhook(request: Request):
 async def test_interface():
     return FileResponse("static/test.html")
 
+async def forward_test_events(websocket: WebSocket, events: asyncio.Queue) -> None:
+    """
+    Send queued transcript events to the test page in order until None
+    """
+    while True:
+        event = await events.get()
+        if event is None:
+            return
+        try:
+            await websocket.send_json(event)
+        except Exception as e:
+            logger.debug("Dropping test transcript event: %s", e)
+
+async def stream_test_turn(websocket: WebSocket, session_id: str, transcript: str, stopped_at: float) -> None:
+    """
+    Stream one test-page reply: LLM tokens as they are generated, then its
+    speech as 16-bit PCM chunks, then a breakdown of the turn latency
+    measured from the end of the user's speech
+    """
+    def elapsed_ms() -> int:
+        return round((time.monotonic() - stopped_at) * 1000)
+
+    timings = {"transcript_ms": elapsed_ms()}
+    await websocket.send_json({
+        "type": "transcription",
+        "text": transcript,
+        "speaker": "user"
+    })
+
+    parts = []
+    async for token in get_llm_service().generate_response_stream(transcript, session_id):
+        if not parts:
+            timings["first_token_ms"] = elapsed_ms()
+        parts.append(token)
+        await websocket.send_json({"type": "response_token", "text": token})
+    response = "".join(parts).strip()
+    timings["response_ms"] = elapsed_ms()
+    await websocket.send_json({
+        "type": "response",
+        "text": response,
+        "speaker": "agent"
+    })
+
+    if response:
+        await websocket.send_json({
+            "type": "audio_start",
+            "encoding": "pcm_s16le",
+            "sample_rate": TEST_AUDIO_SAMPLE_RATE
+        })
+        carry = b""
+        async for chunk in get_tts_service().stream_speech(response, output_format=TEST_AUDIO_FORMAT):
+            if "first_audio_ms" not in timings:
+                timings["first_audio_ms"] = elapsed_ms()
+            # Keep every binary message a whole number of samples
+            chunk = carry + chunk
+            usable = len(chunk) & ~1
+            carry = chunk[usable:]
+            if usable:
+                await websocket.send_bytes(chunk[:usable])
+        await websocket.send_json({"type": "audio_end"})
+
+    timings["total_ms"] = elapsed_ms()
+    logger.info("[%s] Test turn latency: %s", session_id, timings)
+    await websocket.send_json({"type": "latency", **timings})
+
+async def run_batch_test_turn(websocket: WebSocket, session_id: str, audio_data: bytes) -> None:
+    """
+    Original request/response test flow: one complete recording in, one
+    transcript, reply and MP3 out
+    """
+    logger.info(f"Received audio data: {len(audio_data)} bytes")
+
+    # Transcribe audio
+    transcript = await get_stt_service().transcribe(audio_data)
+    logger.info(f"Transcription result: {transcript}")
+
+    if not transcript:
+        logger.warning("No transcription result")
+        await websocket.send_json({
+            "type": "error",
+            "message": "Could not transcribe audio"
+        })
+        return
+
+    # Generate response and convert it to speech
+    response = await get_llm_service().generate_response(transcript, session_id)
+    audio_response = await get_tts_service().text_to_speech(response)
+
+    # Send transcription and response back to client
+    await websocket.send_json({
+        "type": "transcription",
+        "text": transcript,
+        "speaker": "user"
+    })
+    await websocket.send_json({
+        "type": "response",
+        "text": response,
+        "speaker": "agent"
+    })
+    if audio_response:
+        logger.info(f"Sending audio response: {len(audio_response)} bytes")
+        await websocket.send_bytes(audio_response)
+
 @app.websocket("/ws/test")
 async def test_websocket(websocket: WebSocket):
+    """
+    Browser test pipeline.
+
+    Streaming mode: the page sends {"type": "start"}, small audio chunks as
+    binary messages, then {"type": "stop"}. Interim transcripts come back
+    while the user speaks; after stop the reply streams back as tokens and
+    its speech as PCM chunks. A binary message outside a start/stop pair is
+    handled as one complete recording, as before.
+    """
+    await websocket.accept()
+    # Each connection is its own conversation
+    session_id = "test-" + str(uuid.uuid4())
+    logger.info("Test websocket %s connected", session_id)
+
+    stt_service = get_stt_service()
+    connection = None
+    forwarder = None
+    events: asyncio.Queue = asyncio.Queue()
+    finals = []
+
+    def on_transcript(text: str, is_final: bool) -> None:
+        if is_final:
+            finals.append(text)
+            events.put_nowait({"type": "transcript_interim", "text": " ".join(finals), "is_final": True})
+        else:
+            events.put_nowait({"type": "transcript_interim", "text": " ".join(finals + [text]), "is_final": False})
+
     try:
-        await websocket.accept()
-        logger.info("WebSocket connection accepted")
-        
         while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
             try:
-                # Receive audio data
-                audio_data = await websocket.receive_bytes()
-                logger.info(f"Received audio data: {len(audio_data)} bytes")
-                
-                if not audio_data:
-                    logger.warning("Empty audio data received")
+                if message.get("bytes") is not None:
+                    if connection is not None:
+                        stt_service.process_stream_chunk(connection, message["bytes"])
+                    elif message["bytes"]:
+                        await run_batch_test_turn(websocket, session_id, message["bytes"])
                     continue
-                
-                # Log first few bytes for debugging
-                logger.debug(f"First 10 bytes of audio data: {audio_data[:10]}")
-                
-                try:
-                    # Transcribe audio
-                    logger.info("Sending audio to STT service...")
-                    transcript = await stt_service.transcribe(audio_data)
-                    logger.info(f"Transcription result: {transcript}")
-                    
+
+                control = json.loads(message.get("text") or "{}")
+                if control.get("type") == "start" and connection is None:
+                    finals.clear()
+                    connection = await stt_service.start_stream(on_transcript)
+                    forwarder = asyncio.create_task(forward_test_events(websocket, events))
+                    await websocket.send_json({"type": "listening", "session_id": session_id})
+
+                elif control.get("type") == "stop" and connection is not None:
+                    stopped_at = time.monotonic()
+                    # finish() returns once Deepgram has delivered every final
+                    await stt_service.end_stream(connection)
+                    connection = None
+                    events.put_nowait(None)
+                    await forwarder
+                    forwarder = None
+
+                    transcript = " ".join(finals).strip()
                     if transcript:
-                        # Generate response
-                        logger.info("Generating response...")
-                        response = await llm_service.generate_response(transcript)
-                        logger.info(f"Generated response: {response}")
-                        
-                        # Convert response to speech
-                        logger.info("Converting response to speech...")
-                        audio_response = await tts_service.text_to_speech(response)
-                        
-                        try:
-                            # Send transcription and response back to client
-                            await websocket.send_json({
-                                "type": "transcription",
-                                "text": transcript,
-                                "speaker": "user"
-                            })
-                            
-                            await websocket.send_json({
-                                "type": "response",
-                                "text": response,
-                                "speaker": "agent"
-                            })
-                            
-                            # Send audio response
-                            if audio_response:
-                                logger.info(f"Sending audio response: {len(audio_response)} bytes")
-                                await websocket.send_bytes(audio_response)
-                        except Exception as e:
-                            logger.error(f"Error sending response: {str(e)}", exc_info=True)
-                            if not isinstance(e, WebSocketDisconnect):
-                                await websocket.send_json({
-                                    "type": "error",
-                                    "message": "Error sending response"
-                                })
-                            raise
+                        await stream_test_turn(websocket, session_id, transcript, stopped_at)
                     else:
-                        logger.warning("No transcription result")
                         await websocket.send_json({
                             "type": "error",
                             "message": "Could not transcribe audio"
                         })
-                        
-                except Exception as e:
-                    logger.error(f"Error processing audio: {str(e)}", exc_info=True)
-                    if not isinstance(e, WebSocketDisconnect):
-                        await websocket.send_json({
-                            "type": "error",
-                            "message": f"Error processing audio: {str(e)}"
-                        })
-                    raise
-                    
+
             except WebSocketDisconnect:
-                logger.info("WebSocket disconnected")
-                break
-            except Exception as e:
-                logger.error(f"Error receiving data: {str(e)}", exc_info=True)
-                if not isinstance(e, WebSocketDisconnect):
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": f"Error receiving data: {str(e)}"
-                    })
                 raise
-                
-    except WebSocketDisconnect:
-        logger.info("WebSocket disconnected")
-    except Exception as e:
-        logger.error(f"WebSocket error: {str(e)}", exc_info=True)
-        try:
-            if not isinstance(e, WebSocketDisconnect):
+            except Exception as e:
+                logger.error(f"Error processing test audio: {str(e)}", exc_info=True)
                 await websocket.send_json({
                     "type": "error",
-                    "message": f"Connection error: {str(e)}"
+                    "message": f"Error processing audio: {str(e)}"
                 })
-        except:
-            pass
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"WebSocket error: {str(e)}", exc_info=True)
     finally:
+        logger.info("Test websocket %s disconnected", session_id)
+        if connection is not None:
+            try:
+                await stt_service.end_stream(connection)
+            except Exception:
+                pass
+        if forwarder is not None:
+            forwarder.cancel()
+        get_llm_service().clear_conversation(session_id)
         try:
             await websocket.close()
-        except:
+        except Exception:
             pass
 
 @app.post("/api/test-call")
-async def test_call(data: CallRequest):
+async def test_call(data: CallRequest, _: None = Depends(reserve_call_capacity)):
     try:
         logger.info(f"Starting test call to {data.phone_number}")
         
@@ -643,14 +1837,14 @@ async def test_call(data: CallRequest):
         try:
             logger.info("Creating LiveKit room...")
             room_name = f"call-{call_id}"
-            await livekit_service.create_room(room_name)
+            await get_livekit_service().create_room(room_name)
             logger.info(f"LiveKit room created: {room_name}")
         except Exception as e:
             logger.error(f"Failed to create LiveKit room: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to create LiveKit room")
         
         # Construct webhook URLs with HTTPS
-        twiml_url = f"https://{settings.APP_HOST}/twiml/{call_id}"
+        twiml_url = f"https://{settings.APP_HOST}/twiml/{call_id}?media_mode={MEDIA_MODE_LIVEKIT}"
         status_callback_url = f"https://{settings.APP_HOST}/webhook/twilio"
         
         logger.info(f"Using TwiML URL: {twiml_url}")
@@ -659,7 +1853,8 @@ async def test_call(data: CallRequest):
         # Make the outbound call using Twilio
         try:
             logger.info("Initiating Twilio call...")
-            call = twilio_client.calls.create(
+            call = await asyncio.to_thread(
+                get_twilio_client().calls.create,
                 to=data.phone_number,
                 from_=settings.TWILIO_PHONE_NUMBER,
                 url=twiml_url,
@@ -667,6 +1862,8 @@ async def test_call(data: CallRequest):
                 status_callback_event=['initiated', 'ringing', 'answered', 'completed']
             )
             logger.info(f"Twilio call created with SID: {call.sid}")
+            call_tracker.register(call_id, twilio_sid=call.sid, room_name=room_name, media_mode=MEDIA_MODE_LIVEKIT)
+            record_initiated_call(call_id, data, twilio_sid=call.sid, media_mode=MEDIA_MODE_LIVEKIT)
             
             return {
                 "call_id": call_id,
@@ -678,7 +1875,7 @@ async def test_call(data: CallRequest):
         except Exception as e:
             logger.error(f"Twilio call creation failed: {str(e)}")
             try:
-                await livekit_service.cleanup_room(room_name)
+                await get_livekit_service().cleanup_room(room_name)
             except:
                 pass
             raise HTTPException(status_code=500, detail=f"Failed to create call: {str(e)}")
@@ -702,14 +1899,15 @@ async def test_stt(request: STTRequest):
         audio_data = base64.b64decode(request.audio_data)
         
         # Save for debugging
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        debug_file = os.path.join(AUDIO_DIR, f"test_stt_{timestamp}.wav")
-        with open(debug_file, "wb") as f:
-            f.write(audio_data)
-        logger.info(f"Saved test audio to {debug_file}")
+        if get_settings().save_test_audio:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            debug_file = os.path.join(AUDIO_DIR, f"test_stt_{timestamp}.wav")
+            with open(debug_file, "wb") as f:
+                f.write(audio_data)
+            logger.info(f"Saved test audio to {debug_file}")
         
         # Transcribe
-        transcript = await stt_service.transcribe(audio_data)
+        transcript = await get_stt_service().transcribe(audio_data)
         logger.info(f"Transcription: {transcript}")
         
         return {"transcript": transcript}
@@ -717,6 +1915,91 @@ async def test_stt(request: STTRequest):
         logger.error(f"Error in test_stt: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/test-stt/upload")
+async def test_stt_upload(request: Request):
+    """
+    Transcribe audio sent as the raw request body (Content-Type audio/*)
+    or as a multipart "file" field. The body is streamed to Deepgram as it
+    arrives, with no base64 step and no debug copy.
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            try:
+                upload = form.get("file")
+                if upload is None or isinstance(upload, str):
+                    raise HTTPException(status_code=400, detail="Missing multipart field 'file'")
+                transcript = await get_stt_service().transcribe_upload(
+                    upload.file, upload.content_type or "audio/wav"
+                )
+            finally:
+                await form.close()
+        else:
+            transcript = await get_stt_service().transcribe_upload(
+                request.stream(), content_type or "audio/wav"
+            )
+        logger.info(f"Transcription: {transcript}")
+        return {"transcript": transcript}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in test_stt_upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def archived_recording_source(path: str) -> dict:
+    """
+    Open a recording under AUDIO_DIR as a Deepgram source, refusing paths
+    that escape the directory
+    """
+    root = os.path.realpath(AUDIO_DIR)
+    full_path = os.path.realpath(os.path.join(root, path))
+    if not full_path.startswith(root + os.sep):
+        raise ValueError(f"Path outside the audio directory: {path}")
+    mimetype = mimetypes.guess_type(full_path)[0] or "audio/wav"
+    return {"buffer": open(full_path, "rb"), "mimetype": mimetype}
+
+@app.post("/api/test-stt/batch")
+async def test_stt_batch(request: Request):
+    """
+    Transcribe many recordings concurrently and stream one NDJSON line per
+    recording as each finishes. Accepts either multipart "files" uploads or
+    a JSON body {"urls": [...], "paths": [...]}, where paths are relative
+    to the audio directory. Lines carry the input index, so clients can
+    restore the original order.
+    """
+    content_type = request.headers.get("content-type", "")
+    form = None
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            uploads = [f for f in form.getlist("files") if not isinstance(f, str)]
+            sources = [
+                (upload.filename, {"buffer": upload.file, "mimetype": upload.content_type or "audio/wav"})
+                for upload in uploads
+            ]
+        else:
+            batch = STTBatchRequest(**(await request.json()))
+            # Archived files are opened lazily, so at most one per worker is open
+            sources = [(url, {"url": url}) for url in batch.urls]
+            sources += [(path, partial(archived_recording_source, path)) for path in batch.paths]
+    except Exception as e:
+        if form is not None:
+            await form.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def results():
+        try:
+            async for result in get_stt_service().transcribe_many(
+                sources, concurrency=get_settings().stt_batch_concurrency
+            ):
+                yield json.dumps(result) + "\n"
+        finally:
+            if form is not None:
+                await form.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @app.post("/api/test-llm")
 async def test_llm(request: TestLLMRequest):
     try:
@@ -728,7 +2011,7 @@ async def test_llm(request: TestLLMRequest):
         logger.debug(f"Using test call ID: {test_call_id}")
         
         # Generate response
-        response = await llm_service.generate_response(request.transcript, test_call_id)
+        response = await get_llm_service().generate_response(request.transcript, test_call_id)
         logger.info(f"LLM response: {response}")
         
         return {
@@ -748,7 +2031,7 @@ async def test_tts(request: TestTTSRequest):
         logger.info(f"Input text: {request.text}")
         
         # Convert text to speech
-        audio_data = await tts_service.text_to_speech(request.text)
+        audio_data = await get_tts_service().text_to_speech(request.text)
         logger.info(f"Generated audio: {len(audio_data)} bytes")
         
         # Return audio file
@@ -788,9 +2071,22 @@ if __name__ == "__main__":
         print(f"Using host: {settings.APP_HOST}")
     
     # Start the server
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=settings.app_port,
-        reload=settings.debug
-    ) 
\ No newline at end of file
+    if settings.server_workers > 1 and not settings.debug:
+        from utils.prefork import PreforkServer
+        PreforkServer(
+            "main:app",
+            host="0.0.0.0",
+            port=settings.app_port,
+            workers=settings.server_workers,
+            preload="main:preload",
+            graceful_timeout=settings.server_graceful_timeout
+        ).run()
+    else:
+        if settings.server_workers > 1:
+            logger.warning("debug reloads a single server process; ignoring server_workers=%d", settings.server_workers)
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=settings.app_port,
+            reload=settings.debug
+        ) 
\ No newline at end of file
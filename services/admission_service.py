@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Optional
+
+from utils.loop_monitor import LoopLagMonitor
+from utils.metrics import InFlightGauge
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.05  # seconds between capacity checks for queued requests
+
+
+class AdmissionRejected(Exception):
+    """
+    A new call was refused; retry_after is a hint in seconds
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Decides whether this worker can take another call.
+
+    New calls are admitted only while every load signal is under its limit:
+    live calls (plus admissions not yet registered), event-loop lag and
+    requests in flight to any speech/LLM provider. Calls already admitted
+    are never shed, so they keep their latency during a burst.
+
+    A request that cannot be admitted waits in a bounded FIFO queue for up
+    to queue_timeout seconds and is then refused with a retry-after hint.
+    """
+
+    def __init__(
+        self,
+        active_calls: Callable[[], int],
+        provider_in_flight: Callable[[], Dict[str, int]],
+        loop_monitor: LoopLagMonitor,
+        max_calls: int = 20,
+        max_loop_lag_ms: float = 100.0,
+        max_provider_in_flight: int = 32,
+        queue_size: int = 50,
+        queue_timeout: float = 5.0,
+        retry_after: int = 10
+    ):
+        self.active_calls = active_calls
+        self.provider_in_flight = provider_in_flight
+        self.loop_monitor = loop_monitor
+        self.max_calls = max_calls
+        self.max_loop_lag_ms = max_loop_lag_ms
+        self.max_provider_in_flight = max_provider_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.pipelines = InFlightGauge()  # media streams being processed
+        self.reserved = 0  # admitted but not yet in the live call table
+        self._waiters: Deque[object] = deque()
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+
+    def refusal_reason(self) -> Optional[str]:
+        """
+        Why a new call cannot start right now, or None if it can
+        """
+        if self.active_calls() + self.reserved >= self.max_calls:
+            return "max_calls"
+        if self.loop_monitor.lag_ms > self.max_loop_lag_ms:
+            return "loop_lag"
+        in_flight = self.provider_in_flight()
+        if in_flight and max(in_flight.values()) >= self.max_provider_in_flight:
+            return "provider_queue"
+        return None
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        logger.warning("Refusing new call: %s (%d queued)", reason, len(self._waiters))
+        return AdmissionRejected(reason, self.retry_after)
+
+    async def acquire(self, wait: bool = True) -> None:
+        """
+        Reserve capacity for one call, queueing if allowed; raises
+        AdmissionRejected when there is none. Pair with release().
+        """
+        reason = self.refusal_reason() if not self._waiters else "queued"
+        if reason is not None:
+            if not wait or len(self._waiters) >= self.queue_size:
+                raise self._reject(reason if reason != "queued" else "queue_full")
+            token = object()
+            self._waiters.append(token)
+            try:
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + self.queue_timeout
+                while True:
+                    await asyncio.sleep(POLL_INTERVAL)
+                    if self._waiters[0] is token:
+                        reason = self.refusal_reason()
+                        if reason is None:
+                            break
+                    if loop.time() >= deadline:
+                        raise self._reject(reason or "queued")
+            finally:
+                self._waiters.remove(token)
+        self.reserved += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        """
+        Drop a reservation once the call is in the live table (or failed)
+        """
+        self.reserved -= 1
+
+    @asynccontextmanager
+    async def admit(self, wait: bool = True) -> AsyncIterator[None]:
+        await self.acquire(wait)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def capacity(self) -> dict:
+        active = self.active_calls()
+        reason = self.refusal_reason()
+        return {
+            "accepting": reason is None and not self._waiters,
+            "reason": reason,
+            "available": max(0, self.max_calls - active - self.reserved) if reason is None else 0,
+            "retry_after": None if reason is None else self.retry_after,
+            "active_calls": active,
+            "pipelines": self.pipelines.current,
+            "reserved": self.reserved,
+            "queued": len(self._waiters),
+            "loop": self.loop_monitor.summary(),
+            "provider_in_flight": self.provider_in_flight(),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "limits": {
+                "max_calls": self.max_calls,
+                "max_loop_lag_ms": self.max_loop_lag_ms,
+                "max_provider_in_flight": self.max_provider_in_flight,
+                "queue_size": self.queue_size,
+                "queue_timeout": self.queue_timeout,
+            },
+        }
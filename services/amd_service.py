@@ -0,0 +1,182 @@
+import logging
+from typing import Optional
+
+import numpy as np
+
+from services.analytics_service import FRAME_MS, runs, speech_mask
+
+logger = logging.getLogger(__name__)
+
+HUMAN = "human"
+MACHINE = "machine"
+UNKNOWN = "unknown"  # undecided when time ran out; handled like a person
+
+BEEP_MIN_HZ = 400.0
+BEEP_MAX_HZ = 2500.0
+BEEP_MIN_DBFS = -40.0
+BEEP_PURITY = 0.8  # share of frame energy within two bins of the spectral peak
+
+
+class AnsweringMachineDetector:
+    """
+    Classifies the first seconds of an answered call as a person or an
+    answering machine from the caller audio alone.
+
+    Each 20 ms frame is reduced to its level and spectral peak in one
+    vectorized pass; the decision rules then look at the cadence of the
+    speech so far:
+
+    - a steady pure tone (the record beep) means a machine
+    - no speech within initial_silence_ms means a machine
+    - one utterance longer than greeting_ms means a recorded greeting
+    - max_segments utterances without a real pause means a recorded greeting
+    - a short utterance followed by after_greeting_silence_ms of quiet
+      ("Hello?" and waiting) means a person
+
+    After a machine decision, keep feeding audio until message_ready says
+    the greeting has finished and a message will be recorded.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 8000,
+        initial_silence_ms: int = 2500,
+        greeting_ms: int = 1800,
+        after_greeting_silence_ms: int = 800,
+        max_segments: int = 3,
+        max_ms: int = 4000,
+        beep_ms: int = 160,
+        message_silence_ms: int = 1200,
+        max_message_wait_ms: int = 30000
+    ):
+        self.sample_rate = sample_rate
+        self.frame_size = sample_rate * FRAME_MS // 1000
+        self.initial_silence_ms = initial_silence_ms
+        self.greeting_ms = greeting_ms
+        self.after_greeting_silence_ms = after_greeting_silence_ms
+        self.max_segments = max_segments
+        self.max_ms = max_ms
+        self.beep_frames = max(1, beep_ms // FRAME_MS)
+        self.message_silence_ms = message_silence_ms
+        self.max_message_wait_ms = max_message_wait_ms
+
+        capacity = (max_ms + max_message_wait_ms) // FRAME_MS
+        self._energy = np.empty(capacity, dtype=np.float64)
+        self._frames = 0
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._window = np.hanning(self.frame_size)
+        self._tone_bin = -1
+        self._tone_run = 0
+        self._beep_frame: Optional[int] = None
+        self.beep_hz: Optional[float] = None
+        self._quiet_frames = 0  # trailing frames since the last speech
+
+        self.result: Optional[str] = None
+        self.reason: Optional[str] = None
+        self.decision_ms: Optional[int] = None
+        self._features: dict = {}
+
+    @property
+    def elapsed_ms(self) -> int:
+        """Caller audio analyzed so far"""
+        return self._frames * FRAME_MS
+
+    def feed(self, samples: np.ndarray) -> Optional[str]:
+        """
+        Add int16 caller audio; returns the result once one is reached
+        """
+        if self._frames == self._energy.size:
+            return self.result
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        complete = min(samples.size // self.frame_size, self._energy.size - self._frames)
+        self._pending = samples[complete * self.frame_size:]
+        if complete:
+            self._analyze(samples[:complete * self.frame_size].reshape(complete, self.frame_size))
+            self._classify()
+        return self.result
+
+    def _analyze(self, frames: np.ndarray) -> None:
+        x = frames.astype(np.float64)
+        rms = np.sqrt(np.mean(np.square(x), axis=1))
+        energy = 20.0 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+        self._energy[self._frames:self._frames + len(frames)] = energy
+
+        # A beep is a frame whose energy sits almost entirely in one narrow band
+        spectrum = np.square(np.abs(np.fft.rfft(x * self._window, axis=1)))
+        peak = np.argmax(spectrum[:, 1:], axis=1) + 1
+        band = np.clip(peak[:, None] + np.arange(-2, 3), 0, spectrum.shape[1] - 1)
+        purity = np.take_along_axis(spectrum, band, axis=1).sum(axis=1) / np.maximum(spectrum.sum(axis=1), 1e-9)
+        peak_hz = peak * self.sample_rate / self.frame_size
+        tonal = (
+            (purity >= BEEP_PURITY) & (energy >= BEEP_MIN_DBFS)
+            & (peak_hz >= BEEP_MIN_HZ) & (peak_hz <= BEEP_MAX_HZ)
+        )
+
+        # The tone must hold one pitch for beep_frames in a row
+        for i in range(len(frames)):
+            if tonal[i] and (self._tone_run == 0 or abs(peak[i] - self._tone_bin) <= 1):
+                self._tone_run += 1
+            else:
+                self._tone_run = 1 if tonal[i] else 0
+            self._tone_bin = peak[i] if tonal[i] else -1
+            if self._tone_run >= self.beep_frames and self._beep_frame is None:
+                self._beep_frame = self._frames + i + 1
+                self.beep_hz = float(peak_hz[i])
+        self._frames += len(frames)
+
+    def _classify(self) -> None:
+        mask, _ = speech_mask(self._energy[:self._frames])
+        starts, ends = runs(mask)
+        self._quiet_frames = mask.size - int(ends[-1]) if ends.size else mask.size
+        if self.result is not None:
+            return
+        elapsed = self.elapsed_ms
+        self._features = {
+            "initial_silence_ms": int(starts[0]) * FRAME_MS if starts.size else elapsed,
+            "greeting_ms": int(ends[0] - starts[0]) * FRAME_MS if starts.size else 0,
+            "segments": int(starts.size),
+        }
+
+        if self._beep_frame is not None:
+            self._decide(MACHINE, "beep")
+        elif not starts.size:
+            if elapsed >= self.initial_silence_ms:
+                self._decide(MACHINE, "initial_silence")
+        elif self._features["greeting_ms"] >= self.greeting_ms:
+            self._decide(MACHINE, "long_greeting")
+        elif starts.size >= self.max_segments:
+            self._decide(MACHINE, "many_segments")
+        elif self._quiet_frames * FRAME_MS >= self.after_greeting_silence_ms:
+            self._decide(HUMAN, "short_greeting")
+        if self.result is None and elapsed >= self.max_ms:
+            self._decide(UNKNOWN, "timeout")
+
+    def _decide(self, result: str, reason: str) -> None:
+        self.result = result
+        self.reason = reason
+        self.decision_ms = self.elapsed_ms
+        logger.debug("AMD decided %s (%s) after %d ms", result, reason, self.decision_ms)
+
+    @property
+    def message_ready(self) -> bool:
+        """
+        True once a machine has finished its greeting: the beep has ended,
+        the line has gone quiet, or we have waited long enough
+        """
+        if self.result != MACHINE:
+            return False
+        if self._frames == self._energy.size or self.elapsed_ms - self.decision_ms >= self.max_message_wait_ms:
+            return True
+        if self._beep_frame is not None:
+            return self._tone_run == 0
+        return self._quiet_frames * FRAME_MS >= self.message_silence_ms
+
+    def summary(self) -> dict:
+        return {
+            "result": self.result,
+            "reason": self.reason,
+            "decision_ms": self.decision_ms,
+            "beep_hz": self.beep_hz,
+            **self._features,
+        }
@@ -0,0 +1,354 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.recording_service import load_index, read_track
+from utils.metrics import LatencyStats
+from utils.vad import MAX_THRESHOLD_DBFS, MIN_SPEECH_DBFS, NOISE_MARGIN_DB
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 20
+HANGOVER_MS = 200  # pauses shorter than this don't end a speech segment
+LATENCY_STAGES = ("stt_ms", "llm_ms", "tts_ms")
+
+
+def frame_energy(samples: np.ndarray, sample_rate: int, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """
+    RMS level of each frame_ms frame in dBFS
+    """
+    frame_size = sample_rate * frame_ms // 1000
+    frames = samples[:samples.size - samples.size % frame_size].reshape(-1, frame_size)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+
+
+def runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Start and end (exclusive) indices of each run of True in mask
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_mask(energy: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Per-frame voice activity from energy against an adaptive noise floor,
+    with short pauses bridged; returns the mask and the noise floor
+    """
+    if not energy.size:
+        return np.zeros(0, dtype=bool), MIN_SPEECH_DBFS
+    noise_floor = float(np.percentile(energy, 10))
+    # The cap keeps a track that is nearly all speech from calling itself noise
+    mask = energy > max(MIN_SPEECH_DBFS, min(noise_floor + NOISE_MARGIN_DB, MAX_THRESHOLD_DBFS))
+
+    # Fill gaps shorter than the hangover between two speech runs
+    gaps_start, gaps_end = runs(~mask)
+    short = (gaps_end - gaps_start) * FRAME_MS < HANGOVER_MS
+    interior = (gaps_start > 0) & (gaps_end < mask.size)
+    fill = np.zeros(mask.size + 1, dtype=np.int32)
+    np.add.at(fill, gaps_start[short & interior], 1)
+    np.add.at(fill, gaps_end[short & interior], -1)
+    return mask | (np.cumsum(fill[:-1]) > 0), noise_floor
+
+
+def track_stats(energy: np.ndarray, mask: np.ndarray, noise_floor: float) -> dict:
+    starts, _ = runs(mask)
+    talk_frames = int(mask.sum())
+    return {
+        "talk_ms": talk_frames * FRAME_MS,
+        "silence_ratio": round(1.0 - talk_frames / mask.size, 4) if mask.size else 1.0,
+        "segments": int(starts.size),
+        "mean_dbfs": round(float(energy[mask].mean()), 1) if talk_frames else None,
+        "peak_dbfs": round(float(energy.max()), 1) if energy.size else None,
+        "noise_floor_dbfs": round(noise_floor, 1),
+    }
+
+
+def analyze_call(directory: str) -> Optional[dict]:
+    """
+    Compute talk, silence, interruption and latency statistics for one
+    finished recording directory. Runs in a worker process.
+    """
+    index = load_index(directory)
+    if index is None:
+        return None
+    tracks = index.get("tracks", {})
+
+    energies: Dict[str, np.ndarray] = {}
+    masks: Dict[str, np.ndarray] = {}
+    result = {
+        "call_id": index["call_id"],
+        "created_at": index["created_at"],
+    }
+    for name in ("caller", "agent"):
+        if name in tracks:
+            samples = read_track(directory, tracks[name])
+            energies[name] = frame_energy(samples, tracks[name]["sample_rate"])
+        else:
+            energies[name] = np.zeros(0)
+        masks[name], noise_floor = speech_mask(energies[name])
+        result[name] = track_stats(energies[name], masks[name], noise_floor)
+
+    # Put both tracks on one frame grid
+    frames = max(masks["caller"].size, masks["agent"].size)
+    caller = np.zeros(frames, dtype=bool)
+    agent = np.zeros(frames, dtype=bool)
+    caller[:masks["caller"].size] = masks["caller"]
+    agent[:masks["agent"].size] = masks["agent"]
+
+    silent_starts, silent_ends = runs(~(caller | agent))
+    caller_starts, caller_ends = runs(caller)
+    agent_starts, _ = runs(agent)
+
+    # Response gap: from the caller stopping to the agent's next start
+    gaps = []
+    if caller_ends.size and agent_starts.size:
+        following = np.searchsorted(agent_starts, caller_ends)
+        valid = following < agent_starts.size
+        gaps = (agent_starts[following[valid]] - caller_ends[valid]) * FRAME_MS
+
+    caller_talk = result["caller"]["talk_ms"]
+    result.update({
+        "duration_ms": frames * FRAME_MS,
+        "overlap_ms": int((caller & agent).sum()) * FRAME_MS,
+        "mutual_silence_ms": int((~(caller | agent)).sum()) * FRAME_MS,
+        "longest_silence_ms": int((silent_ends - silent_starts).max()) * FRAME_MS if silent_starts.size else 0,
+        # Agent talk time per unit of caller talk time
+        "talk_listen_ratio": round(result["agent"]["talk_ms"] / caller_talk, 3) if caller_talk else None,
+        "interruptions": {
+            # Caller started talking while the agent was speaking, and vice versa
+            "caller": int(agent[caller_starts].sum()),
+            "agent": int(caller[agent_starts].sum()),
+        },
+        "mean_response_gap_ms": round(float(np.mean(gaps))) if len(gaps) else None,
+    })
+
+    # Per-stage pipeline latency from the turn events logged during the call
+    stages = {stage: LatencyStats() for stage in LATENCY_STAGES}
+    turns = 0
+    for event in index.get("events", []):
+        if event.get("type") != "turn":
+            continue
+        turns += 1
+        for stage, stats in stages.items():
+            if event.get(stage) is not None:
+                stats.record(event[stage] / 1000.0)
+    result["turns"] = turns
+    result["latency"] = {stage.removesuffix("_ms"): stats.summary() for stage, stats in stages.items()}
+    return result
+
+
+class AnalyticsStore:
+    """
+    SQLite table of per-call analytics; headline numbers are columns so
+    they can be filtered and aggregated, the full result is kept as JSON
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS call_analytics (
+                call_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                analyzed_at REAL NOT NULL,
+                duration_ms INTEGER,
+                caller_talk_ms INTEGER,
+                agent_talk_ms INTEGER,
+                mutual_silence_ms INTEGER,
+                talk_listen_ratio REAL,
+                interruptions INTEGER,
+                turns INTEGER,
+                metrics TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS call_analytics_created_at ON call_analytics (created_at);
+        """)
+
+    def save(self, results: Iterable[dict]) -> int:
+        """
+        Insert or replace a batch of results in one transaction
+        """
+        now = time.time()
+        rows = [
+            (
+                r["call_id"], r["created_at"], now, r["duration_ms"],
+                r["caller"]["talk_ms"], r["agent"]["talk_ms"], r["mutual_silence_ms"],
+                r["talk_listen_ratio"], r["interruptions"]["caller"] + r["interruptions"]["agent"],
+                r["turns"], json.dumps(r)
+            )
+            for r in results
+        ]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO call_analytics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def analyzed(self, call_ids: Iterable[str]) -> set:
+        ids = list(call_ids)
+        found = set()
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                found.update(row[0] for row in self._db.execute(
+                    f"SELECT call_id FROM call_analytics WHERE call_id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+        return found
+
+    def get(self, call_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT metrics FROM call_analytics WHERE call_id = ?", (call_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              limit: int = 50, offset: int = 0) -> List[dict]:
+        """
+        Results for calls created in [since, until), newest first
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT metrics FROM call_analytics WHERE created_at >= ? AND created_at < ? "
+                "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (since or 0, until or float("inf"), limit, offset)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def summary(self, since: Optional[float] = None, until: Optional[float] = None) -> dict:
+        """
+        Aggregates over calls created in [since, until)
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*), SUM(duration_ms), AVG(caller_talk_ms), AVG(agent_talk_ms), "
+                "AVG(mutual_silence_ms * 1.0 / NULLIF(duration_ms, 0)), AVG(talk_listen_ratio), "
+                "AVG(interruptions), SUM(turns) "
+                "FROM call_analytics WHERE created_at >= ? AND created_at < ?",
+                (since or 0, until or float("inf"))
+            ).fetchone()
+        keys = ("calls", "total_duration_ms", "avg_caller_talk_ms", "avg_agent_talk_ms",
+                "avg_silence_ratio", "avg_talk_listen_ratio", "avg_interruptions", "turns")
+        return {key: (round(value, 3) if isinstance(value, float) else value) for key, value in zip(keys, row)}
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class AnalyticsService:
+    """
+    Runs analyze_call for finished recordings on a process pool and saves
+    the results to an AnalyticsStore
+    """
+
+    def __init__(self, recording_root: str, store: AnalyticsStore, workers: Optional[int] = None):
+        self.recording_root = recording_root
+        self.store = store
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: the server process has threads and an event loop
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def analyze(self, call_id: str) -> Optional[dict]:
+        """
+        Analyze one finished call and save the result
+        """
+        results = await self.analyze_many([call_id])
+        return results[0] if results else None
+
+    async def analyze_many(self, call_ids: Iterable[str], batch_size: int = 100) -> List[dict]:
+        """
+        Analyze calls in parallel, saving results in batches as they finish
+        """
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(self.pool, analyze_call, os.path.join(self.recording_root, call_id))
+            for call_id in call_ids
+        ]
+        results: List[dict] = []
+        batch: List[dict] = []
+        for future in asyncio.as_completed(futures):
+            try:
+                result = await future
+            except Exception as e:
+                logger.error(f"Error analyzing call: {str(e)}")
+                continue
+            if result is None:
+                continue
+            results.append(result)
+            batch.append(result)
+            if len(batch) >= batch_size:
+                await asyncio.to_thread(self.store.save, batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(self.store.save, batch)
+        return results
+
+    def pending(self, catalog: Dict[str, tuple], since: float = 0, until: float = float("inf")) -> List[str]:
+        """
+        Calls in a recording catalog created in [since, until) that have no
+        analytics yet
+        """
+        candidates = [call_id for call_id, (created, _) in catalog.items() if since <= created < until]
+        done = self.store.analyzed(candidates)
+        return [call_id for call_id in candidates if call_id not in done]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def main() -> None:
+    """
+    Backfill analytics for every recording created on one day
+    """
+    parser = argparse.ArgumentParser(description="Post-call analytics backfill")
+    parser.add_argument("--recordings", default="recordings")
+    parser.add_argument("--db", default="analytics.db")
+    parser.add_argument("--date", help="YYYY-MM-DD (local time); default all recordings")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    since, until = 0.0, float("inf")
+    if args.date:
+        since = time.mktime(time.strptime(args.date, "%Y-%m-%d"))
+        until = since + 86400
+
+    catalog = {}
+    for entry in os.scandir(args.recordings):
+        index = load_index(entry.path) if entry.is_dir() else None
+        if index is not None:
+            catalog[entry.name] = (index["created_at"], index["bytes"])
+
+    service = AnalyticsService(args.recordings, AnalyticsStore(args.db), workers=args.workers)
+    call_ids = service.pending(catalog, since, until)
+    started = time.monotonic()
+    results = asyncio.run(service.analyze_many(call_ids))
+    service.shutdown()
+    logger.info("Analyzed %d of %d calls in %.1fs", len(results), len(call_ids), time.monotonic() - started)
+
+
+if __name__ == "__main__":
+    main()
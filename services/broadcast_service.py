@@ -0,0 +1,88 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """
+    One dashboard client's bounded view of a call's event stream
+    """
+
+    def __init__(self, call_id: str, max_queue: int):
+        self.call_id = call_id
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, message: Optional[str]) -> None:
+        """
+        Enqueue without blocking; a full queue loses its oldest message
+        """
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+                self.dropped += 1
+
+    async def next(self) -> Optional[str]:
+        """
+        Wait for the next serialized event; None means the call has ended
+        """
+        return await self.queue.get()
+
+
+class CallEventHub:
+    """
+    Per-call publish/subscribe hub for dashboard updates.
+
+    The call pipeline publishes each event once; it is serialized once and
+    offered to every subscriber's bounded queue. A slow subscriber loses
+    its oldest events instead of slowing the publisher or other viewers.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._topics: Dict[str, Set[Subscriber]] = {}
+        self.published = 0
+
+    def subscribe(self, call_id: str) -> Subscriber:
+        subscriber = Subscriber(call_id, self.max_queue)
+        self._topics.setdefault(call_id, set()).add(subscriber)
+        logger.debug("Dashboard subscribed to call %s (%d viewers)", call_id, len(self._topics[call_id]))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self._topics.get(subscriber.call_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._topics[subscriber.call_id]
+        if subscriber.dropped:
+            logger.info("Dashboard viewer of call %s dropped %d slow events", subscriber.call_id, subscriber.dropped)
+
+    def publish(self, call_id: str, event: dict) -> None:
+        """
+        Send an event to everyone watching call_id; free when nobody is
+        """
+        subscribers = self._topics.get(call_id)
+        if not subscribers:
+            return
+        message = json.dumps(event)
+        for subscriber in subscribers:
+            subscriber.offer(message)
+        self.published += 1
+
+    def close(self, call_id: str) -> None:
+        """
+        Tell every subscriber of call_id that the stream is over
+        """
+        for subscriber in self._topics.pop(call_id, set()):
+            subscriber.offer(None)
+
+    def viewer_count(self, call_id: str) -> int:
+        return len(self._topics.get(call_id, ()))
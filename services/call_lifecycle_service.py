@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Twilio CallStatus values after which the call will not come back
+TERMINAL_TWILIO_STATUSES = {"completed", "busy", "failed", "no-answer", "canceled"}
+
+
+@dataclass
+class CallRecord:
+    call_id: str
+    twilio_sid: Optional[str] = None
+    stream_sid: Optional[str] = None
+    room_name: Optional[str] = None
+    media_mode: Optional[str] = None
+    status: str = "initiated"
+    created_at: float = field(default_factory=time.time)
+    last_activity: float = field(default_factory=time.monotonic)
+    ended_at: Optional[float] = None
+    end_reason: Optional[str] = None
+    # Task running the call's media stream, stopped when the call ends
+    stream_task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "call_id": self.call_id,
+            "twilio_sid": self.twilio_sid,
+            "stream_sid": self.stream_sid,
+            "room_name": self.room_name,
+            "media_mode": self.media_mode,
+            "status": self.status,
+            "created_at": self.created_at,
+            "idle_seconds": round(time.monotonic() - self.last_activity, 1),
+        }
+
+
+CleanupHook = Callable[[CallRecord], Awaitable[None]]
+OrphanSweep = Callable[[set], Awaitable[int]]
+
+
+class CallLifecycleService:
+    """
+    Single source of truth for which calls are live.
+
+    Fed by Twilio status callbacks, LiveKit webhooks and media stream
+    connect/disconnect. Calls are indexed by call ID, Twilio call SID and
+    LiveKit room name. When a call ends every registered cleanup hook runs
+    once; a periodic reaper ends calls that went idle without a terminal
+    event and runs orphan sweeps for state no live call owns.
+    """
+
+    def __init__(self, idle_timeout: float = 600.0, max_call_duration: float = 3600.0):
+        self.idle_timeout = idle_timeout
+        self.max_call_duration = max_call_duration
+        self.calls: Dict[str, CallRecord] = {}
+        self._by_twilio_sid: Dict[str, str] = {}
+        self._by_room: Dict[str, str] = {}
+        self._cleanup_hooks: List[CleanupHook] = []
+        self._orphan_sweeps: List[OrphanSweep] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self.ended_count = 0
+
+    def add_cleanup_hook(self, hook: CleanupHook) -> None:
+        """
+        Register a coroutine called with the CallRecord when a call ends
+        """
+        self._cleanup_hooks.append(hook)
+
+    def add_orphan_sweep(self, sweep: OrphanSweep) -> None:
+        """
+        Register a coroutine called by the reaper with the set of live call
+        IDs; it should release anything not owned by them and return a count
+        """
+        self._orphan_sweeps.append(sweep)
+
+    def register(self, call_id: str, **fields) -> CallRecord:
+        """
+        Add a call to the live table, or update it if already present
+        """
+        record = self.calls.get(call_id)
+        if record is None:
+            record = CallRecord(call_id=call_id)
+            self.calls[call_id] = record
+            logger.debug("Tracking call %s", call_id)
+        for name, value in fields.items():
+            if value is not None:
+                setattr(record, name, value)
+        if record.twilio_sid:
+            self._by_twilio_sid[record.twilio_sid] = call_id
+        if record.room_name:
+            self._by_room[record.room_name] = call_id
+        record.last_activity = time.monotonic()
+        return record
+
+    def get(self, call_id: str) -> Optional[CallRecord]:
+        return self.calls.get(call_id)
+
+    def find_by_twilio_sid(self, call_sid: str) -> Optional[CallRecord]:
+        call_id = self._by_twilio_sid.get(call_sid)
+        return self.calls.get(call_id) if call_id else None
+
+    def find_by_room(self, room_name: str) -> Optional[CallRecord]:
+        call_id = self._by_room.get(room_name)
+        return self.calls.get(call_id) if call_id else None
+
+    def touch(self, call_id: str) -> None:
+        """
+        Note activity on a call so the reaper leaves it alone
+        """
+        record = self.calls.get(call_id)
+        if record is not None:
+            record.last_activity = time.monotonic()
+
+    async def on_twilio_status(self, call_sid: str, status: str) -> None:
+        """
+        Handle a Twilio status callback
+        """
+        record = self.find_by_twilio_sid(call_sid)
+        if record is None:
+            logger.debug("Status %s for untracked Twilio call %s", status, call_sid)
+            return
+        record.status = status
+        record.last_activity = time.monotonic()
+        if status in TERMINAL_TWILIO_STATUSES:
+            await self.end(record.call_id, f"twilio:{status}")
+
+    async def on_room_ended(self, room_name: str) -> None:
+        """
+        Handle a LiveKit room_ended webhook
+        """
+        record = self.find_by_room(room_name)
+        if record is not None:
+            await self.end(record.call_id, "livekit:room_ended")
+
+    async def on_stream_closed(self, call_id: str) -> None:
+        """
+        Handle the Twilio media stream websocket closing
+        """
+        await self.end(call_id, "stream_closed")
+
+    def forget(self, call_id: str) -> Optional[CallRecord]:
+        """
+        Drop a call that another server process has taken over or ended,
+        without running cleanup hooks: its state lives in that process
+        """
+        record = self.calls.pop(call_id, None)
+        if record is None:
+            return None
+        if record.twilio_sid:
+            self._by_twilio_sid.pop(record.twilio_sid, None)
+        if record.room_name:
+            self._by_room.pop(record.room_name, None)
+        logger.info("Call %s is handled by another worker (%s), no longer tracking it", call_id, record.status)
+        return record
+
+    async def end(self, call_id: str, reason: str) -> None:
+        """
+        Remove a call from the live table and run its cleanup hooks once
+        """
+        record = self.calls.pop(call_id, None)
+        if record is None:
+            return
+        if record.twilio_sid:
+            self._by_twilio_sid.pop(record.twilio_sid, None)
+        if record.room_name:
+            self._by_room.pop(record.room_name, None)
+        record.ended_at = time.time()
+        record.end_reason = reason
+        self.ended_count += 1
+        logger.info("Call %s ended (%s), cleaning up", call_id, reason)
+
+        for hook in self._cleanup_hooks:
+            try:
+                await hook(record)
+            except Exception as e:
+                logger.error(f"Error in cleanup for call {call_id}: {str(e)}")
+
+    async def reap(self) -> int:
+        """
+        End idle or overlong calls and sweep orphaned state; returns the
+        number of calls and orphans released
+        """
+        now = time.monotonic()
+        wall = time.time()
+        stale = [
+            record.call_id for record in self.calls.values()
+            if now - record.last_activity > self.idle_timeout
+            or wall - record.created_at > self.max_call_duration
+        ]
+        for call_id in stale:
+            await self.end(call_id, "reaped")
+
+        released = len(stale)
+        live = set(self.calls)
+        for sweep in self._orphan_sweeps:
+            try:
+                released += await sweep(live)
+            except Exception as e:
+                logger.error(f"Error in orphan sweep: {str(e)}")
+        if released:
+            logger.info("Reaper released %d stale calls/orphans", released)
+        return released
+
+    def start_reaper(self, interval: float = 60.0) -> None:
+        """
+        Run reap() every interval seconds in the background
+        """
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._run_reaper(interval))
+
+    async def stop_reaper(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+
+    async def _run_reaper(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                logger.error(f"Error in call reaper: {str(e)}")
@@ -0,0 +1,287 @@
+import asyncio
+import base64
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    call_id TEXT PRIMARY KEY,
+    phone_number TEXT,
+    campaign TEXT,
+    account_number TEXT,
+    amount REAL,
+    due_date TEXT,
+    media_mode TEXT,
+    twilio_sid TEXT,
+    status TEXT,
+    end_reason TEXT,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    turns INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS calls_phone_number ON calls (phone_number, started_at, call_id);
+CREATE INDEX IF NOT EXISTS calls_campaign ON calls (campaign, started_at, call_id);
+CREATE INDEX IF NOT EXISTS calls_started_at ON calls (started_at, call_id);
+CREATE INDEX IF NOT EXISTS calls_twilio_sid ON calls (twilio_sid);
+
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    call_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    speaker TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS turns_call_id ON turns (call_id, seq);
+CREATE INDEX IF NOT EXISTS turns_created_at ON turns (created_at);
+"""
+
+CALL_FIELDS = (
+    "phone_number", "campaign", "account_number", "amount", "due_date",
+    "media_mode", "twilio_sid", "status", "end_reason", "started_at", "ended_at"
+)
+
+
+def encode_cursor(*values: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+class CallRecordStore:
+    """
+    Durable store of calls and their transcript turns.
+
+    Call pipelines never touch the database: record_call, record_turn and
+    end_call put operations on a queue, and one writer task drains it,
+    writing up to batch_size operations per transaction on a dedicated
+    thread. SQLite runs in WAL mode so queries on the read connection are
+    not blocked by the writer. Queries page with keyset cursors rather
+    than OFFSET, so deep pages stay cheap on large tables.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 0.5, max_queue: int = 100000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "asyncio.Queue[Optional[Tuple]]" = asyncio.Queue(maxsize=max_queue)
+        self._writer_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="call-records")
+        self._writer: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.batches = 0
+        self.written = 0
+
+        self._write_db = sqlite3.connect(path, check_same_thread=False)
+        self._write_db.execute("PRAGMA journal_mode=WAL")
+        self._write_db.execute("PRAGMA synchronous=NORMAL")
+        self._write_db.executescript(SCHEMA)
+        self._read_db = sqlite3.connect(path, check_same_thread=False)
+        self._read_db.row_factory = sqlite3.Row
+        self._read_lock = threading.Lock()
+
+    # Writes
+
+    def _put(self, op: Tuple) -> None:
+        try:
+            self._queue.put_nowait(op)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Call record queue full; dropped %s for call %s", op[0], op[1])
+
+    def record_call(self, call_id: str, **fields) -> None:
+        """
+        Create or update a call row; None values leave columns unchanged
+        """
+        unknown = set(fields) - set(CALL_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown call fields: {', '.join(sorted(unknown))}")
+        fields.setdefault("started_at", time.time())
+        self._put(("call", call_id, fields))
+
+    def record_turn(self, call_id: str, speaker: str, text: str) -> None:
+        """
+        Append one utterance to the call's transcript; it is numbered when
+        written, after the call's last stored turn
+        """
+        self._put(("turn", call_id, (speaker, text, time.time())))
+
+    def end_call(self, call_id: str, status: Optional[str] = None, end_reason: Optional[str] = None) -> None:
+        self._put(("call", call_id, {"status": status, "end_reason": end_reason, "ended_at": time.time()}))
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run_writer())
+
+    async def close(self) -> None:
+        """
+        Flush queued operations and stop the writer
+        """
+        if self._writer is not None:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        self._writer_thread.shutdown(wait=True)
+        self._write_db.close()
+        self._read_db.close()
+
+    async def _run_writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            op = await self._queue.get()
+            stopping = op is None
+            batch = [] if stopping else [op]
+            # Collect whatever else arrives within the flush interval
+            deadline = loop.time() + self.flush_interval
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    op = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        op = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if op is None:
+                    stopping = True
+                else:
+                    batch.append(op)
+            if batch:
+                try:
+                    await loop.run_in_executor(self._writer_thread, self._write_batch, batch)
+                except Exception as e:
+                    logger.error(f"Error writing call records: {str(e)}")
+            if stopping:
+                return
+
+    def _write_batch(self, batch: List[Tuple]) -> None:
+        with self._write_db:
+            for kind, call_id, payload in batch:
+                if kind == "turn":
+                    speaker, text, created_at = payload
+                    # Numbered from the stored turns, so turns written after
+                    # the call ended, or by another process, still follow on
+                    cursor = self._write_db.execute(
+                        "INSERT OR IGNORE INTO turns (call_id, seq, speaker, text, created_at) "
+                        "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM turns WHERE call_id = ?",
+                        (call_id, speaker, text, created_at, call_id)
+                    )
+                    if cursor.rowcount == 0:
+                        continue
+                    self._write_db.execute(
+                        "INSERT INTO calls (call_id, started_at, turns) VALUES (?, ?, 1) "
+                        "ON CONFLICT (call_id) DO UPDATE SET turns = turns + 1",
+                        (call_id, created_at)
+                    )
+                else:
+                    # started_at only applies when the row is created
+                    started_at = payload.get("started_at") or time.time()
+                    columns = [name for name, value in payload.items() if value is not None and name != "started_at"]
+                    values = [payload[name] for name in columns]
+                    updates = ", ".join(f"{name} = excluded.{name}" for name in columns)
+                    self._write_db.execute(
+                        f"INSERT INTO calls (call_id, started_at{''.join(', ' + name for name in columns)}) "
+                        f"VALUES (?, ?{', ?' * len(columns)}) "
+                        f"ON CONFLICT (call_id) DO {'UPDATE SET ' + updates if updates else 'NOTHING'}",
+                        [call_id, started_at, *values]
+                    )
+        self.batches += 1
+        self.written += len(batch)
+
+    # Queries
+
+    def _fetch(self, sql: str, params: list) -> List[dict]:
+        with self._read_lock:
+            return [dict(row) for row in self._read_db.execute(sql, params)]
+
+    def query_calls(
+        self,
+        phone_number: Optional[str] = None,
+        campaign: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """
+        Calls matching the filters, newest first. Returns {"items": [...],
+        "next_cursor": ...}; pass next_cursor back to get the next page.
+        """
+        clauses, params = [], []
+        for column, value in (("phone_number", phone_number), ("campaign", campaign), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("started_at < ?")
+            params.append(until)
+        if cursor:
+            started_at, call_id = decode_cursor(cursor)
+            clauses.append("(started_at, call_id) < (?, ?)")
+            params += [started_at, call_id]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        items = self._fetch(
+            f"SELECT * FROM calls {where} ORDER BY started_at DESC, call_id DESC LIMIT ?",
+            params + [limit]
+        )
+        next_cursor = encode_cursor(items[-1]["started_at"], items[-1]["call_id"]) if len(items) == limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def get_call(self, call_id: str) -> Optional[dict]:
+        rows = self._fetch("SELECT * FROM calls WHERE call_id = ?", [call_id])
+        return rows[0] if rows else None
+
+    def find_call_by_twilio_sid(self, twilio_sid: str) -> Optional[dict]:
+        rows = self._fetch("SELECT * FROM calls WHERE twilio_sid = ?", [twilio_sid])
+        return rows[0] if rows else None
+
+    def get_states(self, call_ids: List[str]) -> Dict[str, dict]:
+        """
+        status and ended_at of each of call_ids that has a row
+        """
+        if not call_ids:
+            return {}
+        rows = self._fetch(
+            f"SELECT call_id, status, ended_at FROM calls WHERE call_id IN ({', '.join('?' * len(call_ids))})",
+            list(call_ids)
+        )
+        return {row["call_id"]: row for row in rows}
+
+    def get_turns(self, call_id: str, after_seq: int = 0, limit: int = 200) -> dict:
+        """
+        A call's transcript in order, paged by turn sequence number
+        """
+        items = self._fetch(
+            "SELECT seq, speaker, text, created_at FROM turns WHERE call_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            [call_id, after_seq, limit]
+        )
+        next_seq = items[-1]["seq"] if len(items) == limit else None
+        return {"items": items, "next_after_seq": next_seq}
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import LatencyRegistry
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_BYTES = np.dtype(np.int16).itemsize
+MIN_BLOCK_BYTES = 64 * 1024
+
+# Worker side: blocks stay attached between jobs, since the parent keeps
+# recycling the same few of them
+MAX_ATTACHED = 64
+_attached: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    block = _attached.get(name)
+    if block is not None:
+        _attached.move_to_end(name)
+        return block
+    block = _attached[name] = shared_memory.SharedMemory(name=name)
+    if len(_attached) > MAX_ATTACHED:
+        _attached.popitem(last=False)[1].close()
+    return block
+
+
+def _run_job(func: Callable[..., np.ndarray], in_name: str, in_count: int, out_name: str, out_capacity: int, kwargs: dict) -> Any:
+    """
+    Run func on the samples in one shared block and write its result into
+    another; returns the result length, or the result itself if it does not fit
+    """
+    samples = np.ndarray((in_count,), dtype=np.int16, buffer=_attach(in_name).buf)
+    result = func(samples, **kwargs)
+    if result.size > out_capacity:
+        return np.array(result, dtype=np.int16)
+    np.ndarray((result.size,), dtype=np.int16, buffer=_attach(out_name).buf)[:] = result
+    return result.size
+
+
+def _watch_parent(parent: int) -> None:
+    """
+    Worker initializer: exit once the server process that owns the pool is
+    gone. A pool worker holds its own job queue open, so without this one
+    whose server process was killed would wait on the queue forever.
+    """
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(1.0)
+        os._exit(0)
+    threading.Thread(target=watch, name="dsp-parent-watch", daemon=True).start()
+
+
+def _ready(rate_pairs: Tuple[Tuple[int, int], ...]) -> int:
+    """
+    Import the DSP code and build the filter banks in a worker
+    """
+    from utils.resampler import get_filter_bank
+    for in_rate, out_rate in rate_pairs:
+        if in_rate != out_rate:
+            get_filter_bank(in_rate, out_rate)
+    return os.getpid()
+
+
+class DSPExecutor:
+    """
+    Runs CPU-heavy transforms of int16 audio off the event loop.
+
+    Clips are handed to a process pool through shared memory blocks that
+    are reused from job to job, so neither the input nor the result is
+    pickled. Clips shorter than inline_samples are transformed on the
+    loop, where the round trip to a worker would cost more than the work
+    itself, and so is everything when workers is 0 or the pool breaks.
+    """
+
+    def __init__(self, workers: Optional[int] = None, inline_samples: int = 8000):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.inline_samples = inline_samples
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._free: Dict[int, List[shared_memory.SharedMemory]] = {}
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.jobs: Counter = Counter()
+        self.latency = LatencyRegistry()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: the server process has threads and an event loop
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_watch_parent,
+                initargs=(os.getpid(),)
+            )
+        return self._pool
+
+    def warm(self, rate_pairs: Iterable[Tuple[int, int]] = ()) -> None:
+        """
+        Start the workers and build the filter banks for rate_pairs, so the
+        first call does not pay for process startup
+        """
+        if not self.workers:
+            return
+        started = time.monotonic()
+        pairs = tuple(rate_pairs)
+        pids = set(self.pool.map(_ready, [pairs] * self.workers))
+        logger.info("Started %d DSP worker(s) in %.3fs", len(pids), time.monotonic() - started)
+
+    def _acquire(self, nbytes: int) -> shared_memory.SharedMemory:
+        size = max(MIN_BLOCK_BYTES, 1 << (max(nbytes, 1) - 1).bit_length())
+        free = self._free.get(size)
+        if free:
+            return free.pop()
+        block = shared_memory.SharedMemory(create=True, size=size)
+        self._blocks.append(block)
+        return block
+
+    def _release(self, *blocks: shared_memory.SharedMemory) -> None:
+        for block in blocks:
+            self._free.setdefault(block.size, []).append(block)
+
+    def _inline(self, func: Callable[..., np.ndarray], samples: np.ndarray, kwargs: dict) -> np.ndarray:
+        started = time.monotonic()
+        result = func(samples, **kwargs)
+        self.jobs["inline"] += 1
+        self.latency.record("inline", time.monotonic() - started)
+        return result
+
+    async def run(self, func: Callable[..., np.ndarray], samples: np.ndarray, out_samples: int, **kwargs) -> np.ndarray:
+        """
+        Return func(samples, **kwargs) as int16.
+
+        func must be a module-level function so workers can import it, and
+        out_samples an upper bound on the length of its result.
+        """
+        if not self.workers or samples.size < self.inline_samples:
+            return self._inline(func, samples, kwargs)
+
+        started = time.monotonic()
+        samples = np.ascontiguousarray(samples, dtype=np.int16)
+        try:
+            in_block = self._acquire(samples.nbytes)
+            out_block = self._acquire(out_samples * SAMPLE_BYTES)
+        except OSError as e:
+            logger.warning("No shared memory for a DSP job, running it inline: %s", e)
+            self.jobs["fallback"] += 1
+            return self._inline(func, samples, kwargs)
+
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        future: Optional[Future] = None
+        try:
+            np.ndarray(samples.shape, dtype=np.int16, buffer=in_block.buf)[:] = samples
+            future = pool.submit(_run_job, func, in_block.name, samples.size, out_block.name, out_samples, kwargs)
+            result = await asyncio.wrap_future(future)
+            if isinstance(result, int):
+                result = np.ndarray((result,), dtype=np.int16, buffer=out_block.buf).copy()
+        except BrokenProcessPool as e:
+            # Every job queued on a broken pool fails; only the first replaces it
+            if self._pool is pool:
+                logger.error(f"DSP worker died, restarting the pool: {str(e)}")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            self.jobs["fallback"] += 1
+            return self._inline(func, samples, kwargs)
+        finally:
+            if future is None or future.done():
+                self._release(in_block, out_block)
+            else:
+                # Cancelled while a worker still uses the blocks: recycle them once it is done
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, in_block, out_block))
+        self.jobs["offloaded"] += 1
+        self.latency.record("offloaded", time.monotonic() - started)
+        return result
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+        self._free.clear()
+
+    def summary(self) -> dict:
+        latency = self.latency.summary()
+        return {
+            "workers": self.workers,
+            "inline_samples": self.inline_samples,
+            "jobs": dict(self.jobs),
+            "inline": latency.get("inline", {"count": 0}),
+            "offloaded": latency.get("offloaded", {"count": 0}),
+            "shared_blocks": len(self._blocks),
+            "shared_bytes": sum(block.size for block in self._blocks),
+        }
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from utils.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderPool:
+    """
+    Shared keep-alive HTTP connections to one provider.
+
+    Every request a service makes to the provider goes through one
+    httpx.AsyncClient, so TCP and TLS are set up once per connection
+    instead of once per request. warm() opens connections before the first
+    call needs them and the keep-warm loop re-probes them before the
+    provider closes them as idle. A trace hook tells, for every request,
+    whether it reused a pooled connection or paid for a new handshake.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        headers: Optional[Dict[str, str]] = None,
+        probe_path: str = "/",
+        warm_connections: int = 2,
+        max_connections: int = 20,
+        keepalive_expiry: float = 90.0,
+        timeout: float = 30.0
+    ):
+        self.name = name
+        self.probe_path = probe_path
+        self.warm_connections = warm_connections
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            event_hooks={"request": [self._trace_request]}
+        )
+        self.requests = 0
+        self.reused = 0
+        self.handshakes = 0
+        self.handshake_stats = LatencyStats()
+        self.probes = 0
+        self.probe_failures = 0
+        self.last_probe_status: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _trace_request(self, request: httpx.Request) -> None:
+        # Probes keep the pool warm; only real traffic counts towards reuse
+        if request.extensions.get("probe"):
+            return
+        connect_started = None
+
+        async def trace(event: str, info: dict) -> None:
+            nonlocal connect_started
+            if event == "connection.connect_tcp.started":
+                connect_started = time.monotonic()
+            elif event.endswith(".send_request_headers.started"):
+                self.requests += 1
+                if connect_started is None:
+                    self.reused += 1
+                else:
+                    self.handshakes += 1
+                    self.handshake_stats.record(time.monotonic() - connect_started)
+                    connect_started = None
+
+        request.extensions["trace"] = trace
+
+    async def _probe_once(self) -> bool:
+        self.probes += 1
+        try:
+            response = await self.client.get(self.probe_path, extensions={"probe": True})
+        except httpx.HTTPError as e:
+            self.probe_failures += 1
+            logger.warning("%s probe failed: %s", self.name, e)
+            return False
+        # Any response means the connection is up, even an error status
+        self.last_probe_status = response.status_code
+        if response.is_error:
+            logger.warning("%s probe returned HTTP %d", self.name, response.status_code)
+        return True
+
+    async def warm(self) -> None:
+        """
+        Open warm_connections connections by probing them concurrently
+        """
+        started = time.monotonic()
+        results = await asyncio.gather(*(self._probe_once() for _ in range(self.warm_connections)))
+        logger.info("Warmed %d/%d %s connection(s) in %.3fs", sum(results), len(results), self.name, time.monotonic() - started)
+
+    async def _keep_warm(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.gather(*(self._probe_once() for _ in range(self.warm_connections)))
+
+    def start(self, interval: float) -> None:
+        """
+        Re-probe the pool every interval seconds; keep interval below the
+        provider's idle timeout and keepalive_expiry
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._keep_warm(interval))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.client.aclose()
+        except RuntimeError as e:
+            # Requests cancelled at shutdown can still count as in flight
+            logger.warning("Closed %s pool with requests in flight: %s", self.name, e)
+
+    def summary(self) -> dict:
+        return {
+            "requests": self.requests,
+            "reused": self.reused,
+            "handshakes": self.handshakes,
+            "reuse_rate": round(self.reused / self.requests, 4) if self.requests else None,
+            "handshake": self.handshake_stats.summary(),
+            "probes": self.probes,
+            "probe_failures": self.probe_failures,
+            "last_probe_status": self.last_probe_status,
+        }
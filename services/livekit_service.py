@@ -55,7 +55,7 @@ class LiveKitService:
                 secret = self.api_secret
 
             token = jwt.encode(claims, secret, algorithm="HS256")
-            logger.debug(f"Generated token for room {room_name} with claims: {claims}")
+            logger.debug("Generated token for room %s with claims: %s", room_name, claims)
             return token
         except Exception as e:
             logger.error(f"Error generating token: {str(e)}")
@@ -120,11 +120,24 @@ class LiveKitService:
             # Send audio data
             track = self.audio_tracks[room_name]
             await track.write(audio_data)
-            logger.debug(f"Sent audio data to room: {room_name}")
+            logger.debug("Sent audio data to room: %s", room_name)
         except Exception as e:
             logger.error(f"Error sending audio: {str(e)}")
             raise
 
+    def audio_sink(self, audio_source: rtc.AudioSource):
+        """
+        Return a playout sink that captures int16 frames into an audio source
+        """
+        async def sink(frame) -> None:
+            await audio_source.capture_frame(rtc.AudioFrame(
+                data=frame.tobytes(),
+                sample_rate=audio_source.sample_rate,
+                num_channels=audio_source.num_channels,
+                samples_per_channel=frame.size
+            ))
+        return sink
+
     async def cleanup_room(self, room_name: str):
         """Clean up a LiveKit room"""
         try:
@@ -161,6 +174,24 @@ class LiveKitService:
             logger.error(f"Error cleaning up LiveKit room: {str(e)}")
             raise
 
+    async def release_room(self, room_name: str, delete: bool = True) -> None:
+        """
+        Forget a room's local state, disconnect from it and optionally delete it
+        """
+        self.audio_tracks.pop(room_name, None)
+        room = self.rooms.pop(room_name, None)
+        if room is not None:
+            try:
+                await room.disconnect()
+            except Exception as e:
+                logger.error(f"Error disconnecting from room {room_name}: {str(e)}")
+        if delete:
+            try:
+                await self.cleanup_room(room_name)
+            except Exception:
+                # cleanup_room already logged it; the room may be gone
+                pass
+
     async def get_room_participants(self, room_name: str) -> list[str]:
         """
         Get list of participants in a room
@@ -0,0 +1,107 @@
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils.metrics import LatencyRegistry
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+LARGE = "large"
+
+
+class LLMRouter:
+    """
+    Picks the model tier for each conversation turn.
+
+    Turns go to the fast model unless a rule says the larger model is
+    needed: the caller mentions a negotiation or dispute keyword, says a
+    lot at once, or was transcribed with low confidence. A call stays on
+    the larger model for sticky_turns turns after an escalation, since a
+    negotiation rarely ends in one exchange. With no fast model configured
+    every turn goes to the larger one.
+    """
+
+    def __init__(
+        self,
+        fast_model: Optional[str],
+        large_model: str,
+        keywords: Iterable[str] = (),
+        max_fast_words: int = 30,
+        min_confidence: float = 0.75,
+        sticky_turns: int = 2
+    ):
+        self.models = {FAST: fast_model or large_model, LARGE: large_model}
+        self.enabled = bool(fast_model) and fast_model != large_model
+        phrases = sorted({k.strip().lower() for k in keywords if k.strip()}, key=len, reverse=True)
+        self._keywords = re.compile(r"\b(?:" + "|".join(map(re.escape, phrases)) + r")\b") if phrases else None
+        self.max_fast_words = max_fast_words
+        self.min_confidence = min_confidence
+        self.sticky_turns = sticky_turns
+        self._sticky: Dict[str, int] = {}
+        self.turns: Counter = Counter()
+        self.escalations: Counter = Counter()
+        self.fallbacks = 0
+        self.latency = LatencyRegistry()
+
+    def route(self, call_id: str, text: str, confidence: Optional[float] = None) -> Tuple[str, Optional[str]]:
+        """
+        Return (tier, reason) for a turn; reason is None for the default tier
+        """
+        tier, reason = self._classify(call_id, text, confidence)
+        self.turns[tier] += 1
+        if reason is not None:
+            self.escalations[reason] += 1
+        return tier, reason
+
+    def _classify(self, call_id: str, text: str, confidence: Optional[float]) -> Tuple[str, Optional[str]]:
+        if not self.enabled:
+            return LARGE, None
+        match = self._keywords.search(text.lower()) if self._keywords else None
+        if match:
+            reason = f"keyword:{match.group(0)}"
+        elif len(text.split()) > self.max_fast_words:
+            reason = "long_turn"
+        elif confidence is not None and confidence < self.min_confidence:
+            reason = "low_confidence"
+        elif self._sticky.get(call_id):
+            self._sticky[call_id] -= 1
+            return LARGE, "sticky"
+        else:
+            return FAST, None
+        self._sticky[call_id] = self.sticky_turns
+        return LARGE, reason
+
+    def record(self, tier: str, seconds: float, first_token: Optional[float] = None) -> None:
+        self.latency.record(tier, seconds)
+        if first_token is not None:
+            self.latency.record(f"{tier}_first_token", first_token)
+
+    def record_fallback(self) -> None:
+        """
+        Count a fast-model failure that was retried on the larger model
+        """
+        self.fallbacks += 1
+
+    def forget(self, call_id: str) -> None:
+        self._sticky.pop(call_id, None)
+
+    def summary(self) -> dict:
+        total = sum(self.turns.values())
+        latency = self.latency.summary()
+        return {
+            "enabled": self.enabled,
+            "tiers": {
+                tier: {
+                    "model": model,
+                    "turns": self.turns[tier],
+                    "latency": latency.get(tier, {"count": 0}),
+                    "first_token": latency.get(f"{tier}_first_token", {"count": 0}),
+                }
+                for tier, model in self.models.items()
+            },
+            "escalation_rate": round(sum(self.escalations.values()) / total, 4) if total else 0.0,
+            "escalations": dict(self.escalations.most_common()),
+            "fallbacks": self.fallbacks,
+        }
@@ -1,30 +1,16 @@
-from groq import Groq
+from groq import AsyncGroq
+import httpx
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional
 import json
+import time
 from config import get_settings
+from services.llm_router import LLMRouter, FAST, LARGE
+from utils.metrics import InFlightGauge
 
 logger = logging.getLogger(__name__)
 
-class LLMService:
-    def __init__(self, api_key: str, model: str = None):
-        self.client = Groq(api_key=api_key)
-        settings = get_settings()
-        self.model = model or settings.GROQ_MODEL
-        logger.info(f"Initializing LLM service with model: {self.model}")
-        self.conversation_history: Dict[str, List[Dict[str, str]]] = {}
-
-    async def generate_response(self, user_input: str, call_id: str) -> str:
-        """
-        Generate a response using Groq's LLM model based on user input and conversation history
-        """
-        try:
-            # Initialize conversation history for new calls
-            if call_id not in self.conversation_history:
-                self.conversation_history[call_id] = [
-                    {
-                        "role": "system",
-                        "content": """You are a professional debt collection agent. Follow these rules:
+SYSTEM_PROMPT = """You are a professional debt collection agent. Follow these rules:
                         1. Keep responses short and clear - maximum 2-3 sentences
                         2. Use simple, conversational language
                         3. Avoid special characters, emojis, or formatting
@@ -41,67 +27,216 @@ class LLMService:
                         - "The outstanding amount is 5000 rupees. When would be a good time for you to make the payment?"
                         - "I can help you set up a payment plan. What amount would you be comfortable paying each month?"
                         """
-                    }
-                ]
 
-            # Add user input to conversation history
-            self.conversation_history[call_id].append({
-                "role": "user",
-                "content": user_input
-            })
+# Appended to the system prompt when the call's account is known; the
+# suggested wording matches a sentence the agent can speak from cached audio
+ACCOUNT_PROMPT = """
+                        The customer's outstanding amount is {amount} rupees, due on {due_date}.
+                        When you state it, say exactly: "The outstanding amount is {amount} rupees, due on {due_date}."
+                        """
+
+# Sent in place of a caller turn when the caller has gone quiet
+SILENCE_PROMPT = "The customer has been silent for a while. Please check if they're still there."
+
+class LLMService:
+    def __init__(self, api_key: str, model: str = None, router: Optional[LLMRouter] = None, http_client: Optional[httpx.AsyncClient] = None):
+        # http_client lets calls share a keep-alive connection pool
+        self.client = AsyncGroq(api_key=api_key, http_client=http_client)
+        settings = get_settings()
+        self.model = model or settings.GROQ_MODEL
+        # Without a router every turn goes to self.model
+        self.router = router or LLMRouter(None, self.model)
+        logger.info(f"Initializing LLM service with model: {self.model}")
+        if self.router.enabled:
+            logger.info("Routing routine turns to fast model: %s", self.router.models[FAST])
+        self.conversation_history: Dict[str, List[Dict[str, str]]] = {}
+        self.last_used: Dict[str, float] = {}
+        self.accounts: Dict[str, Dict[str, str]] = {}
+        self.in_flight = InFlightGauge()  # completions awaiting Groq
+
+    def _prepare_turn(self, user_input: str, call_id: str) -> List[Dict[str, str]]:
+        """
+        Return the call's message history with user_input appended
+        """
+        # Initialize conversation history for new calls
+        if call_id not in self.conversation_history:
+            self.conversation_history[call_id] = [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT + (ACCOUNT_PROMPT.format(**self.accounts[call_id]) if call_id in self.accounts else "")
+                }
+            ]
+
+        self.last_used[call_id] = time.monotonic()
+
+        # Add user input to conversation history
+        self.conversation_history[call_id].append({
+            "role": "user",
+            "content": user_input
+        })
+        return self.conversation_history[call_id]
+
+    def set_account(self, call_id: str, amount: str, due_date: str) -> None:
+        """
+        Tell the agent the amount and due date of the call's debt, before its first turn
+        """
+        self.accounts[call_id] = {"amount": amount, "due_date": due_date}
+        self.last_used[call_id] = time.monotonic()
+
+    def _finish_turn(self, call_id: str, bot_response: str) -> None:
+        """
+        Store the assistant reply and trim the history
+        """
+        self.conversation_history[call_id].append({
+            "role": "assistant",
+            "content": bot_response
+        })
+
+        # Keep conversation history manageable
+        if len(self.conversation_history[call_id]) > 10:
+            self.conversation_history[call_id] = self.conversation_history[call_id][-10:]
+
+    @staticmethod
+    def _clean_response(bot_response: str) -> str:
+        """
+        Strip characters that TTS reads badly
+        """
+        bot_response = bot_response.replace('"', '')  # Remove quotes
+        bot_response = bot_response.replace('"', '')  # Remove smart quotes
+        bot_response = bot_response.replace('"', '')  # Remove other quote types
+        bot_response = bot_response.replace('"', '')
+        bot_response = bot_response.replace('...', '.')  # Replace ellipsis with period
+        bot_response = bot_response.replace('…', '.')  # Replace other ellipsis
+        bot_response = bot_response.replace('–', '-')  # Replace en dash
+        bot_response = bot_response.replace('—', '-')  # Replace em dash
+        
+        # Remove any remaining special characters
+        return ''.join(char for char in bot_response if char.isprintable() and ord(char) < 128)
+
+    def _completion_args(self, messages: List[Dict[str, str]], stream: bool, model: Optional[str] = None) -> Dict[str, Any]:
+        return dict(
+            model=model or self.model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=150,  # Increased for more natural responses
+            top_p=0.95,
+            presence_penalty=0.6,  # Encourage diverse responses
+            frequency_penalty=0.3,  # Reduce repetition
+            stream=stream
+        )
+
+    def _route(self, user_input: str, call_id: str, confidence: Optional[float]) -> str:
+        tier, reason = self.router.route(call_id, user_input, confidence)
+        if reason is not None:
+            logger.info("Escalating turn of call %s to %s (%s)", call_id, self.router.models[tier], reason)
+        return tier
+
+    def _fall_back(self, tier: str, error: Exception) -> str:
+        """
+        Return the tier to retry a failed completion on, or raise error if
+        it already ran on the larger model
+        """
+        if tier == LARGE or not self.router.enabled:
+            raise error
+        logger.warning(f"Fast model failed, retrying on {self.router.models[LARGE]}: {str(error)}")
+        self.router.record_fallback()
+        return LARGE
+
+    async def generate_response(self, user_input: str, call_id: str, confidence: Optional[float] = None) -> str:
+        """
+        Generate a response using Groq's LLM model based on user input and conversation history.
+        confidence is the transcript's STT confidence, if known; the router
+        sends low-confidence turns to the larger model
+        """
+        try:
+            messages = self._prepare_turn(user_input, call_id)
+            tier = self._route(user_input, call_id, confidence)
 
             # Generate response using Groq
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=self.conversation_history[call_id],
-                temperature=0.7,
-                max_tokens=150,  # Increased for more natural responses
-                top_p=0.95,
-                presence_penalty=0.6,  # Encourage diverse responses
-                frequency_penalty=0.3,  # Reduce repetition
-                stream=False
-            )
-
-            # Extract and store response
-            bot_response = response.choices[0].message.content.strip()
-            
-            # Clean up response
-            bot_response = bot_response.replace('"', '')  # Remove quotes
-            bot_response = bot_response.replace('"', '')  # Remove smart quotes
-            bot_response = bot_response.replace('"', '')  # Remove other quote types
-            bot_response = bot_response.replace('"', '')
-            bot_response = bot_response.replace('...', '.')  # Replace ellipsis with period
-            bot_response = bot_response.replace('…', '.')  # Replace other ellipsis
-            bot_response = bot_response.replace('–', '-')  # Replace en dash
-            bot_response = bot_response.replace('—', '-')  # Replace em dash
-            
-            # Remove any remaining special characters
-            bot_response = ''.join(char for char in bot_response if char.isprintable() and ord(char) < 128)
-            
-            self.conversation_history[call_id].append({
-                "role": "assistant",
-                "content": bot_response
-            })
-
-            # Keep conversation history manageable
-            if len(self.conversation_history[call_id]) > 10:
-                self.conversation_history[call_id] = self.conversation_history[call_id][-10:]
-
-            logger.debug(f"Generated response: {bot_response}")
+            with self.in_flight.track():
+                while True:
+                    started = time.monotonic()
+                    try:
+                        response = await self.client.chat.completions.create(
+                            **self._completion_args(messages, stream=False, model=self.router.models[tier])
+                        )
+                        break
+                    except Exception as e:
+                        tier = self._fall_back(tier, e)
+            self.router.record(tier, time.monotonic() - started)
+
+            # Extract, clean up and store response
+            bot_response = self._clean_response(response.choices[0].message.content.strip())
+            self._finish_turn(call_id, bot_response)
+
+            logger.debug("Generated response: %s", bot_response)
             return bot_response
 
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
             raise
 
+    async def generate_response_stream(self, user_input: str, call_id: str, confidence: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Like generate_response, but yields cleaned text deltas as the model
+        produces them; the full reply is stored in the history at the end.
+        A fast-model failure is retried on the larger model only if nothing
+        has been yielded yet
+        """
+        try:
+            messages = self._prepare_turn(user_input, call_id)
+            tier = self._route(user_input, call_id, confidence)
+            parts: List[str] = []
+            # A trailing run of dots is held back until the next delta, so an
+            # ellipsis split across deltas is cleaned as a whole
+            held = ""
+
+            with self.in_flight.track():
+                while True:
+                    started = time.monotonic()
+                    first_token = None
+                    try:
+                        chunks = await self.client.chat.completions.create(
+                            **self._completion_args(messages, stream=True, model=self.router.models[tier])
+                        )
+                        # Closing the stream returns its connection to the pool,
+                        # even when the caller stops reading early
+                        async with chunks:
+                            async for chunk in chunks:
+                                delta = chunk.choices[0].delta.content if chunk.choices else None
+                                if not delta:
+                                    continue
+                                if first_token is None:
+                                    first_token = time.monotonic() - started
+                                parts.append(delta)
+                                text = held + delta
+                                ready = text.rstrip(".")
+                                held = text[len(ready):]
+                                cleaned = self._clean_response(ready)
+                                if cleaned:
+                                    yield cleaned
+                        break
+                    except Exception as e:
+                        if parts:
+                            raise
+                        tier = self._fall_back(tier, e)
+            self.router.record(tier, time.monotonic() - started, first_token)
+            if held:
+                yield self._clean_response(held)
+
+            bot_response = self._clean_response(''.join(parts).strip())
+            self._finish_turn(call_id, bot_response)
+            logger.debug("Generated streamed response: %s", bot_response)
+
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            raise
+
     async def handle_silence(self, call_id: str) -> str:
         """
         Generate a response for silence detection
         """
-        return await self.generate_response(
-            "The customer has been silent for a while. Please check if they're still there.",
-            call_id
-        )
+        return await self.generate_response(SILENCE_PROMPT, call_id)
 
     async def handle_interruption(self, call_id: str) -> str:
         """
@@ -125,6 +260,23 @@ class LLMService:
         """
         Clear conversation history for a call
         """
+        self.last_used.pop(call_id, None)
+        self.accounts.pop(call_id, None)
+        self.router.forget(call_id)
         if call_id in self.conversation_history:
             del self.conversation_history[call_id]
-            logger.info(f"Cleared conversation history for call: {call_id}") 
\ No newline at end of file
+            logger.info(f"Cleared conversation history for call: {call_id}")
+
+    def clear_idle_conversations(self, keep: set, idle_timeout: float) -> int:
+        """
+        Clear histories not in keep that have been unused for idle_timeout
+        seconds; returns the number cleared
+        """
+        now = time.monotonic()
+        stale = [
+            call_id for call_id in self.conversation_history.keys() | self.accounts.keys()
+            if call_id not in keep and now - self.last_used.get(call_id, 0.0) > idle_timeout
+        ]
+        for call_id in stale:
+            self.clear_conversation(call_id)
+        return len(stale) 
\ No newline at end of file
@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from fastapi import WebSocket
+
+from utils.mulaw import ulaw_encode
+from utils.resampler import Resampler
+
+logger = logging.getLogger(__name__)
+
+TWILIO_SAMPLE_RATE = 8000
+FLOW_MARK_PREFIX = "flow-"
+
+
+class TwilioMediaStream:
+    """
+    Outbound half of a Twilio Media Stream websocket.
+
+    Agent audio is downsampled to 8 kHz, mu-law encoded and sent as media
+    messages. A mark is sent every mark_interval_ms of audio; Twilio echoes
+    each mark once the caller has heard everything before it, which gives
+    both playback acknowledgement and flow control: sending pauses while
+    more than max_unacked_ms of audio is waiting to be acknowledged.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        sample_rate: int = 16000,
+        mark_interval_ms: int = 200,
+        max_unacked_ms: int = 1000,
+        ack_timeout: float = 2.0,
+        on_played: Optional[Callable[[str, float], Awaitable[None]]] = None
+    ):
+        self.websocket = websocket
+        self.sample_rate = sample_rate
+        self.mark_interval_ms = mark_interval_ms
+        self.max_unacked_ms = max_unacked_ms
+        self.ack_timeout = ack_timeout
+        self.on_played = on_played
+
+        self.stream_sid: Optional[str] = None
+        self.call_sid: Optional[str] = None
+
+        self._resampler = Resampler(sample_rate, TWILIO_SAMPLE_RATE)
+        self._pending_marks: Dict[str, Tuple[float, int]] = {}  # name -> (sent at, audio ms sent)
+        self._mark_count = 0
+        self._sent_ms = 0
+        self._acked_ms = 0
+        self._since_mark_ms = 0
+        self._acked = asyncio.Event()
+
+    def start(self, start: dict) -> None:
+        """
+        Bind to the stream described by Twilio's "start" message
+        """
+        self.stream_sid = start.get("streamSid")
+        self.call_sid = start.get("callSid")
+        logger.info("Twilio media stream %s started for call %s", self.stream_sid, self.call_sid)
+
+    @property
+    def unacked_ms(self) -> int:
+        """Audio sent to Twilio that the caller has not heard yet"""
+        return self._sent_ms - self._acked_ms
+
+    async def send_frame(self, frame: np.ndarray) -> None:
+        """
+        Send one frame of int16 PCM at sample_rate to the caller
+        """
+        if self.stream_sid is None:
+            return
+
+        # Flow control: wait for Twilio to acknowledge playback
+        while self.unacked_ms >= self.max_unacked_ms:
+            self._acked.clear()
+            try:
+                await asyncio.wait_for(self._acked.wait(), self.ack_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("No mark acknowledgement from Twilio for %.1fs; resuming", self.ack_timeout)
+                self._acked_ms = self._sent_ms
+                break
+
+        pcm = self._resampler.process(frame)
+        await self.websocket.send_text(json.dumps({
+            "event": "media",
+            "streamSid": self.stream_sid,
+            "media": {"payload": base64.b64encode(ulaw_encode(pcm)).decode("ascii")}
+        }))
+
+        frame_ms = frame.size * 1000 // self.sample_rate
+        self._sent_ms += frame_ms
+        self._since_mark_ms += frame_ms
+        if self._since_mark_ms >= self.mark_interval_ms:
+            self._mark_count += 1
+            await self.send_mark(f"{FLOW_MARK_PREFIX}{self._mark_count}")
+
+    async def send_mark(self, name: str) -> None:
+        """
+        Ask Twilio to echo name once the caller has heard all audio sent so far
+        """
+        if self.stream_sid is None:
+            return
+        await self.websocket.send_text(json.dumps({
+            "event": "mark",
+            "streamSid": self.stream_sid,
+            "mark": {"name": name}
+        }))
+        self._pending_marks[name] = (time.monotonic(), self._sent_ms)
+        self._since_mark_ms = 0
+
+    async def handle_mark(self, name: str) -> None:
+        """
+        Process a mark echoed back by Twilio
+        """
+        pending = self._pending_marks.pop(name, None)
+        if pending is None:
+            return
+        sent_at, sent_ms = pending
+        self._acked_ms = max(self._acked_ms, sent_ms)
+        self._acked.set()
+
+        if self.on_played is not None and not name.startswith(FLOW_MARK_PREFIX):
+            await self.on_played(name, time.monotonic() - sent_at)
+
+    async def clear(self) -> None:
+        """
+        Drop audio Twilio has buffered but not yet played (barge-in)
+        """
+        if self.stream_sid is None:
+            return
+        await self.websocket.send_text(json.dumps({
+            "event": "clear",
+            "streamSid": self.stream_sid
+        }))
+        # Twilio echoes the outstanding marks after a clear; forget them so
+        # cleared replies aren't reported as played, and stop waiting.
+        self._pending_marks.clear()
+        self._acked_ms = self._sent_ms
+        self._since_mark_ms = 0
+        self._resampler.reset()
+        self._acked.set()
@@ -0,0 +1,340 @@
+import asyncio
+import logging
+import os
+import re
+import time
+import wave
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import LatencyStats
+from utils.resampler import mix_to_mono, resample
+
+logger = logging.getLogger(__name__)
+
+# Sentences built from cached fragments; anything else is synthesized whole
+TEMPLATES = (
+    "The outstanding amount is {amount} rupees.",
+    "The outstanding amount is {amount} rupees, due on {date}.",
+    "Your payment of {amount} rupees is due on {date}.",
+    "Your payment of {amount} rupees was due on {date}.",
+)
+
+MONTHS = (
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+)
+ONES = (
+    "", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen",
+)
+TENS = ("", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety")
+ORDINALS = (
+    "", "first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth",
+    "eleventh", "twelfth", "thirteenth", "fourteenth", "fifteenth", "sixteenth", "seventeenth",
+    "eighteenth", "nineteenth", "twentieth", "twenty first", "twenty second", "twenty third",
+    "twenty fourth", "twenty fifth", "twenty sixth", "twenty seventh", "twenty eighth",
+    "twenty ninth", "thirtieth", "thirty first",
+)
+# Indian numbering, as amounts in rupees are read out
+SCALES = ((10 ** 7, "crore"), (10 ** 5, "lakh"), (1000, "thousand"), (100, "hundred"))
+MAX_AMOUNT = 10 ** 9
+
+_MONTH = r"(?P<month>" + "|".join(MONTHS) + r")"
+_DAY = r"(?P<day>\d{1,2})(?:st|nd|rd|th)?"
+_YEAR = r"(?P<year>20\d\d)"
+DATE_PATTERNS = (
+    re.compile(rf"^(?:the\s+)?{_DAY}(?:\s+of)?\s+{_MONTH}(?:,?\s+{_YEAR})?$"),
+    re.compile(rf"^{_MONTH}\s+{_DAY}(?:,?\s+{_YEAR})?$"),
+    re.compile(r"^(?P<year>20\d\d)-(?P<month>\d\d)-(?P<day>\d\d)$"),
+)
+
+
+def number_words(n: int) -> List[str]:
+    """
+    Words for a non-negative integer, one fragment each
+    """
+    if n == 0:
+        return ["zero"]
+    words: List[str] = []
+    for value, name in SCALES:
+        if n >= value:
+            words += number_words(n // value) + [name]
+            n %= value
+    if n >= 20:
+        words.append(TENS[n // 10])
+        n %= 10
+    if n:
+        words.append(ONES[n])
+    return words
+
+
+def parse_date(text: str) -> Optional[Tuple[int, int, Optional[int]]]:
+    """
+    (day, month, year) of "15th March", "the 15th of March 2025",
+    "March 15" or "2025-03-15"; year is None when not given
+    """
+    text = " ".join(text.lower().split())
+    for pattern in DATE_PATTERNS:
+        match = pattern.match(text)
+        if match is None:
+            continue
+        month = match.group("month")
+        month = int(month) if month.isdigit() else MONTHS.index(month) + 1
+        day = int(match.group("day"))
+        year = int(match.group("year")) if match.group("year") else None
+        if 1 <= month <= 12 and 1 <= day <= 31:
+            return day, month, year
+    return None
+
+
+def format_date(text: str) -> str:
+    """
+    A due date in the form the templates read back ("15th March 2025"),
+    or text unchanged if it cannot be parsed
+    """
+    parsed = parse_date(text)
+    if parsed is None:
+        return text
+    day, month, year = parsed
+    suffix = "th" if 10 <= day % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+    return f"{day}{suffix} {MONTHS[month - 1].capitalize()}" + (f" {year}" if year else "")
+
+
+def format_amount(amount: float) -> str:
+    return f"{amount:.0f}" if float(amount).is_integer() else f"{amount:.2f}"
+
+
+def _date_fragments(text: str) -> Optional[List[str]]:
+    parsed = parse_date(text)
+    if parsed is None:
+        return None
+    day, month, year = parsed
+    fragments = [f"the {ORDINALS[day]}", f"of {MONTHS[month - 1]}"]
+    if year is not None:
+        fragments += number_words(year)
+    return fragments
+
+
+def _amount_fragments(text: str) -> Optional[List[str]]:
+    value = float(text.replace(",", ""))
+    # Paise and implausible amounts go to TTS
+    if not value.is_integer() or not 0 < value < MAX_AMOUNT:
+        return None
+    return number_words(int(value))
+
+
+SLOTS: Dict[str, Tuple[str, Callable[[str], Optional[List[str]]]]] = {
+    "amount": (r"(?P<amount>\d[\d,]*(?:\.\d+)?)", _amount_fragments),
+    "date": (r"(?P<date>[\w ,-]+?)", _date_fragments),
+}
+
+
+def _compile(template: str) -> Tuple["re.Pattern", List[Tuple[str, str]]]:
+    """
+    Regex for a template and its parts as ("text", carrier) / ("slot", name)
+    """
+    parts: List[Tuple[str, str]] = []
+    pattern = ""
+    for piece in re.split(r"(\{\w+\})", template.rstrip(".")):
+        if piece.startswith("{"):
+            name = piece[1:-1]
+            parts.append(("slot", name))
+            pattern += SLOTS[name][0]
+        elif piece.strip():
+            parts.append(("text", piece.strip().lower()))
+            # Words need whitespace between them, punctuation may hug a word
+            for token in re.findall(r"\w+|[^\w\s]", piece):
+                pattern += (r"\s+" if token[0].isalnum() and pattern else r"\s*") + re.escape(token)
+            pattern += r"\s+" if piece[-1].isspace() else ""
+    return re.compile(rf"^\s*{pattern}\s*[.!]?\s*$", re.IGNORECASE), parts
+
+
+def _trim(samples: np.ndarray, pad: int) -> np.ndarray:
+    """
+    Cut leading and trailing silence, keeping pad samples of it
+    """
+    if samples.size == 0:
+        return samples
+    level = np.abs(samples.astype(np.int32))
+    loud = np.flatnonzero(level > max(int(level.max()) // 50, 100))
+    if loud.size == 0:
+        return samples[:0]
+    return samples[max(0, loud[0] - pad):loud[-1] + 1 + pad]
+
+
+class PhraseSynthesizer:
+    """
+    Builds templated sentences (amounts, due dates) from cached audio.
+
+    Every fixed carrier phrase of TEMPLATES, every number word and every
+    day and month is rendered once per voice by TTS and kept on disk. A
+    reply sentence that matches a template is then assembled from those
+    fragments, joined with short crossfades, without a provider round
+    trip. render() returns None for sentences no template covers or whose
+    fragments are not cached yet, and the caller synthesizes them whole.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        sample_rate: int = 16000,
+        crossfade_ms: int = 10,
+        pad_ms: int = 25,
+        templates: Iterable[str] = TEMPLATES
+    ):
+        self.cache_dir = cache_dir
+        self.sample_rate = sample_rate
+        self.crossfade = sample_rate * crossfade_ms // 1000
+        self.pad = sample_rate * pad_ms // 1000
+        self._templates = [_compile(template) for template in templates]
+        self._clips: Dict[str, np.ndarray] = {}
+        self.outcomes: Counter = Counter()
+        self.render_stats = LatencyStats()
+
+    @staticmethod
+    def vocabulary() -> List[str]:
+        """
+        Every fragment a template can need
+        """
+        words = set(ONES[1:] + TENS[2:] + tuple(name for _, name in SCALES) + ("zero",))
+        words.update(f"the {ordinal}" for ordinal in ORDINALS[1:])
+        words.update(f"of {month}" for month in MONTHS)
+        for template in TEMPLATES:
+            words.update(text for kind, text in _compile(template)[1] if kind == "text")
+        return sorted(words)
+
+    def _path(self, fragment: str) -> str:
+        return os.path.join(self.cache_dir, re.sub(r"[^a-z0-9]+", "_", fragment).strip("_") + ".wav")
+
+    def _add(self, fragment: str, pcm: bytes, rate: int, channels: int = 1) -> None:
+        samples = mix_to_mono(np.frombuffer(pcm[: len(pcm) - len(pcm) % 2], dtype=np.int16), channels)
+        clip = _trim(resample(samples, rate, self.sample_rate), self.pad)
+        if clip.size:
+            clip.setflags(write=False)
+            self._clips[fragment] = clip
+
+    def _load_file(self, fragment: str) -> bool:
+        path = self._path(fragment)
+        if not os.path.exists(path):
+            return False
+        with wave.open(path, "rb") as f:
+            self._add(fragment, f.readframes(f.getnframes()), f.getframerate(), f.getnchannels())
+        return fragment in self._clips
+
+    def load(self) -> int:
+        """
+        Decode every cached fragment on disk; returns how many are missing
+        """
+        missing = 0
+        for fragment in self.vocabulary():
+            if fragment not in self._clips:
+                try:
+                    if not self._load_file(fragment):
+                        missing += 1
+                except (wave.Error, EOFError) as e:
+                    logger.warning("Ignoring unreadable phrase fragment %s: %s", fragment, e)
+                    missing += 1
+        return missing
+
+    async def render_missing(self, synthesize: Callable[[str], Awaitable[bytes]], source_rate: int, concurrency: int = 4) -> int:
+        """
+        Synthesize and cache the fragments not on disk yet, as raw PCM at
+        source_rate from synthesize(text); returns how many were rendered
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def render(fragment: str) -> bool:
+            async with semaphore:
+                # Another server worker may have rendered it meanwhile
+                if self._load_file(fragment):
+                    return False
+                pcm = await synthesize(fragment)
+            if not pcm:
+                return False
+            path = self._path(fragment)
+            partial = f"{path}.{os.getpid()}.partial"
+            with wave.open(partial, "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(source_rate)
+                f.writeframes(pcm)
+            os.replace(partial, path)
+            self._add(fragment, pcm, source_rate)
+            return True
+
+        missing = [fragment for fragment in self.vocabulary() if fragment not in self._clips]
+        results = await asyncio.gather(*(render(fragment) for fragment in missing), return_exceptions=True)
+        for fragment, result in zip(missing, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error rendering phrase fragment {fragment!r}: {str(result)}")
+        rendered = sum(result is True for result in results)
+        if missing:
+            logger.info("Rendered %d/%d missing phrase fragments in %s", rendered, len(missing), self.cache_dir)
+        return rendered
+
+    def plan(self, text: str) -> Optional[List[str]]:
+        """
+        The fragments that speak text, or None if no template matches it
+        """
+        for pattern, parts in self._templates:
+            match = pattern.match(text)
+            if match is None:
+                continue
+            fragments: List[str] = []
+            for kind, value in parts:
+                if kind == "text":
+                    fragments.append(value)
+                    continue
+                words = SLOTS[value][1](match.group(value))
+                if words is None:
+                    break
+                fragments += words
+            else:
+                return fragments
+        return None
+
+    def render(self, text: str) -> Optional[np.ndarray]:
+        """
+        int16 samples of text at sample_rate, or None to synthesize it with TTS
+        """
+        started = time.monotonic()
+        fragments = self.plan(text)
+        if fragments is None:
+            self.outcomes["unmatched"] += 1
+            return None
+        clips = [self._clips.get(fragment) for fragment in fragments]
+        if any(clip is None for clip in clips):
+            self.outcomes["missing_fragments"] += 1
+            return None
+        samples = self._join(clips)
+        self.outcomes["rendered"] += 1
+        self.render_stats.record(time.monotonic() - started)
+        return samples
+
+    def _join(self, clips: List[np.ndarray]) -> np.ndarray:
+        fade = min([self.crossfade] + [clip.size // 2 for clip in clips])
+        out = np.zeros(sum(clip.size for clip in clips) - fade * (len(clips) - 1), dtype=np.float32)
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        pos = 0
+        for i, clip in enumerate(clips):
+            audio = clip.astype(np.float32)
+            if i and fade:
+                pos -= fade
+                out[pos:pos + fade] *= 1.0 - ramp
+                audio[:fade] *= ramp
+            out[pos:pos + audio.size] += audio
+            pos += audio.size
+        return np.clip(out, -32768, 32767).astype(np.int16)
+
+    def summary(self) -> dict:
+        vocabulary = self.vocabulary()
+        return {
+            "fragments": sum(fragment in self._clips for fragment in vocabulary),
+            "vocabulary": len(vocabulary),
+            "sentences": dict(self.outcomes),
+            "render": self.render_stats.summary(),
+        }
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FrameSink = Callable[[np.ndarray], Awaitable[None]]
+MarkSink = Callable[[str], Awaitable[None]]
+
+
+class PlayoutBuffer:
+    """
+    Per-call playout buffer that paces agent audio into a frame sink.
+
+    PCM written with write() is queued as-is (no copy) and cut into fixed
+    frame_ms frames only when it is sent. A single pacer task hands frames
+    to the sink at real-time cadence, staying at most lookahead_ms ahead of
+    the wall clock, so the sink's own queue never holds more than that.
+
+    A segment written with a mark name triggers on_mark(name) right after
+    its last frame has been handed to the sink.
+    """
+
+    def __init__(
+        self,
+        sink: FrameSink,
+        sample_rate: int = 16000,
+        frame_ms: int = 20,
+        lookahead_ms: int = 100,
+        on_flush: Optional[Callable[[], Awaitable[None]]] = None,
+        on_mark: Optional[MarkSink] = None,
+        name: str = ""
+    ):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.lookahead = lookahead_ms / 1000
+        self.on_flush = on_flush
+        self.on_mark = on_mark
+        self.name = name
+
+        self._segments: Deque[Tuple[np.ndarray, Optional[str]]] = deque()
+        self._completed_marks: List[str] = []
+        self._offset = 0  # read position inside _segments[0]
+        self._queued_samples = 0
+        self._frame = np.zeros(self.frame_samples, dtype=np.int16)
+
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+
+        # Playback clock for the current utterance
+        self._clock_start: Optional[float] = None
+        self._frames_sent = 0
+        self.samples_played = 0  # total across the call
+
+    def start(self) -> None:
+        """
+        Start the pacer task
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """
+        Stop the pacer task and drop anything still queued
+        """
+        self._drop_queued()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._idle.set()
+
+    def write(self, samples: np.ndarray, mark: Optional[str] = None) -> None:
+        """
+        Queue mono int16 samples for playout, optionally tagged with a mark
+        """
+        if samples.size == 0:
+            return
+        self._segments.append((samples.astype(np.int16, copy=False), mark))
+        self._queued_samples += samples.size
+        self._idle.clear()
+        self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        Drop queued audio (e.g. the caller barged in) and return the number
+        of milliseconds discarded
+        """
+        dropped_ms = self.queued_ms
+        self._drop_queued()
+        self._clock_start = None
+        if self.on_flush is not None:
+            await self.on_flush()
+        self._idle.set()
+        if dropped_ms:
+            logger.debug("Flushed %d ms of queued audio %s", dropped_ms, self.name)
+        return dropped_ms
+
+    async def wait_for_playout(self) -> None:
+        """
+        Wait until everything written so far has been played
+        """
+        await self._idle.wait()
+
+    @property
+    def queued_ms(self) -> int:
+        """Audio waiting to be sent to the sink"""
+        return self._queued_samples * 1000 // self.sample_rate
+
+    @property
+    def position(self) -> float:
+        """Seconds of the current utterance the listener has heard so far"""
+        if self._clock_start is None:
+            return 0.0
+        sent = self._frames_sent * self.frame_ms / 1000
+        return max(0.0, min(sent, time.monotonic() - self._clock_start))
+
+    @property
+    def is_speaking(self) -> bool:
+        """True while queued audio remains or sent audio is still playing"""
+        if self._queued_samples:
+            return True
+        if self._clock_start is None:
+            return False
+        return time.monotonic() - self._clock_start < self._frames_sent * self.frame_ms / 1000
+
+    def _drop_queued(self) -> None:
+        self._segments.clear()
+        self._completed_marks.clear()
+        self._offset = 0
+        self._queued_samples = 0
+
+    def _next_frame(self) -> np.ndarray:
+        """Fill the reusable frame buffer from the queued segments, zero-padding the tail"""
+        filled = 0
+        while filled < self.frame_samples and self._segments:
+            segment, mark = self._segments[0]
+            take = min(self.frame_samples - filled, segment.size - self._offset)
+            self._frame[filled:filled + take] = segment[self._offset:self._offset + take]
+            filled += take
+            self._offset += take
+            if self._offset == segment.size:
+                self._segments.popleft()
+                self._offset = 0
+                if mark is not None:
+                    self._completed_marks.append(mark)
+        if filled < self.frame_samples:
+            self._frame[filled:] = 0
+        self._queued_samples -= filled
+        return self._frame
+
+    async def _run(self) -> None:
+        frame_duration = self.frame_ms / 1000
+        while True:
+            if not self._queued_samples:
+                # Let the last frames play out before reporting idle
+                if self._clock_start is not None:
+                    remaining = self._clock_start + self._frames_sent * frame_duration - time.monotonic()
+                    if remaining > 0:
+                        self._wakeup.clear()
+                        try:
+                            await asyncio.wait_for(self._wakeup.wait(), remaining)
+                            continue
+                        except asyncio.TimeoutError:
+                            pass
+                    self._clock_start = None
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            if self._clock_start is None:
+                self._clock_start = now
+                self._frames_sent = 0
+
+            # Stay no more than `lookahead` ahead of real time; after an
+            # underrun (slow sink) re-anchor the clock instead of bursting
+            due = self._clock_start + self._frames_sent * frame_duration
+            if now - due > self.lookahead:
+                self._clock_start = now - self._frames_sent * frame_duration
+                due = now
+            if due - now > self.lookahead:
+                await asyncio.sleep(due - now - self.lookahead)
+                continue
+
+            frame = self._next_frame()
+            try:
+                await self.sink(frame)
+            except Exception as e:
+                logger.error(f"Error sending audio frame {self.name}: {str(e)}")
+            self._frames_sent += 1
+            self.samples_played += self.frame_samples
+
+            while self._completed_marks and self.on_mark is not None:
+                try:
+                    await self.on_mark(self._completed_marks.pop(0))
+                except Exception as e:
+                    logger.error(f"Error sending playout mark {self.name}: {str(e)}")
+            self._completed_marks.clear()
@@ -0,0 +1,518 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+import av
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CODEC = "libopus"
+FRAME_MS = 20
+PACKETS_PER_SEEK = 1000 // FRAME_MS  # one seek point per second of audio
+INDEX_FILE = "index.json"
+_LENGTH = struct.Struct("<H")
+
+
+def load_index(directory: str) -> Optional[dict]:
+    """
+    Read a call directory's index.json; None if the recording is unfinished
+    """
+    try:
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _last_written(directory: str) -> float:
+    """
+    Latest modification time of a directory or anything directly in it
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return max([os.stat(directory).st_mtime] + [entry.stat().st_mtime for entry in entries])
+    except OSError:
+        return time.time()
+
+
+def read_track(directory: str, info: dict, start_ms: int = 0, duration_ms: Optional[int] = None) -> np.ndarray:
+    """
+    Decode part of one track, described by its index entry, as int16
+    samples at the track's sample rate
+    """
+    rate = info["sample_rate"]
+    frame_size = rate * info["frame_ms"] // 1000
+
+    # Position in the encoded stream, which runs `delay` samples ahead
+    start = max(0, start_ms) * rate // 1000 + info["delay"]
+    total = info["packets"] * frame_size
+    end = total if duration_ms is None else min(total, start + duration_ms * rate // 1000)
+    if start >= end:
+        return np.zeros(0, dtype=np.int16)
+
+    packet = start // frame_size
+    segments = info["segments"]
+    first = next(i for i, s in enumerate(segments) if s["first_packet"] + s["packets"] > packet)
+    seek = (packet - segments[first]["first_packet"]) // PACKETS_PER_SEEK
+    decode_from = segments[first]["first_packet"] + seek * PACKETS_PER_SEEK
+    wanted_packets = -(-(end - decode_from * frame_size) // frame_size)
+
+    decoder = av.CodecContext.create(CODEC, "r")
+    decoder.layout = "mono"
+    # The decoder always produces 48 kHz; convert back natively
+    converter = av.AudioResampler(format="s16", layout="mono", rate=rate)
+    decoded: List[np.ndarray] = []
+    offset = segments[first]["seek"][seek]
+    for segment in segments[first:]:
+        if wanted_packets <= 0:
+            break
+        path = os.path.join(directory, segment["file"])
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            while offset < segment["bytes"] and wanted_packets > 0:
+                (length,) = _LENGTH.unpack_from(data, offset)
+                offset += _LENGTH.size
+                packet_data = av.Packet(data[offset:offset + length])
+                offset += length
+                for frame in decoder.decode(packet_data):
+                    for converted in converter.resample(frame):
+                        decoded.append(converted.to_ndarray().reshape(-1))
+                wanted_packets -= 1
+        offset = 0
+    for converted in converter.resample(None):
+        decoded.append(converted.to_ndarray().reshape(-1))
+
+    if not decoded:
+        return np.zeros(0, dtype=np.int16)
+    samples = np.concatenate(decoded)
+    skip = start - decode_from * frame_size
+    return samples[skip:skip + (end - start)]
+
+
+class TrackWriter:
+    """
+    Encodes one direction of a call to Opus and appends the packets to
+    rotating segment files.
+
+    Segments hold length-prefixed raw Opus packets of FRAME_MS each, so a
+    packet's timestamp follows from its position and the seek table only
+    has to record one byte offset per second.
+    """
+
+    def __init__(self, directory: str, track: str, sample_rate: int, bitrate: int, segment_seconds: int):
+        self.directory = directory
+        self.track = track
+        self.sample_rate = sample_rate
+        self.frame_size = sample_rate * FRAME_MS // 1000
+        self.segment_packets = max(1, segment_seconds * 1000 // FRAME_MS)
+
+        self._encoder = av.CodecContext.create(CODEC, "w")
+        self._encoder.sample_rate = sample_rate
+        self._encoder.layout = "mono"
+        self._encoder.format = "s16"
+        self._encoder.bit_rate = bitrate
+        self._encoder.open()
+
+        # Partial frame carried between writes, in a buffer allocated once
+        self._pending = np.zeros(self.frame_size, dtype=np.int16)
+        self._pending_size = 0
+        self._pts = 0
+        self.samples_written = 0
+        self.packets = 0
+        self.delay = 0  # encoder lookahead in samples, from the first packet's pts
+        self.segments: List[dict] = []
+        self._file = None
+        self._offset = 0
+
+    def write(self, samples: np.ndarray) -> None:
+        """
+        Append int16 mono samples at sample_rate
+        """
+        self.samples_written += samples.size
+        position = 0
+        if self._pending_size:
+            position = min(self.frame_size - self._pending_size, samples.size)
+            self._pending[self._pending_size:self._pending_size + position] = samples[:position]
+            self._pending_size += position
+            if self._pending_size < self.frame_size:
+                return
+            self._encode(self._pending)
+            self._pending_size = 0
+        # Whole frames are encoded straight from the caller's array
+        while samples.size - position >= self.frame_size:
+            self._encode(samples[position:position + self.frame_size])
+            position += self.frame_size
+        rest = samples.size - position
+        self._pending[:rest] = samples[position:]
+        self._pending_size = rest
+
+    def pad_to(self, total_samples: int) -> None:
+        """
+        Write silence until total_samples have been written
+        """
+        missing = total_samples - self.samples_written
+        if missing > 0:
+            self.write(np.zeros(missing, dtype=np.int16))
+
+    def _encode(self, frame: Optional[np.ndarray]) -> None:
+        if frame is None:
+            packets = self._encoder.encode(None)
+        else:
+            av_frame = av.AudioFrame.from_ndarray(frame.reshape(1, -1), format="s16", layout="mono")
+            av_frame.sample_rate = self.sample_rate
+            av_frame.pts = self._pts
+            self._pts += frame.size
+            packets = self._encoder.encode(av_frame)
+        for packet in packets:
+            if self.packets == 0 and packet.pts is not None and packet.pts < 0:
+                self.delay = -packet.pts
+            self._append(bytes(packet))
+
+    def _append(self, payload: bytes) -> None:
+        segment = self.segments[-1] if self.segments else None
+        if segment is None or segment["packets"] >= self.segment_packets:
+            segment = self._rotate()
+        if segment["packets"] % PACKETS_PER_SEEK == 0:
+            segment["seek"].append(self._offset)
+        record = _LENGTH.pack(len(payload)) + payload
+        self._file.write(record)
+        self._offset += len(record)
+        segment["packets"] += 1
+        segment["bytes"] = self._offset
+        self.packets += 1
+
+    def _rotate(self) -> dict:
+        if self._file is not None:
+            self._file.close()
+        name = f"{self.track}-{len(self.segments):04d}.opus"
+        self._file = open(os.path.join(self.directory, name), "wb")
+        self._offset = 0
+        segment = {"file": name, "first_packet": self.packets, "packets": 0, "bytes": 0, "seek": []}
+        self.segments.append(segment)
+        return segment
+
+    def close(self) -> None:
+        """
+        Encode buffered audio and close the current segment
+        """
+        if self._pending_size:
+            self.write(np.zeros(self.frame_size - self._pending_size, dtype=np.int16))
+        self._encode(None)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def to_index(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "frame_ms": FRAME_MS,
+            "delay": self.delay,
+            "packets": self.packets,
+            "segments": self.segments,
+        }
+
+
+class CallRecording:
+    """
+    The open recording of one call: a TrackWriter per direction, kept on
+    one timeline so gaps (e.g. the agent not speaking) are stored as
+    silence.
+
+    The timeline is the audio received on clock_track, not wall time, so a
+    stalled event loop cannot turn into fake silence. Writes to clock_track
+    may carry the media timestamp of their first sample; the track is only
+    padded when that shows frames were actually lost. Other tracks are
+    padded up to the clock track when they fall behind it.
+
+    write() and add_event() are called from the event loop and only do the
+    bookkeeping there; encoding and file I/O run on the store's writer
+    thread, in order.
+    """
+
+    # Tracks lagging the clock track by more than this are padded with silence
+    MAX_LAG_MS = 200
+
+    def __init__(self, store: "RecordingStore", call_id: str, directory: str, clock_track: str = "caller"):
+        self.store = store
+        self.call_id = call_id
+        self.directory = directory
+        self.clock_track = clock_track
+        self.created_at = time.time()
+        self.tracks: Dict[str, TrackWriter] = {}  # writer thread only
+        self.events: List[dict] = []
+        # track -> (sample_rate, samples queued), kept on the event loop
+        self._queued: Dict[str, tuple] = {}
+        self.closed = False
+
+    @property
+    def position_ms(self) -> int:
+        """
+        Current offset into the recording: how much audio the clock track holds
+        """
+        rate, samples = self._queued.get(self.clock_track, (1, 0))
+        return samples * 1000 // rate
+
+    def add_event(self, event_type: str, **fields) -> None:
+        """
+        Note something that happened on the call (a transcript, a reply and
+        its stage latencies, ...) at the current offset into the recording
+        """
+        self.events.append({"type": event_type, "t_ms": self.position_ms, **fields})
+
+    def write(self, track: str, samples: np.ndarray, sample_rate: int, at_ms: Optional[int] = None) -> None:
+        """
+        Queue int16 mono audio for a track, creating it on first use. at_ms
+        is the media timestamp of the first sample, if the source has one.
+        Audio arriving after the recording was closed is dropped.
+        """
+        if self.closed:
+            return
+        rate, queued = self._queued.get(track, (sample_rate, 0))
+        if track == self.clock_track:
+            # Frames the source skipped are silence; late frames are not
+            expected = at_ms * rate // 1000 if at_ms is not None else queued
+        else:
+            expected = self.position_ms * rate // 1000
+            if expected - queued <= rate * self.MAX_LAG_MS // 1000:
+                expected = queued
+        pad = max(0, expected - queued)
+        self._queued[track] = (rate, queued + pad + samples.size)
+        # Copied: callers pass views of buffers they go on reusing
+        self.store.io.submit(self._write, track, rate, pad, np.array(samples, dtype=np.int16))
+
+    def _write(self, track: str, sample_rate: int, pad: int, samples: np.ndarray) -> None:
+        try:
+            writer = self.tracks.get(track)
+            if writer is None:
+                os.makedirs(self.directory, exist_ok=True)
+                writer = TrackWriter(
+                    self.directory, track, sample_rate,
+                    bitrate=self.store.bitrate,
+                    segment_seconds=self.store.segment_seconds
+                )
+                self.tracks[track] = writer
+            if pad:
+                writer.pad_to(writer.samples_written + pad)
+            writer.write(samples)
+        except Exception as e:
+            logger.error(f"Error writing {track} recording of call {self.call_id}: {str(e)}")
+
+    def close(self) -> dict:
+        """
+        Finish every track and write the call's index; returns the index.
+        Runs on the writer thread, after every queued write.
+        """
+        for writer in self.tracks.values():
+            writer.close()
+        index = {
+            "call_id": self.call_id,
+            "codec": "opus",
+            "created_at": self.created_at,
+            "duration_ms": max((w.samples_written * 1000 // w.sample_rate for w in self.tracks.values()), default=0),
+            "bytes": sum(s["bytes"] for w in self.tracks.values() for s in w.segments),
+            "tracks": {name: writer.to_index() for name, writer in self.tracks.items()},
+            "events": self.events,
+        }
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        return index
+
+
+class RecordingStore:
+    """
+    Compressed call recordings under root/<call_id>/.
+
+    Each call directory holds Opus segment files per track plus an
+    index.json with segment packet ranges and per-second byte offsets,
+    so reading any span of a call opens only the segments it needs and
+    seeks straight to the right packet through a memory map. Retention
+    by age and total size is enforced by sweep().
+
+    Several server processes may share root, so the catalog is rescanned
+    by sweep(), get_index() reads from disk, and a directory without an
+    index is only treated as abandoned once nothing has been written to it
+    for orphan_age seconds: it may be another process's live call.
+
+    All disk work - encoding, segment files, closing recordings, sweeps -
+    runs on one writer thread, io; the catalog is only changed there.
+    Call sweep() and refresh() through it (see run_io()).
+    """
+
+    def __init__(
+        self,
+        root: str,
+        segment_seconds: int = 300,
+        bitrate: int = 24000,
+        retention_days: float = 30.0,
+        max_total_bytes: int = 5 * 1024 ** 3,
+        orphan_age: float = 3600.0
+    ):
+        self.root = root
+        self.segment_seconds = segment_seconds
+        self.bitrate = bitrate
+        self.retention_days = retention_days
+        self.max_total_bytes = max_total_bytes
+        self.orphan_age = orphan_age
+        self.io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recordings")
+        self.open_recordings: Dict[str, CallRecording] = {}
+        # call_id -> (created_at, bytes) for finished recordings
+        self._catalog: Dict[str, tuple] = {}
+        os.makedirs(root, exist_ok=True)
+        self.refresh()
+        logger.info("Recording store has %d calls, %d bytes", len(self._catalog), self.total_bytes)
+
+    def refresh(self) -> int:
+        """
+        Pick up recordings finished or deleted by other processes and remove
+        unfinished ones abandoned for orphan_age; returns the number removed
+        """
+        found = set()
+        removed = 0
+        cutoff = time.time() - self.orphan_age
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            found.add(entry.name)
+            if entry.name in self._catalog or entry.name in self.open_recordings:
+                continue
+            index = self._read_index(entry.name)
+            if index is not None:
+                self._catalog[entry.name] = (index["created_at"], index["bytes"])
+            elif _last_written(entry.path) < cutoff:
+                # Left behind by a crash mid-call; nothing can read it
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        for call_id in self._catalog.keys() - found:
+            del self._catalog[call_id]
+        return removed
+
+    async def run_io(self, func, *args):
+        """
+        Run a blocking store method on the writer thread
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.io, func, *args)
+
+    @property
+    def catalog(self) -> Dict[str, tuple]:
+        """Finished recordings: call_id -> (created_at, bytes)"""
+        return dict(self._catalog)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for _, size in list(self._catalog.values()))
+
+    def _call_dir(self, call_id: str) -> str:
+        if not call_id or os.sep in call_id or call_id in (".", ".."):
+            raise ValueError(f"Invalid call ID: {call_id}")
+        return os.path.join(self.root, call_id)
+
+    def open(self, call_id: str) -> CallRecording:
+        """
+        Start (or return) the recording of a live call
+        """
+        recording = self.open_recordings.get(call_id)
+        if recording is None:
+            # The directory is created by the first write
+            recording = CallRecording(self, call_id, self._call_dir(call_id))
+            self.open_recordings[call_id] = recording
+        return recording
+
+    async def close(self, call_id: str) -> Optional[dict]:
+        """
+        Finish a call's recording; returns its index, or None if there was none
+        """
+        recording = self.open_recordings.pop(call_id, None)
+        if recording is None:
+            return None
+        recording.closed = True
+        return await self.run_io(self._finish, recording)
+
+    def _finish(self, recording: CallRecording) -> Optional[dict]:
+        if not recording.tracks:
+            shutil.rmtree(recording.directory, ignore_errors=True)
+            return None
+        try:
+            index = recording.close()
+        except Exception as e:
+            logger.error(f"Error closing recording of call {recording.call_id}: {str(e)}")
+            raise
+        self._catalog[recording.call_id] = (index["created_at"], index["bytes"])
+        logger.info("Closed recording of call %s (%d ms, %d bytes)", recording.call_id, index["duration_ms"], index["bytes"])
+        return index
+
+    def _read_index(self, call_id: str) -> Optional[dict]:
+        return load_index(self._call_dir(call_id))
+
+    def get_index(self, call_id: str) -> Optional[dict]:
+        """
+        Return the segment index of a finished recording
+        """
+        if call_id in self.open_recordings:
+            return None
+        # Read from disk: it may have been recorded by another process
+        return self._read_index(call_id)
+
+    def read(self, call_id: str, track: str, start_ms: int = 0, duration_ms: Optional[int] = None) -> np.ndarray:
+        """
+        Decode part of a finished recording as int16 samples at the track's
+        sample rate
+        """
+        index = self.get_index(call_id)
+        if index is None or track not in index["tracks"]:
+            raise KeyError(f"No {track} recording for call {call_id}")
+        return read_track(self._call_dir(call_id), index["tracks"][track], start_ms, duration_ms)
+
+    def delete(self, call_id: str) -> None:
+        self._catalog.pop(call_id, None)
+        shutil.rmtree(self._call_dir(call_id), ignore_errors=True)
+
+    def sweep(self, keep: Set[str]) -> int:
+        """
+        Delete recordings past the retention age, then the oldest ones until
+        the store fits max_total_bytes; calls in keep are left alone.
+        Returns the number deleted.
+        """
+        abandoned = self.refresh()
+        cutoff = time.time() - self.retention_days * 86400
+        expired = [call_id for call_id, (created, _) in self._catalog.items()
+                   if created < cutoff and call_id not in keep]
+        for call_id in expired:
+            self.delete(call_id)
+
+        deleted = len(expired) + abandoned
+        total = self.total_bytes
+        if total > self.max_total_bytes:
+            for call_id, (_, size) in sorted(self._catalog.items(), key=lambda item: item[1][0]):
+                if total <= self.max_total_bytes:
+                    break
+                if call_id in keep:
+                    continue
+                self.delete(call_id)
+                total -= size
+                deleted += 1
+        if deleted:
+            logger.info("Deleted %d recordings (store now %d bytes)", deleted, total)
+        return deleted
+
+    def stats(self) -> dict:
+        return {
+            "recordings": len(self._catalog),
+            "open": len(self.open_recordings),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_total_bytes,
+        }
+
+    def shutdown(self) -> None:
+        """
+        Wait for queued recording writes to reach disk
+        """
+        self.io.shutdown(wait=True)
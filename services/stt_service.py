@@ -1,17 +1,40 @@
 from deepgram import Deepgram
+from deepgram.errors import DeepgramApiError
 from config import Settings
 import logging
 import json
-from typing import Optional, Dict, Any
+import httpx
+from typing import Optional, Dict, Any, Callable, IO, Iterable, AsyncIterable, AsyncIterator, Tuple, Union
 import asyncio
+import time
+from utils.metrics import InFlightGauge
 
 logger = logging.getLogger(__name__)
 
+DEEPGRAM_API_URL = "https://api.deepgram.com/v1"
+UPLOAD_CHUNK_SIZE = 64 * 1024  # bytes read per step from an uploaded file object
+
+async def _read_chunks(file: IO[bytes]) -> AsyncIterator[bytes]:
+    """Read a blocking file object in a thread, one chunk at a time"""
+    while True:
+        chunk = await asyncio.to_thread(file.read, UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
 class DeepgramService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, http_client: Optional[httpx.AsyncClient] = None):
+        # The SDK is kept for live streaming; prerecorded requests go over
+        # http_client so they reuse its keep-alive connections
         self.client = Deepgram(api_key)
+        self.http_client = http_client or httpx.AsyncClient(
+            base_url=DEEPGRAM_API_URL,
+            headers={"Authorization": f"Token {api_key}"},
+            timeout=httpx.Timeout(60.0, connect=5.0)
+        )
         self.sample_rate = 16000
         self.channels = 1
+        self.in_flight = InFlightGauge()  # prerecorded requests awaiting Deepgram
 
     def _get_mime_type(self, file_extension: str) -> str:
         """Get the appropriate MIME type based on file extension"""
@@ -22,64 +45,178 @@ class DeepgramService:
         }
         return mime_types.get(file_extension.lower(), 'audio/wav')
 
+    def _prerecorded_options(self) -> Dict[str, Any]:
+        return {
+            "smart_format": True,
+            "model": "nova-2",
+            "language": "en-US",
+            "punctuate": True,
+            "interim_results": False
+        }
+
+    def _extract_alternative(self, response: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Pull the first alternative with a transcript out of a prerecorded response"""
+        if response and "results" in response:
+            if "channels" in response["results"] and response["results"]["channels"]:
+                channel = response["results"]["channels"][0]
+                if "alternatives" in channel and channel["alternatives"]:
+                    alternative = channel["alternatives"][0]
+                    transcript = alternative["transcript"]
+                    if transcript and transcript.strip():
+                        logger.debug("Transcription successful: %s", transcript)
+                        return alternative
+                    else:
+                        logger.debug("Empty transcript received")
+                else:
+                    logger.warning("No alternatives found in channel")
+            else:
+                logger.warning("No channels found in results")
+        else:
+            logger.warning("No results found in response")
+
+        return None
+
+    def _extract_transcript(self, response: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Pull the first alternative's transcript out of a prerecorded response"""
+        alternative = self._extract_alternative(response)
+        return alternative["transcript"] if alternative else None
+
+    async def _request(self, source: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        logger.debug("Sending audio to Deepgram...")
+        params = {
+            key: str(value).lower() if isinstance(value, bool) else value
+            for key, value in self._prerecorded_options().items()
+        }
+        if "url" in source:
+            request = {"json": {"url": source["url"]}}
+        else:
+            buffer = source["buffer"]
+            if hasattr(buffer, "read"):
+                buffer = _read_chunks(buffer)
+            request = {"content": buffer, "headers": {"Content-Type": source["mimetype"]}}
+        # Only a request that can be replayed is retried on a dropped connection
+        attempts = 2 if "url" in source or isinstance(request["content"], (bytes, bytearray)) else 1
+        with self.in_flight.track():
+            for attempt in range(attempts):
+                try:
+                    response = await self.http_client.post("/listen", params=params, **request)
+                    break
+                except httpx.TransportError:
+                    if attempt + 1 == attempts:
+                        raise
+        if response.is_error:
+            raise DeepgramApiError(response.text, http_library_error=None)
+        body = response.json() if response.content else None
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Deepgram response: %s", json.dumps(body, indent=2))
+        return body
+
+    async def _transcribe_source(self, source: Dict[str, Any]) -> Optional[str]:
+        return self._extract_transcript(await self._request(source))
+
     async def transcribe(self, audio_data: bytes, file_extension: str = 'wav') -> Optional[str]:
         """
         Transcribe audio data using Deepgram
         """
+        transcript, _ = await self.transcribe_with_confidence(audio_data, file_extension)
+        return transcript
+
+    async def transcribe_with_confidence(self, audio_data: bytes, file_extension: str = 'wav') -> Tuple[Optional[str], Optional[float]]:
+        """
+        Like transcribe, but also returns Deepgram's confidence (0 to 1) in
+        the transcript
+        """
         try:
             if not audio_data:
                 logger.warning("Empty audio data received")
-                return None
+                return None, None
 
-            logger.debug(f"Received audio data of size: {len(audio_data)} bytes")
-            logger.debug(f"File extension: {file_extension}")
-
-            # Configure transcription options
-            options = {
-                "smart_format": True,
-                "model": "nova-2",
-                "language": "en-US",
-                "punctuate": True,
-                "interim_results": False
-            }
+            logger.debug("Received audio data of size: %d bytes", len(audio_data))
+            logger.debug("File extension: %s", file_extension)
 
             # Get appropriate MIME type
             mimetype = self._get_mime_type(file_extension)
-            logger.debug(f"Using MIME type: {mimetype}")
+            logger.debug("Using MIME type: %s", mimetype)
 
             # Send audio data to Deepgram
-            source = {
+            alternative = self._extract_alternative(await self._request({
                 "buffer": audio_data,
                 "mimetype": mimetype
-            }
-            
-            logger.debug("Sending audio to Deepgram...")
-            response = await self.client.transcription.prerecorded(source, options)
-            logger.debug(f"Deepgram response: {json.dumps(response, indent=2)}")
-
-            # Extract transcription
-            if response and "results" in response:
-                if "channels" in response["results"] and response["results"]["channels"]:
-                    channel = response["results"]["channels"][0]
-                    if "alternatives" in channel and channel["alternatives"]:
-                        transcript = channel["alternatives"][0]["transcript"]
-                        if transcript and transcript.strip():
-                            logger.debug(f"Transcription successful: {transcript}")
-                            return transcript
-                        else:
-                            logger.debug("Empty transcript received")
-                    else:
-                        logger.warning("No alternatives found in channel")
-                else:
-                    logger.warning("No channels found in results")
-            else:
-                logger.warning("No results found in response")
-
-            return None
+            }))
+            if alternative is None:
+                return None, None
+            return alternative["transcript"], alternative.get("confidence")
 
         except Exception as e:
             logger.error(f"Error in transcription: {str(e)}")
-            return None
+            return None, None
+
+    async def transcribe_upload(self, body: Union[IO[bytes], AsyncIterable[bytes]], mimetype: str = 'audio/wav') -> Optional[str]:
+        """
+        Transcribe audio from a file object or an async byte stream (such as
+        an incoming request body). The body is streamed to Deepgram as it is
+        read, without buffering it in memory first.
+
+        Unlike transcribe, errors are raised: a streamed body cannot be
+        retried, so the caller should report the failure.
+        """
+        try:
+            return await self._transcribe_source({
+                "buffer": body,
+                "mimetype": mimetype
+            })
+        except Exception as e:
+            logger.error(f"Error in streamed transcription: {str(e)}")
+            raise
+
+    async def transcribe_many(
+        self,
+        sources: Iterable[Tuple[str, Dict[str, Any]]],
+        concurrency: int = 4
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Transcribe (name, source) pairs with at most concurrency requests in
+        flight, yielding one result dict per source as each one completes.
+
+        source is a Deepgram source dict, {"url": ...} or {"buffer": bytes
+        or file object, "mimetype": ...}, or a callable returning one so
+        files can be opened only when their turn comes. File objects are
+        closed once sent.
+        """
+        pending = iter(enumerate(sources))
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker() -> None:
+            for index, (name, source) in pending:
+                started = time.monotonic()
+                result: Dict[str, Any] = {"index": index, "name": name}
+                try:
+                    if callable(source):
+                        source = source()
+                    result["transcript"] = await self._transcribe_source(source)
+                except Exception as e:
+                    logger.error(f"Error transcribing {name}: {str(e)}")
+                    result["error"] = str(e)
+                finally:
+                    buffer = source.get("buffer") if isinstance(source, dict) else None
+                    if hasattr(buffer, "close"):
+                        buffer.close()
+                result["duration_ms"] = round((time.monotonic() - started) * 1000)
+                await results.put(result)
+            await results.put(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+        try:
+            remaining = len(workers)
+            while remaining:
+                result = await results.get()
+                if result is None:
+                    remaining -= 1
+                else:
+                    yield result
+        finally:
+            for task in workers:
+                task.cancel()
 
     async def handle_silence(self) -> str:
         """
@@ -99,11 +236,21 @@ class DeepgramService:
         """
         return "I didn't catch that. Could you please repeat?"
 
-    async def start_stream(self) -> Dict[str, Any]:
+    async def start_stream(
+        self,
+        on_transcript: Callable[[str, bool], None],
+        **overrides: Any
+    ) -> Any:
         """
-        Start a real-time streaming session with Deepgram
+        Start a real-time streaming session with Deepgram.
+
+        on_transcript(text, is_final) is called for every non-empty interim
+        and final result. overrides are merged into the live options, e.g.
+        encoding="linear16", sample_rate=16000 for raw PCM.
         """
         try:
+            from deepgram.transcription import LiveTranscriptionEvent
+
             options = {
                 "punctuate": True,
                 "model": "nova-2",
@@ -111,47 +258,44 @@ class DeepgramService:
                 "smart_format": True,
                 "interim_results": True
             }
+            options.update(overrides)
 
-            # Create a streaming connection
+            def handle_result(result: Dict[str, Any]) -> None:
+                alternatives = (result.get("channel") or {}).get("alternatives") or []
+                transcript = alternatives[0].get("transcript") if alternatives else None
+                if transcript:
+                    is_final = bool(result.get("is_final"))
+                    logger.debug("Stream transcription (%s): %s", "final" if is_final else "interim", transcript)
+                    on_transcript(transcript, is_final)
+
+            # Create a streaming connection; results arrive via the handler
             connection = await self.client.transcription.live(options)
-            
+            connection.register_handler(LiveTranscriptionEvent.TRANSCRIPT_RECEIVED, handle_result)
+
             logger.info("Started Deepgram streaming session")
-            return {
-                "connection": connection,
-                "options": options
-            }
+            return connection
         except Exception as e:
             logger.error(f"Error starting stream: {str(e)}")
             raise
 
-    async def process_stream_chunk(self, connection: Any, audio_chunk: bytes) -> Optional[str]:
+    def process_stream_chunk(self, connection: Any, audio_chunk: bytes) -> None:
         """
-        Process a chunk of audio data in a streaming session
+        Queue a chunk of audio for a streaming session; results are
+        delivered to the session's on_transcript callback
         """
         try:
-            # Send audio chunk to Deepgram
-            await connection.send(audio_chunk)
-            
-            # Get transcription result
-            result = await connection.recv()
-            if result and "channel" in result:
-                transcript = result["channel"]["alternatives"][0]["transcript"]
-                if transcript:
-                    logger.debug(f"Stream transcription: {transcript}")
-                    return transcript
-            
-            return None
+            connection.send(audio_chunk)
         except Exception as e:
             logger.error(f"Error processing stream chunk: {str(e)}")
             raise
 
     async def end_stream(self, connection: Any) -> None:
         """
-        End a streaming session
+        End a streaming session, waiting for Deepgram to flush final results
         """
         try:
             await connection.finish()
             logger.info("Ended Deepgram streaming session")
         except Exception as e:
             logger.error(f"Error ending stream: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
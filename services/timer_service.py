@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import math
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TimerKey = Tuple[str, Hashable]  # (call_id, kind)
+
+
+class _Timer:
+    __slots__ = ("key", "expires", "callback", "level", "slot")
+
+    def __init__(self, key: TimerKey, expires: int, callback: Callable[[], Any]):
+        self.key = key
+        self.expires = expires
+        self.callback = callback
+        self.level = 0
+        self.slot = 0
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel for per-call timeouts.
+
+    One loop task advances the wheel every tick seconds. Level 0 has one
+    slot per tick; each higher level has slots spanning a whole rotation of
+    the level below, whose timers are cascaded down as that level comes
+    round. Arming, resetting and cancelling are dictionary operations and
+    each tick only touches the timers due in it, so the cost per call does
+    not grow with the number of calls.
+
+    Timers are keyed by (call_id, kind): arming a key that is already armed
+    resets it. A callback may return a coroutine, which is run as a task.
+    """
+
+    def __init__(self, tick: float = 0.05, slots: int = 64, levels: int = 4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels: List[List[Dict[TimerKey, _Timer]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._timers: Dict[TimerKey, _Timer] = {}
+        self._by_call: Dict[str, Set[Hashable]] = {}
+        self._now = 0  # ticks advanced since start
+        self._started_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self.fired: Counter = Counter()
+
+    def _place(self, timer: _Timer) -> None:
+        # The lowest level whose span covers the delay; beyond the top
+        # level's span the timer waits in its furthest slot and is
+        # re-placed when that slot is cascaded
+        delay = timer.expires - self._now
+        level = 0
+        span = self.slots
+        while delay >= span and level < self.levels - 1:
+            level += 1
+            span *= self.slots
+        target = min(timer.expires, self._now + span - 1)
+        timer.level = level
+        timer.slot = (target // self.slots ** level) % self.slots
+        self._wheels[level][timer.slot][timer.key] = timer
+
+    def arm(self, call_id: str, kind: Hashable, delay: float, callback: Callable[[], Any]) -> None:
+        """
+        Call callback after delay seconds, replacing any timer of this kind
+        already armed for the call
+        """
+        key = (call_id, kind)
+        self._remove(key)
+        timer = _Timer(key, self._now + max(1, math.ceil(delay / self.tick)), callback)
+        self._timers[key] = timer
+        self._by_call.setdefault(call_id, set()).add(kind)
+        self._place(timer)
+
+    def cancel(self, call_id: str, kind: Hashable) -> bool:
+        """
+        Disarm a timer; returns whether it was armed
+        """
+        if self._remove((call_id, kind)) is None:
+            return False
+        kinds = self._by_call.get(call_id)
+        if kinds is not None:
+            kinds.discard(kind)
+            if not kinds:
+                del self._by_call[call_id]
+        return True
+
+    def cancel_call(self, call_id: str) -> int:
+        """
+        Disarm every timer of a call; returns how many were armed
+        """
+        kinds = self._by_call.pop(call_id, ())
+        for kind in kinds:
+            self._remove((call_id, kind))
+        return len(kinds)
+
+    def is_armed(self, call_id: str, kind: Hashable) -> bool:
+        return (call_id, kind) in self._timers
+
+    def remaining(self, call_id: str, kind: Hashable) -> Optional[float]:
+        """
+        Seconds until a timer fires, or None if it is not armed
+        """
+        timer = self._timers.get((call_id, kind))
+        return None if timer is None else (timer.expires - self._now) * self.tick
+
+    def _remove(self, key: TimerKey) -> Optional[_Timer]:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            self._wheels[timer.level][timer.slot].pop(key, None)
+        return timer
+
+    def _cascade(self, level: int) -> None:
+        index = (self._now // self.slots ** level) % self.slots
+        # Refill this level from the one above first when it wraps too
+        if index == 0 and level + 1 < self.levels:
+            self._cascade(level + 1)
+        slot = self._wheels[level][index]
+        if slot:
+            self._wheels[level][index] = {}
+            for timer in slot.values():
+                self._place(timer)
+
+    def _advance(self) -> None:
+        self._now += 1
+        if self._now % self.slots == 0 and self.levels > 1:
+            self._cascade(1)
+        index = self._now % self.slots
+        due = self._wheels[0][index]
+        if not due:
+            return
+        self._wheels[0][index] = {}
+        for key, timer in due.items():
+            if timer.expires > self._now:
+                self._place(timer)  # parked beyond the top level's span
+                continue
+            self.cancel(*key)
+            self._fire(timer)
+
+    def _fire(self, timer: _Timer) -> None:
+        call_id, kind = timer.key
+        self.fired[kind] += 1
+        try:
+            result = timer.callback()
+        except Exception as e:
+            logger.error(f"Error in {kind} timer for call {call_id}: {str(e)}")
+            return
+        if asyncio.iscoroutine(result):
+            task = asyncio.create_task(result)
+            self._running.add(task)
+            task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error in timer callback: {str(task.exception())}")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._started_at = loop.time() - self._now * self.tick
+        while True:
+            await asyncio.sleep(self._started_at + (self._now + 1) * self.tick - loop.time())
+            # Catch up on every tick a slow loop iteration skipped
+            target = int((loop.time() - self._started_at) / self.tick)
+            while self._now < target:
+                self._advance()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._running):
+            task.cancel()
+
+    def summary(self) -> dict:
+        armed = Counter(kind for _, kind in self._timers)
+        return {
+            "armed": len(self._timers),
+            "calls": len(self._by_call),
+            "armed_by_kind": dict(armed),
+            "fired_by_kind": dict(self.fired),
+        }
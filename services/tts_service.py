@@ -1,32 +1,135 @@
-from elevenlabs import generate, set_api_key
+from elevenlabs import set_api_key
+import httpx
 import logging
-from typing import Optional
+from typing import Optional, AsyncIterator, AsyncIterable, Callable, Tuple, Union
 import io
+import asyncio
+import numpy as np
+from utils.metrics import InFlightGauge
 
 logger = logging.getLogger(__name__)
 
+ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1"
+TTS_MODEL = "eleven_monolingual_v1"
+
+async def _raise_for_status(response: httpx.Response) -> None:
+    """Raise with ElevenLabs' error body, which httpx leaves out"""
+    if response.is_error:
+        await response.aread()
+        raise RuntimeError(f"ElevenLabs returned HTTP {response.status_code}: {response.text}")
+
 class ElevenLabsService:
-    def __init__(self, api_key: str, voice_id: str = "21m00Tcm4TlvDq8ikWAM"):
+    def __init__(self, api_key: str, voice_id: str = "21m00Tcm4TlvDq8ikWAM", http_client: Optional[httpx.AsyncClient] = None):
+        # The SDK is kept for voice listing; synthesis goes over http_client
+        # so requests reuse its keep-alive connections
         set_api_key(api_key)
         self.voice_id = voice_id
+        self.http_client = http_client or httpx.AsyncClient(
+            base_url=ELEVENLABS_API_URL,
+            headers={"xi-api-key": api_key},
+            timeout=httpx.Timeout(60.0, connect=5.0)
+        )
+        self.in_flight = InFlightGauge()  # synthesis requests awaiting ElevenLabs
 
-    async def text_to_speech(self, text: str) -> bytes:
+    async def text_to_speech(self, text: str, output_format: str = "mp3_44100_128") -> bytes:
         """
-        Convert text to speech using ElevenLabs
+        Convert text to speech using ElevenLabs.
+        
+        output_format is passed through to the API, e.g. "pcm_22050" for raw
+        16-bit mono PCM at 22.05 kHz.
         """
         try:
-            audio = generate(
-                text=text,
-                voice=self.voice_id,
-                model="eleven_monolingual_v1"
-            )
+            with self.in_flight.track():
+                response = await self.http_client.post(
+                    f"/text-to-speech/{self.voice_id}",
+                    params={"output_format": output_format},
+                    json={"text": text, "model_id": TTS_MODEL}
+                )
+                await _raise_for_status(response)
             
-            logger.info(f"Generated speech for text: {text[:100]}...")
-            return audio
+            logger.info("Generated speech for text: %.100s...", text)
+            return response.content
         except Exception as e:
             logger.error(f"Error generating speech: {str(e)}")
             raise
 
+    async def stream_speech(self, text: str, output_format: str = "pcm_16000") -> AsyncIterator[bytes]:
+        """
+        Convert text to speech, yielding audio chunks as ElevenLabs streams
+        them so playback can start before synthesis finishes
+        """
+        try:
+            with self.in_flight.track():
+                async with self.http_client.stream(
+                    "POST",
+                    f"/text-to-speech/{self.voice_id}/stream",
+                    params={"optimize_streaming_latency": 1, "output_format": output_format},
+                    json={"text": text, "model_id": TTS_MODEL}
+                ) as response:
+                    await _raise_for_status(response)
+                    async for chunk in response.aiter_bytes():
+                        if chunk:
+                            yield chunk
+
+            logger.info("Streamed speech for text: %.100s...", text)
+        except Exception as e:
+            logger.error(f"Error streaming speech: {str(e)}")
+            raise
+
+    async def synthesize_segments(
+        self,
+        segments: AsyncIterable[str],
+        output_format: str = "mp3_44100_128",
+        concurrency: int = 2,
+        prerendered: Optional[Callable[[str], Optional[np.ndarray]]] = None
+    ) -> AsyncIterator[Tuple[str, Union[bytes, np.ndarray]]]:
+        """
+        Synthesize each text segment as soon as it arrives, with at most
+        concurrency requests in flight, and yield (text, audio) strictly in
+        segment order. Closing the iterator cancels outstanding requests.
+
+        Segments for which prerendered(text) returns samples skip the
+        provider and are yielded as those samples instead of encoded audio.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        pending: asyncio.Queue = asyncio.Queue()
+        tasks: list = []
+
+        async def synthesize(text: str) -> bytes:
+            async with semaphore:
+                return await self.text_to_speech(text, output_format=output_format)
+
+        async def schedule() -> None:
+            try:
+                async for text in segments:
+                    samples = prerendered(text) if prerendered else None
+                    if samples is not None:
+                        task = asyncio.get_running_loop().create_future()
+                        task.set_result(samples)
+                    else:
+                        task = asyncio.create_task(synthesize(text))
+                    tasks.append(task)
+                    pending.put_nowait((text, task))
+            finally:
+                pending.put_nowait(None)
+
+        scheduler = asyncio.create_task(schedule())
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                text, task = item
+                # Shielded so a cancelled caller cannot free a slot for a
+                # later segment before the cleanup below cancels it
+                yield text, await asyncio.shield(task)
+            # Surface an error from the segment source
+            await scheduler
+        finally:
+            scheduler.cancel()
+            for task in reversed(tasks):
+                task.cancel()
+
     async def get_available_voices(self) -> list[dict]:
         """
         Get list of available voices
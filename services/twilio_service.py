@@ -3,6 +3,7 @@ from twilio.twiml.voice_response import VoiceResponse, Connect
 from config import get_settings
 import logging
 from typing import Optional
+import asyncio
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +33,8 @@ class TwilioService:
             response.say("Connecting to the AI agent. Please wait.")
 
             # Make the call
-            call = self.client.calls.create(
+            call = await asyncio.to_thread(
+                self.client.calls.create,
                 to=to_number,
                 from_=self.phone_number,
                 twiml=str(response),
@@ -48,10 +50,11 @@ class TwilioService:
 
     async def end_call(self, call_sid: str) -> None:
         """
-        End an active call
+        End an active call; the REST request runs on a thread so it does
+        not stall other calls on the event loop
         """
         try:
-            self.client.calls(call_sid).update(status="completed")
+            await asyncio.to_thread(self.client.calls(call_sid).update, status="completed")
             logger.info(f"Ended call with SID: {call_sid}")
         except Exception as e:
             logger.error(f"Error ending call: {str(e)}")
@@ -62,7 +65,7 @@ class TwilioService:
         Get the current status of a call
         """
         try:
-            call = self.client.calls(call_sid).fetch()
+            call = await asyncio.to_thread(self.client.calls(call_sid).fetch)
             return call.status
         except Exception as e:
             logger.error(f"Error getting call status: {str(e)}")
@@ -110,9 +110,14 @@ document.addEventListener('DOMContentLoaded', () => {
             
             switch (data.type) {
                 case 'transcript':
+                case 'response':
                     addMessage(data.text, data.speaker === 'agent' ? 'agent' : 'customer');
                     break;
                     
+                case 'status':
+                    addMessage(`Call status: ${data.status}`, 'system');
+                    break;
+                    
                 case 'call_ended':
                     clearInterval(durationInterval);
                     callStatus.textContent = 'Call ended';
@@ -162,75 +167,64 @@ async function startRecording() {
         };
 
         mediaRecorder.onstop = async () => {
-            const audioBlob = new Blob(audioChunks, { type: 'audio/wav' });
-            
-            // Convert blob to base64
-            const reader = new FileReader();
-            reader.readAsDataURL(audioBlob);
-            reader.onloadend = async () => {
-                const base64Audio = reader.result.split(',')[1]; // Remove data URL prefix
-                
-                try {
-                    logMessage('Sending audio for transcription...');
-                    const response = await fetch('/api/test-stt', {
+            const audioBlob = new Blob(audioChunks, { type: mediaRecorder.mimeType || 'audio/webm' });
+
+            try {
+                // Upload the recording as the raw request body
+                logMessage('Sending audio for transcription...');
+                const response = await fetch('/api/test-stt/upload', {
+                    method: 'POST',
+                    headers: { 'Content-Type': audioBlob.type },
+                    body: audioBlob
+                });
+
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+
+                const data = await response.json();
+                if (data.transcript) {
+                    logMessage(`Transcription: ${data.transcript}`, 'success');
+                    document.getElementById('transcript').textContent = `Transcription: ${data.transcript}`;
+                    
+                    // Get LLM response
+                    logMessage('Getting AI response...');
+                    const llmResponse = await fetch('/api/test-llm', {
                         method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json'
-                        },
-                        body: JSON.stringify({
-                            audio_data: base64Audio,
-                            file_name: 'recording.wav'
-                        })
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ transcript: data.transcript })
                     });
                     
-                    if (!response.ok) {
-                        throw new Error(`HTTP error! status: ${response.status}`);
+                    if (!llmResponse.ok) {
+                        throw new Error(`HTTP error! status: ${llmResponse.status}`);
                     }
                     
-                    const data = await response.json();
-                    if (data.transcript) {
-                        logMessage(`Transcription: ${data.transcript}`, 'success');
-                        document.getElementById('transcript').textContent = `Transcription: ${data.transcript}`;
+                    const llmData = await llmResponse.json();
+                    if (llmData.response) {
+                        logMessage(`AI Response: ${llmData.response}`, 'success');
                         
-                        // Get LLM response
-                        logMessage('Getting AI response...');
-                        const llmResponse = await fetch('/api/test-llm', {
+                        // Get TTS response
+                        logMessage('Converting response to speech...');
+                        const ttsResponse = await fetch('/api/test-tts', {
                             method: 'POST',
                             headers: { 'Content-Type': 'application/json' },
-                            body: JSON.stringify({ transcript: data.transcript })
+                            body: JSON.stringify({ text: llmData.response })
                         });
                         
-                        if (!llmResponse.ok) {
-                            throw new Error(`HTTP error! status: ${llmResponse.status}`);
+                        if (!ttsResponse.ok) {
+                            throw new Error(`HTTP error! status: ${ttsResponse.status}`);
                         }
                         
-                        const llmData = await llmResponse.json();
-                        if (llmData.response) {
-                            logMessage(`AI Response: ${llmData.response}`, 'success');
-                            
-                            // Get TTS response
-                            logMessage('Converting response to speech...');
-                            const ttsResponse = await fetch('/api/test-tts', {
-                                method: 'POST',
-                                headers: { 'Content-Type': 'application/json' },
-                                body: JSON.stringify({ text: llmData.response })
-                            });
-                            
-                            if (!ttsResponse.ok) {
-                                throw new Error(`HTTP error! status: ${ttsResponse.status}`);
-                            }
-                            
-                            const audioBlob = await ttsResponse.blob();
-                            const audioUrl = URL.createObjectURL(audioBlob);
-                            const audio = new Audio(audioUrl);
-                            audio.play();
-                            logMessage('Playing AI response...', 'success');
-                        }
+                        const audioBlob = await ttsResponse.blob();
+                        const audioUrl = URL.createObjectURL(audioBlob);
+                        const audio = new Audio(audioUrl);
+                        audio.play();
+                        logMessage('Playing AI response...', 'success');
                     }
-                } catch (error) {
-                    logMessage(`Error: ${error.message}`, 'error');
                 }
-            };
+            } catch (error) {
+                logMessage(`Error: ${error.message}`, 'error');
+            }
         };
 
         mediaRecorder.start();
@@ -247,6 +241,126 @@ function stopRecording() {
     }
 }
 
+// Streaming test mode: microphone chunks go to /ws/test as they are
+// recorded; transcripts, reply tokens and reply audio stream back
+let streamSocket;
+let streamRecorder;
+let streamAudioContext;
+let streamPlayhead = 0;
+let streamSampleRate = 16000;
+let streamReply = '';
+
+function openStreamSocket() {
+    return new Promise((resolve, reject) => {
+        if (streamSocket && streamSocket.readyState === WebSocket.OPEN) {
+            resolve(streamSocket);
+            return;
+        }
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        streamSocket = new WebSocket(`${protocol}//${window.location.host}/ws/test`);
+        streamSocket.binaryType = 'arraybuffer';
+        streamSocket.onmessage = handleStreamMessage;
+        streamSocket.onopen = () => resolve(streamSocket);
+        streamSocket.onerror = () => reject(new Error('Could not connect to /ws/test'));
+        streamSocket.onclose = () => logMessage('Streaming connection closed');
+    });
+}
+
+function handleStreamMessage(event) {
+    if (event.data instanceof ArrayBuffer) {
+        playPcmChunk(event.data);
+        return;
+    }
+
+    const data = JSON.parse(event.data);
+    const transcript = document.getElementById('transcript');
+    switch (data.type) {
+        case 'listening':
+            logMessage('Streaming started...', 'success');
+            break;
+        case 'transcript_interim':
+            transcript.textContent = `You: ${data.text}`;
+            break;
+        case 'transcription':
+            logMessage(`Transcription: ${data.text}`, 'success');
+            transcript.textContent = `You: ${data.text}`;
+            streamReply = '';
+            break;
+        case 'response_token':
+            streamReply += data.text;
+            transcript.textContent = `Agent: ${streamReply}`;
+            break;
+        case 'response':
+            logMessage(`AI Response: ${data.text}`, 'success');
+            break;
+        case 'audio_start':
+            streamSampleRate = data.sample_rate;
+            streamPlayhead = 0;
+            break;
+        case 'latency':
+            logMessage(`Turn latency: transcript ${data.transcript_ms} ms, first token ${data.first_token_ms} ms, ` +
+                `first audio ${data.first_audio_ms} ms, total ${data.total_ms} ms`);
+            break;
+        case 'error':
+            logMessage(`Error: ${data.message}`, 'error');
+            break;
+    }
+}
+
+function playPcmChunk(buffer) {
+    if (!streamAudioContext) {
+        streamAudioContext = new AudioContext();
+    }
+    const pcm = new Int16Array(buffer);
+    const audioBuffer = streamAudioContext.createBuffer(1, pcm.length, streamSampleRate);
+    const channel = audioBuffer.getChannelData(0);
+    for (let i = 0; i < pcm.length; i++) {
+        channel[i] = pcm[i] / 32768;
+    }
+
+    // Schedule chunks back to back so playback starts with the first one
+    const source = streamAudioContext.createBufferSource();
+    source.buffer = audioBuffer;
+    source.connect(streamAudioContext.destination);
+    streamPlayhead = Math.max(streamPlayhead, streamAudioContext.currentTime);
+    source.start(streamPlayhead);
+    streamPlayhead += audioBuffer.duration;
+}
+
+async function startStreaming() {
+    try {
+        if (!streamAudioContext) {
+            streamAudioContext = new AudioContext();
+        }
+        const socket = await openStreamSocket();
+        const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+        streamRecorder = new MediaRecorder(stream);
+
+        streamRecorder.ondataavailable = (event) => {
+            if (event.data.size > 0 && socket.readyState === WebSocket.OPEN) {
+                socket.send(event.data);
+            }
+        };
+        streamRecorder.onstop = () => {
+            stream.getTracks().forEach(track => track.stop());
+            socket.send(JSON.stringify({ type: 'stop' }));
+        };
+
+        socket.send(JSON.stringify({ type: 'start' }));
+        // Emit a chunk every 250 ms instead of one blob at the end
+        streamRecorder.start(250);
+    } catch (error) {
+        logMessage(`Error: ${error.message}`, 'error');
+    }
+}
+
+function stopStreaming() {
+    if (streamRecorder && streamRecorder.state === 'recording') {
+        streamRecorder.stop();
+        logMessage('Streaming stopped, waiting for reply...', 'success');
+    }
+}
+
 async function playGreeting() {
     try {
         logMessage('Playing greeting...');
@@ -0,0 +1,144 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves the final formatting to the listener thread.
+
+    Like the stock prepare(), the message and any exception are rendered in
+    the calling thread, since arguments may change before the listener gets
+    to them; only the line format is applied later. Records marked
+    defer_format (the sampled per-frame logs, whose arguments are plain
+    numbers) skip even the %-merge.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            # Tracebacks hold frames and their locals alive
+            record.exc_info = None
+        if not getattr(record, "defer_format", False):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def setup_logging(level: str = "INFO", fmt: str = LOG_FORMAT) -> logging.handlers.QueueListener:
+    """
+    Route all log records through a queue to a background stdout handler
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(fmt))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(level.upper())
+    # httpx logs every provider request at INFO; keep those for DEBUG runs
+    if root.level > logging.DEBUG:
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def _restart_after_fork() -> None:
+    # Only the forking thread survives fork, so a forked worker needs its
+    # own queue and listener thread or its records are never written
+    global _listener
+    if _listener is None:
+        return
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, _DeferredQueueHandler):
+            handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def stop_logging() -> None:
+    """
+    Flush queued records and stop the background handler
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class CallLoggerAdapter(logging.LoggerAdapter):
+    """
+    Logger adapter that tags every message with the call ID
+    """
+
+    def __init__(self, logger: logging.Logger, call_id: str):
+        super().__init__(logger, {"call_id": call_id})
+
+    def process(self, msg, kwargs):
+        kwargs.setdefault("extra", {}).update(self.extra)
+        return f"[{self.extra['call_id']}] {msg}", kwargs
+
+
+class FrameLogSampler:
+    """
+    Rate-limited logger for per-frame messages in the audio hot path.
+
+    Each distinct message template is emitted at most once per interval per
+    call; the number of suppressed records is reported with the next one.
+    """
+
+    def __init__(self, logger: logging.Logger, call_id: str, interval: float = 5.0):
+        self.logger = CallLoggerAdapter(logger, call_id)
+        self.interval = interval
+        self._state: Dict[str, Tuple[float, int]] = {}
+
+    def log(self, level: int, msg: str, *args) -> None:
+        """
+        Log msg at level unless the same template was logged within the interval
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+
+        now = time.monotonic()
+        last, suppressed = self._state.get(msg, (0.0, 0))
+        if last and now - last < self.interval:
+            self._state[msg] = (last, suppressed + 1)
+            return
+
+        self._state[msg] = (now, 0)
+        # Arguments here are numbers, safe to %-merge on the listener thread
+        extra = {"defer_format": True}
+        if suppressed:
+            self.logger.log(level, msg + " (%d similar suppressed)", *args, suppressed, extra=extra)
+        else:
+            self.logger.log(level, msg, *args, extra=extra)
+
+    def debug(self, msg: str, *args) -> None:
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg: str, *args) -> None:
+        self.log(logging.INFO, msg, *args)
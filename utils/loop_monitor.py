@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Optional
+
+from utils.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag as how late a periodic timer wakes up.
+
+    Every interval seconds a task sleeps and records the overshoot; lag_ms
+    is an exponential moving average of it, so one slow callback nudges
+    the figure while sustained overload moves it quickly.
+
+    A watchdog thread also checks the timer's heartbeat. When the loop has
+    been stuck for block_threshold seconds it captures the loop thread's
+    stack, which names the blocking call; the report is completed with
+    the full stall duration once the loop runs again.
+    """
+
+    def __init__(self, interval: float = 0.1, smoothing: float = 0.3, block_threshold: float = 0.25, max_reports: int = 50):
+        self.interval = interval
+        self.smoothing = smoothing
+        self.block_threshold = block_threshold
+        self.lag_ms = 0.0
+        self.stats = LatencyStats(window=600)
+        self.blocked: Deque[dict] = deque(maxlen=max_reports)
+        self.blocked_count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._heartbeat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._stall: Optional[dict] = None  # report for the stall in progress
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._loop_thread = threading.get_ident()
+            self._heartbeat = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+            if self.block_threshold:
+                self._stopping.clear()
+                self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+                self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._stopping.set()
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            self.stats.record(lag)
+            self.lag_ms += self.smoothing * (lag * 1000 - self.lag_ms)
+            stall = self._stall
+            if stall is not None:
+                self._stall = None
+                stall["blocked_ms"] = round(lag * 1000, 1)
+                logger.warning(
+                    "Event loop was blocked for %.0f ms in:\n%s", stall["blocked_ms"], "".join(stall["stack"])
+                )
+
+    def _watch(self) -> None:
+        # Check a few times per threshold so a stall is caught close to it
+        period = min(self.interval, self.block_threshold) / 2
+        while not self._stopping.wait(period):
+            stuck = time.monotonic() - self._heartbeat - self.interval
+            if stuck < self.block_threshold or self._stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            report = {
+                "at": time.time(),
+                "blocked_ms": None,  # filled in when the loop resumes
+                "stack": traceback.format_stack(frame),
+            }
+            del frame
+            self._stall = report
+            self.blocked.append(report)
+            self.blocked_count += 1
+
+    def summary(self) -> dict:
+        return {"lag_ms": round(self.lag_ms, 2), "blocked": self.blocked_count, **self.stats.summary()}
+
+    def blocked_reports(self) -> list:
+        """Recent stalls, newest first"""
+        return list(reversed(self.blocked))
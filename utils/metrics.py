@@ -0,0 +1,76 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+
+class LatencyStats:
+    """
+    Rolling latency summary over the most recent samples
+    """
+
+    def __init__(self, window: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Return count and mean/p50/p95/max in milliseconds
+        """
+        if not self._samples:
+            return {"count": self.count}
+        ordered = sorted(self._samples)
+        n = len(ordered)
+        return {
+            "count": self.count,
+            "mean_ms": round(sum(ordered) / n * 1000, 2),
+            "p50_ms": round(ordered[n // 2] * 1000, 2),
+            "p95_ms": round(ordered[min(n - 1, int(n * 0.95))] * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+
+
+class LatencyRegistry:
+    """
+    Named collection of LatencyStats, created on first use
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._stats: Dict[str, LatencyStats] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = LatencyStats(self.window)
+        stats.record(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: stats.summary() for name, stats in self._stats.items()}
+
+
+class InFlightGauge:
+    """
+    Number of operations currently running, with the peak since start
+    """
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.total = 0
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        self.current += 1
+        self.total += 1
+        self.peak = max(self.peak, self.current)
+        try:
+            yield
+        finally:
+            self.current -= 1
+
+    def summary(self) -> Dict[str, int]:
+        return {"current": self.current, "peak": self.peak, "total": self.total}
@@ -0,0 +1,55 @@
+import numpy as np
+
+# G.711 mu-law constants
+BIAS = 0x84
+CLIP = 32635
+
+
+def _build_decode_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + BIAS) << exponent) - BIAS
+    table = np.where(sign != 0, -magnitude, magnitude).astype(np.int16)
+    table.setflags(write=False)
+    return table
+
+
+def _build_encode_table() -> np.ndarray:
+    samples = np.arange(-32768, 32768, dtype=np.int32)
+    sign = np.where(samples < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(samples), CLIP) + BIAS
+    exponent = np.floor(np.log2(magnitude >> 7, where=magnitude >> 7 > 0, out=np.zeros(magnitude.shape))).astype(np.int32)
+    exponent = np.clip(exponent, 0, 7)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    table = (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+    table.setflags(write=False)
+    return table
+
+
+# 256-entry decode table and 64K-entry encode table (indexed by sample + 32768)
+DECODE_TABLE = _build_decode_table()
+ENCODE_TABLE = _build_encode_table()
+
+
+def ulaw_decode(data: bytes) -> np.ndarray:
+    """
+    Decode 8-bit mu-law bytes to int16 PCM
+    """
+    return DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def ulaw_decode_into(data: bytes, out: np.ndarray) -> np.ndarray:
+    """
+    Decode 8-bit mu-law bytes into an existing int16 array without allocating
+    """
+    return np.take(DECODE_TABLE, np.frombuffer(data, dtype=np.uint8), out=out)
+
+
+def ulaw_encode(samples: np.ndarray) -> bytes:
+    """
+    Encode int16 PCM to 8-bit mu-law bytes
+    """
+    index = samples.astype(np.int32) + 32768
+    return ENCODE_TABLE[index].tobytes()
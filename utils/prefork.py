@@ -0,0 +1,181 @@
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+logger = logging.getLogger(__name__)
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+class PreforkServer:
+    """
+    Serves an ASGI app from several worker processes sharing one socket.
+
+    The parent binds the listen socket, imports the app and runs the
+    preload hook, then forks the workers, so imported modules and preloaded
+    data are shared copy-on-write instead of being rebuilt per worker.
+    Each worker runs uvicorn on the inherited socket with uvloop and
+    httptools when they are installed. The parent only supervises: a worker
+    that dies is replaced (with backoff if it keeps dying young) while the
+    socket stays open, and SIGTERM/SIGINT stop every worker gracefully.
+
+    preload must not start threads, open connections or database handles:
+    those do not survive fork.
+    """
+
+    def __init__(
+        self,
+        app: str,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 2,
+        preload: Optional[str] = None,
+        graceful_timeout: float = 30.0,
+        backlog: int = 2048,
+        min_uptime: float = 10.0,
+        max_restart_delay: float = 30.0
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload = preload
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+        self.min_uptime = min_uptime
+        self.max_restart_delay = max_restart_delay
+        self.loop = "uvloop" if _available("uvloop") else "asyncio"
+        self.http = "httptools" if _available("httptools") else "h11"
+        self._socket: Optional[socket.socket] = None
+        self._app = None
+        self._children: Dict[int, Tuple[int, float]] = {}  # pid -> (slot, started)
+        self._crashes: Dict[int, int] = {}  # slot -> deaths in a row before min_uptime
+        self._restarts: List[Tuple[float, int]] = []  # (due, slot)
+        self._stopping = False
+        self._parent_pid: Optional[int] = None
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid:
+            self._children[pid] = (slot, time.monotonic())
+            return
+
+        # Worker: uvicorn installs its own SIGINT/SIGTERM handlers
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            logger.info("Worker %d serving on pid %d", slot, os.getpid())
+            config = uvicorn.Config(
+                self._app,
+                loop=self.loop,
+                http=self.http,
+                backlog=self.backlog,
+                timeout_graceful_shutdown=self.graceful_timeout
+            )
+            uvicorn.Server(config).run(sockets=[self._socket])
+        except Exception as e:
+            logger.error(f"Worker {slot} failed: {str(e)}")
+            code = 1
+        # Leave through the normal interpreter exit so the worker's atexit
+        # handlers run; run() skips the parent's cleanup in a worker
+        sys.exit(code)
+
+    def _reap(self) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot, started = self._children.pop(pid, (None, 0.0))
+            if slot is None or self._stopping:
+                continue
+            uptime = time.monotonic() - started
+            self._crashes[slot] = self._crashes.get(slot, 0) + 1 if uptime < self.min_uptime else 0
+            delay = min(self.max_restart_delay, 0.5 * 2 ** self._crashes[slot]) if self._crashes[slot] else 0.0
+            logger.error(
+                "Worker %d (pid %d) exited with %d after %.1fs; restarting in %.1fs",
+                slot, pid, os.waitstatus_to_exitcode(status), uptime, delay
+            )
+            self._restarts.append((time.monotonic() + delay, slot))
+
+    def _restart_due(self) -> None:
+        now = time.monotonic()
+        due = [slot for at, slot in self._restarts if at <= now]
+        self._restarts = [(at, slot) for at, slot in self._restarts if at > now]
+        for slot in due:
+            self._spawn(slot)
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _stop_workers(self) -> None:
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self._children:
+            logger.warning("Worker pid %d did not stop in time; killing it", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self._children:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self._children.pop(pid, None)
+
+    def run(self) -> None:
+        self._parent_pid = os.getpid()
+        self._socket = self._bind()
+        started = time.monotonic()
+        self._app = import_from_string(self.app)
+        if self.preload:
+            import_from_string(self.preload)()
+        logger.info(
+            "Preloaded %s in %.2fs; forking %d workers on %s:%d (loop=%s, http=%s)",
+            self.app, time.monotonic() - started, self.workers, self.host, self.port, self.loop, self.http
+        )
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for slot in range(self.workers):
+            self._spawn(slot)
+        try:
+            while not self._stopping:
+                self._reap()
+                self._restart_due()
+                time.sleep(0.2)
+        finally:
+            if os.getpid() == self._parent_pid:
+                logger.info("Stopping %d workers", len(self._children))
+                self._stop_workers()
+                self._socket.close()
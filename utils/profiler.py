@@ -0,0 +1,96 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a running process.
+
+    A background thread samples the stack of every other thread every
+    interval seconds for a fixed duration; nothing is instrumented, so the
+    only cost is the sampling thread itself and only while it runs. The
+    result is in collapsed-stack format ("thread;outer;...;inner count"
+    per line), which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._counts: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+        self.started_at: Optional[float] = None
+        self.seconds = 0.0
+        self.interval = 0.0
+        self.samples = 0
+        self.result: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = 0.01) -> None:
+        """
+        Profile for seconds; raises RuntimeError if already running
+        """
+        if self.running:
+            raise RuntimeError("Profiler is already running")
+        self._stop.clear()
+        self._counts = Counter()
+        self.started_at = time.time()
+        self.seconds = seconds
+        self.interval = interval
+        self.samples = 0
+        self.result = None
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info("Profiling for %.1fs every %.1f ms", seconds, interval * 1000)
+
+    def stop(self) -> None:
+        """
+        End a run early; the result covers what was sampled so far
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline and not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+        self.result = "".join(f"{stack} {count}\n" for stack, count in self._counts.most_common())
+        logger.info("Profiler collected %d samples", self.samples)
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "has_result": self.result is not None,
+        }
@@ -0,0 +1,152 @@
+import logging
+import time
+from functools import lru_cache
+from math import gcd
+from typing import Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# Taps per polyphase branch when upsampling; scaled up by the decimation
+# ratio when downsampling so the anti-aliasing filter keeps its sharpness.
+HALF_TAPS = 16
+KAISER_BETA = 8.0
+
+
+@lru_cache(maxsize=32)
+def get_filter_bank(in_rate: int, out_rate: int) -> Tuple[np.ndarray, int, int]:
+    """
+    Build (and cache) the polyphase filter bank for a rate pair.
+
+    Returns (bank, up, down) where bank has shape (up, taps) and every row
+    is one phase of a Kaiser-windowed sinc low-pass, stored reversed so a
+    sliding window of input samples can be dotted with it directly.
+    """
+    g = gcd(in_rate, out_rate)
+    up, down = out_rate // g, in_rate // g
+
+    taps = 2 * int(np.ceil(HALF_TAPS * max(1.0, down / up)))
+    length = taps * up
+    cutoff = 0.5 / max(up, down)  # in cycles per sample at the upsampled rate
+
+    n = np.arange(length) - (length - 1) / 2.0
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, KAISER_BETA)
+    h *= up / h.sum()  # unity DC gain after zero-stuffing by `up`
+
+    bank = h.reshape(taps, up).T[:, ::-1].astype(np.float32)
+    bank.setflags(write=False)
+    return bank, up, down
+
+
+class Resampler:
+    """
+    Streaming polyphase resampler for mono int16 PCM.
+
+    Keeps the filter history and output phase across calls to process(),
+    so a stream can be fed in arbitrarily sized chunks without clicks at
+    the chunk boundaries.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.passthrough = in_rate == out_rate
+        if not self.passthrough:
+            self.bank, self.up, self.down = get_filter_bank(in_rate, out_rate)
+            self.taps = self.bank.shape[1]
+            self._history = np.zeros(self.taps - 1, dtype=np.float32)
+            self._t = 0  # next output position, in 1/up input samples
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Resample one chunk and return the int16 output produced so far
+        """
+        if self.passthrough or samples.size == 0:
+            return samples.astype(np.int16, copy=False)
+
+        buf = np.concatenate((self._history, samples.astype(np.float32, copy=False)))
+        n_in = samples.size
+        span = n_in * self.up - self._t
+        n_out = max(0, -(-span // self.down))
+
+        t = self._t + np.arange(n_out, dtype=np.int64) * self.down
+        index, phase = np.divmod(t, self.up)
+
+        windows = sliding_window_view(buf, self.taps)
+        out = np.einsum("ij,ij->i", windows[index], self.bank[phase])
+
+        self._t = int(self._t + n_out * self.down - n_in * self.up)
+        self._history = buf[-(self.taps - 1):].copy()
+
+        np.clip(out, -32768, 32767, out=out)
+        return out.astype(np.int16)
+
+    def reset(self) -> None:
+        """
+        Drop the filter history, e.g. after a flush or between utterances
+        """
+        if not self.passthrough:
+            self._history[:] = 0
+            self._t = 0
+
+
+def resample(samples: np.ndarray, in_rate: int, out_rate: int) -> np.ndarray:
+    """
+    One-shot resampling of a complete mono int16 clip
+    """
+    if in_rate == out_rate:
+        return samples.astype(np.int16, copy=False)
+    resampler = Resampler(in_rate, out_rate)
+    # Flush the filter delay so the tail of the clip isn't cut off
+    delay = resampler.taps // 2
+    padded = np.concatenate((samples, np.zeros(delay, dtype=samples.dtype)))
+    out = resampler.process(padded)
+    skip = (delay * out_rate) // in_rate
+    return out[skip:skip + (samples.size * out_rate) // in_rate]
+
+
+def mix_to_mono(samples: np.ndarray, channels: int) -> np.ndarray:
+    """
+    Average interleaved int16 channels into mono without a float round trip
+    """
+    if channels == 1:
+        return samples
+    frames = samples[: samples.size - samples.size % channels].reshape(-1, channels)
+    return (frames.sum(axis=1, dtype=np.int32) // channels).astype(np.int16)
+
+
+def convert_clip(samples: np.ndarray, channels: int, in_rate: int, out_rate: int) -> np.ndarray:
+    """
+    Mix a complete interleaved clip down to mono and resample it
+    """
+    return resample(mix_to_mono(samples, channels), in_rate, out_rate)
+
+
+def converted_length(n_samples: int, channels: int, in_rate: int, out_rate: int) -> int:
+    """
+    Number of samples convert_clip returns for a clip of n_samples
+    """
+    return (n_samples // channels) * out_rate // in_rate
+
+
+def benchmark(in_rate: int, out_rate: int, seconds: float = 10.0, chunk_ms: int = 20) -> float:
+    """
+    Return the streaming cost in milliseconds of CPU per second of audio
+    """
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(int(in_rate * seconds)) * 3000).astype(np.int16)
+    chunk = in_rate * chunk_ms // 1000
+    resampler = Resampler(in_rate, out_rate)
+
+    start = time.perf_counter()
+    for offset in range(0, audio.size, chunk):
+        resampler.process(audio[offset:offset + chunk])
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000 / seconds
+
+
+if __name__ == "__main__":
+    for rates in [(8000, 16000), (16000, 8000), (22050, 16000), (44100, 16000), (24000, 8000)]:
+        print(f"{rates[0]:>6} -> {rates[1]:>6} Hz: {benchmark(*rates):.3f} ms CPU per second of audio")
@@ -0,0 +1,78 @@
+import numpy as np
+
+from utils.mulaw import ulaw_decode_into
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size ring of int16 samples holding the most recent audio of a call.
+
+    Storage is allocated once at twice the capacity and every sample is
+    written to both halves, so any window of up to capacity samples is a
+    contiguous slice: readers get read-only ndarray views (or memoryviews
+    of them) and never copy. Positions are absolute sample counts since the
+    call started; the ring holds [start, end).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = np.zeros(capacity * 2, dtype=np.int16)
+        self.end = 0
+
+    @property
+    def start(self) -> int:
+        """Oldest sample still held"""
+        return max(0, self.end - self.capacity)
+
+    def _commit(self, offset: int, n: int) -> np.ndarray:
+        # Mirror what was just written at [offset, offset + n) into the other half
+        split = min(offset + n, self.capacity)
+        if split > offset:
+            self._buf[offset + self.capacity:split + self.capacity] = self._buf[offset:split]
+        if offset + n > self.capacity:
+            self._buf[:offset + n - self.capacity] = self._buf[self.capacity:offset + n]
+        self.end += n
+        return self.window(self.end - n, self.end)
+
+    def write(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Append int16 samples; returns a view of them in the ring
+        """
+        if samples.size > self.capacity:
+            self.end += samples.size - self.capacity
+            samples = samples[-self.capacity:]
+        offset = self.end % self.capacity
+        self._buf[offset:offset + samples.size] = samples
+        return self._commit(offset, samples.size)
+
+    def write_ulaw(self, payload: bytes) -> np.ndarray:
+        """
+        Decode mu-law bytes straight into the ring; returns a view of the
+        decoded samples
+        """
+        if len(payload) > self.capacity:
+            self.end += len(payload) - self.capacity
+            payload = payload[-self.capacity:]
+        offset = self.end % self.capacity
+        ulaw_decode_into(payload, self._buf[offset:offset + len(payload)])
+        return self._commit(offset, len(payload))
+
+    def window(self, start: int, end: int) -> np.ndarray:
+        """
+        Read-only view of samples [start, end); raises ValueError if any of
+        them have been overwritten or not written yet
+        """
+        if start < self.start or end > self.end or start > end:
+            raise ValueError(f"Window [{start}, {end}) is outside the ring [{self.start}, {self.end})")
+        offset = start % self.capacity
+        view = self._buf[offset:offset + end - start]
+        view.flags.writeable = False
+        return view
+
+    def tail(self, n: int) -> np.ndarray:
+        """The newest n samples (fewer if the call is younger)"""
+        return self.window(max(self.start, self.end - n), self.end)
+
+    @property
+    def nbytes(self) -> int:
+        return self._buf.nbytes
@@ -0,0 +1,75 @@
+import re
+from typing import List, Optional
+
+# Sentence ends: . ! ? and the Devanagari danda, with any closing quotes or brackets
+SENTENCE_END = re.compile(r"[.!?।]+[\"')\]]*(?=\s)")
+CLAUSE_END = re.compile(r"[,;:—]+(?=\s)")
+# Words whose trailing period does not end a sentence
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "no", "rs", "vs", "etc", "e.g", "i.e", "a.m", "p.m"}
+
+
+class SentenceSegmenter:
+    """
+    Incrementally splits streamed reply text into speakable segments.
+
+    Text is cut after a sentence end once the segment has min_chars, after
+    a clause break (comma, semicolon, colon, dash) once it has clause_chars,
+    and at the last space once it reaches max_chars, so every segment is
+    something TTS can say with natural prosody while the rest of the reply
+    is still being generated.
+    """
+
+    def __init__(self, min_chars: int = 8, clause_chars: int = 80, max_chars: int = 200):
+        self.min_chars = min_chars
+        self.clause_chars = clause_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def push(self, text: str) -> List[str]:
+        """
+        Add streamed text; returns the segments it completed
+        """
+        self._buffer += text
+        segments = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                return segments
+            segment, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:].lstrip()
+            if segment:
+                segments.append(segment)
+
+    def flush(self) -> Optional[str]:
+        """
+        Return whatever text is left once the reply is complete
+        """
+        segment, self._buffer = self._buffer.strip(), ""
+        return segment or None
+
+    def _find_cut(self) -> Optional[int]:
+        for match in SENTENCE_END.finditer(self._buffer):
+            if match.end() >= self.min_chars and not self._is_abbreviation(match.start()):
+                return match.end()
+        if len(self._buffer) >= self.clause_chars:
+            for match in CLAUSE_END.finditer(self._buffer, self.min_chars):
+                return match.end()
+        if len(self._buffer) >= self.max_chars:
+            space = self._buffer.rfind(" ", self.min_chars, self.max_chars)
+            return space if space > 0 else self.max_chars
+        return None
+
+    def _is_abbreviation(self, end: int) -> bool:
+        if self._buffer[end] != ".":
+            return False
+        word = self._buffer[:end].rsplit(None, 1)[-1] if self._buffer[:end].strip() else ""
+        return word.lower().lstrip("(\"'") in ABBREVIATIONS
+
+
+def split_sentences(text: str, **kwargs) -> List[str]:
+    """
+    Segment a complete text in one go
+    """
+    segmenter = SentenceSegmenter(**kwargs)
+    segments = segmenter.push(text)
+    tail = segmenter.flush()
+    return segments + [tail] if tail else segments
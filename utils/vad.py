@@ -0,0 +1,101 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from utils.ring_buffer import AudioRingBuffer
+
+MIN_SPEECH_DBFS = -50.0  # frames quieter than this are never speech
+MAX_THRESHOLD_DBFS = -35.0  # frames louder than this are always speech
+NOISE_MARGIN_DB = 12.0  # speech must be this far above the noise floor
+NOISE_SMOOTHING = 0.05  # how fast the noise floor follows quiet frames
+
+
+class UtteranceDetector:
+    """
+    Streaming energy VAD over a call's audio ring.
+
+    poll() reads every complete frame written since the last call as a view
+    of the ring, classifies it against an adaptive noise floor and returns
+    the [start, end) sample span of an utterance once it is followed by
+    silence_ms of quiet (or reaches max_utterance_ms). Frame energy is
+    computed in a preallocated scratch buffer, so polling does not allocate.
+    """
+
+    def __init__(
+        self,
+        ring: AudioRingBuffer,
+        sample_rate: int = 8000,
+        frame_ms: int = 20,
+        silence_ms: int = 500,
+        min_speech_ms: int = 200,
+        max_utterance_ms: int = 15000,
+        pre_roll_ms: int = 200
+    ):
+        self.ring = ring
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.silence_samples = sample_rate * silence_ms // 1000
+        self.min_speech_samples = sample_rate * min_speech_ms // 1000
+        self.max_utterance_samples = min(sample_rate * max_utterance_ms // 1000, ring.capacity)
+        self.pre_roll_samples = sample_rate * pre_roll_ms // 1000
+        self.noise_floor = MIN_SPEECH_DBFS - NOISE_MARGIN_DB
+        self._scratch = np.zeros(self.frame_size, dtype=np.float32)
+        self._next = ring.end  # first sample not yet classified
+        self._start: Optional[int] = None  # current utterance, if any
+        self._last_speech = 0  # end of its last speech frame
+        self._speech_samples = 0
+
+    @property
+    def in_utterance(self) -> bool:
+        return self._start is not None
+
+    def reset(self) -> None:
+        """
+        Drop any utterance in progress and skip to the newest audio
+        """
+        self._next = self.ring.end
+        self._start = None
+        self._speech_samples = 0
+
+    def _energy(self, frame: np.ndarray) -> float:
+        np.copyto(self._scratch, frame, casting="unsafe")
+        power = float(np.dot(self._scratch, self._scratch)) / frame.size
+        return 10.0 * np.log10(max(power, 1.0) / 32768.0 ** 2)
+
+    def poll(self) -> Optional[Tuple[int, int]]:
+        """
+        Classify new frames; returns an utterance span when one has ended
+        """
+        # Frames that fell out of the ring before we looked are skipped
+        self._next = max(self._next, self.ring.start)
+        while self.ring.end - self._next >= self.frame_size:
+            frame_start = self._next
+            self._next += self.frame_size
+            energy = self._energy(self.ring.window(frame_start, self._next))
+            threshold = min(max(self.noise_floor + NOISE_MARGIN_DB, MIN_SPEECH_DBFS), MAX_THRESHOLD_DBFS)
+            speech = energy > threshold
+            if not speech:
+                self.noise_floor += NOISE_SMOOTHING * (energy - self.noise_floor)
+
+            if self._start is None:
+                if speech:
+                    self._start = max(frame_start - self.pre_roll_samples, self.ring.start)
+                    self._last_speech = self._next
+                    self._speech_samples = self.frame_size
+                continue
+
+            if speech:
+                self._last_speech = self._next
+                self._speech_samples += self.frame_size
+            if self._next - self._start >= self.max_utterance_samples:
+                return self._finish(self._next)
+            if self._next - self._last_speech >= self.silence_samples:
+                if self._speech_samples >= self.min_speech_samples:
+                    return self._finish(min(self._last_speech + self.pre_roll_samples, self._next))
+                self._start = None
+        return None
+
+    def _finish(self, end: int) -> Tuple[int, int]:
+        span = (max(self._start, self.ring.start), end)
+        self._start = None
+        self._speech_samples = 0
+        return span